@@ -13,10 +13,16 @@ import urllib.request
 import os
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from dataclasses import dataclass, asdict
 
+# Share the XMLTV date parser and source merge with the API
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "tvgo-backend"))
+from app.xmltv import XMLTVDateParser, merge_epg_sources  # noqa: E402
+
 
 @dataclass
 class Channel:
@@ -337,6 +343,42 @@ class ChannelMapper:
                 f.write(m3u_channel['url'] + '\n')
 
 
+class _TimedProgram(NamedTuple):
+    """A Program with parsed times, as merge_epg_sources expects"""
+    channel_id: str
+    start: datetime
+    stop: datetime
+    program: Program
+
+
+def merge_sources(
+    sources: List[Tuple[Dict[str, Channel], List[Program]]]
+) -> Tuple[Dict[str, Channel], List[Program], int]:
+    """Merge parsed sources given in priority order (highest priority first).
+    
+    Uses the API's merge (app.xmltv.merge_epg_sources): each channel keeps the
+    metadata of the first source listing it, and programmes only fill slots a
+    higher-priority source left free. Programmes with malformed timestamps are
+    counted as dropped.
+    """
+    date_parser = XMLTVDateParser()
+    timed_sources = []
+    malformed = 0
+    for source_channels, source_programs in sources:
+        timed = []
+        for program in source_programs:
+            start = date_parser.parse(program.start)
+            stop = date_parser.parse(program.stop)
+            if start is None or stop is None:
+                malformed += 1
+                continue
+            timed.append(_TimedProgram(program.channel_id, start, stop, program))
+        timed_sources.append((list(source_channels.values()), timed))
+    
+    channels, timed_programs, dropped = merge_epg_sources(timed_sources)
+    return {c.id: c for c in channels}, [t.program for t in timed_programs], dropped + malformed
+
+
 class EPGManager:
     """Main manager class for EPG operations"""
     
@@ -358,15 +400,38 @@ class EPGManager:
         xml_path = self.downloader.download(url, force)
         self.load_from_file(xml_path)
     
+    def _load_source(self, source: Dict, force: bool) -> Tuple[Dict[str, Channel], List[Program]]:
+        """Download and parse one source without touching manager state"""
+        print(f"\nLoading source: {source['name']}")
+        xml_path = self.downloader.download(source['url'], force)
+        return EPGParser(xml_path=xml_path).parse()
+    
     def load_all_sources(self, force: bool = False):
-        """Load EPG from all enabled sources"""
-        for source in sorted(self.config.sources, key=lambda x: x.get('priority', 1)):
-            if source.get('enabled', True):
-                try:
-                    print(f"\nLoading source: {source['name']}")
-                    self.load_from_url(source['url'], force)
-                except Exception as e:
-                    print(f"Error loading source {source['name']}: {e}")
+        """Load all enabled sources concurrently and merge them by priority.
+        
+        Lower priority numbers win. Lower-priority sources only fill time slots
+        a channel does not already have; overlapping programmes are dropped.
+        """
+        sources = sorted(
+            (s for s in self.config.sources if s.get('enabled', True)),
+            key=lambda x: x.get('priority', 1)
+        )
+        if not sources:
+            return
+        
+        with ThreadPoolExecutor(max_workers=min(8, len(sources))) as pool:
+            futures = [pool.submit(self._load_source, source, force) for source in sources]
+        
+        loaded = []
+        for source, future in zip(sources, futures):
+            try:
+                loaded.append(future.result())
+            except Exception as e:
+                print(f"Error loading source {source['name']}: {e}")
+        
+        self.channels, self.programs, dropped = merge_sources(loaded)
+        print(f"Merged {len(loaded)} sources: {len(self.channels)} channels, "
+              f"{len(self.programs)} programs ({dropped} overlapping dropped)")
     
     def get_channel(self, channel_id: str) -> Optional[Channel]:
         """Get channel by ID"""
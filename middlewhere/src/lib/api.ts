@@ -94,8 +94,8 @@ async function refreshAccessToken(): Promise<boolean> {
         }
 
         const data = await response.json();
-        accessToken = data.accessToken;
-        localStorage.setItem('accessToken', data.accessToken);
+        // Refresh tokens are single use; keep the replacement
+        setTokens(data.accessToken, data.refreshToken);
         return true;
     } catch {
         clearTokens();
@@ -148,11 +148,19 @@ export interface CompanyLoginResponse {
     company: Company;
 }
 
+export interface ImageRendition {
+    url: string;
+    width: number;
+    height: number;
+    format: 'webp' | 'jpg' | 'png';
+}
+
 export interface Channel {
     id: string;
     name: string;
     group?: string;
     logo?: string;
+    imageSet?: Record<string, ImageRendition[]>;
     streamUrl: string;
     drm?: { type: string; licenseUrl: string };
     lang?: string[];
@@ -247,6 +255,7 @@ export interface Movie {
         landscape?: string;
         hero?: string;
     };
+    imageSet?: Record<string, ImageRendition[]>;
     media?: {
         streamUrl?: string;
         trailerUrl?: string;
@@ -270,6 +279,27 @@ export interface MoviesListResponse {
     nextOffset?: number;
 }
 
+export interface EnrichmentJob {
+    id: string;
+    status: 'pending' | 'running' | 'completed' | 'failed' | 'cancelled';
+    missingOnly: boolean;
+    total: number;
+    processed: number;
+    enriched: number;
+    failed: number;
+    errors: string[];
+    createdAt?: string;
+    updatedAt?: string;
+}
+
+export interface ImageUploadTicket {
+    uploadUrl: string;
+    fields: Record<string, string>;
+    key: string;
+    url: string;
+    expiresIn: number;
+}
+
 // EPG Types
 export interface EPGSource {
     id: string;
@@ -301,6 +331,8 @@ export interface EPGSyncResult {
     programs_parsed: number;
     mappings_applied: number;
     errors: string[];
+    sources_merged?: number;
+    duplicates_dropped?: number;
 }
 
 export interface ChannelEPGMapping {
@@ -557,8 +589,16 @@ export const api = {
                 method: 'POST',
             }),
 
-        enrichAll: () =>
-            apiRequest<{ status: string; enriched: number; failed: number; total: number }>('/api/admin/movies/enrich-all', {
+        enrichAll: (missingOnly = false) =>
+            apiRequest<EnrichmentJob>(`/api/admin/movies/enrich-all?missingOnly=${missingOnly}`, {
+                method: 'POST',
+            }),
+
+        enrichJob: (jobId: string) =>
+            apiRequest<EnrichmentJob>(`/api/admin/movies/enrich-jobs/${jobId}`),
+
+        cancelEnrichJob: (jobId: string) =>
+            apiRequest<EnrichmentJob>(`/api/admin/movies/enrich-jobs/${jobId}/cancel`, {
                 method: 'POST',
             }),
     },
@@ -591,6 +631,11 @@ export const api = {
             });
         },
 
+        syncAll: (force?: boolean) =>
+            apiRequest<EPGSyncResult>(`/api/admin/epg/sync-all${force ? '?force=true' : ''}`, {
+                method: 'POST',
+            }),
+
         listChannels: (url?: string) => {
             const query = url ? `?url=${encodeURIComponent(url)}` : '';
             return apiRequest<{ channels: EPGChannel[]; total: number }>(`/api/admin/epg/channels${query}`);
@@ -629,19 +674,20 @@ export const api = {
 
     // Upload
     upload: {
+        // Uploads go straight to S3 with a presigned POST; the API only
+        // issues the policy and confirms the object
         image: async (file: File): Promise<{ url: string }> => {
-            const formData = new FormData();
-            formData.append('file', file);
+            const ticket = await apiRequest<ImageUploadTicket>('/api/admin/upload-image/presign', {
+                method: 'POST',
+                body: JSON.stringify({ contentType: file.type }),
+            });
 
-            const url = `${API_BASE_URL}/api/admin/upload-image`;
-            const headers: HeadersInit = {};
-            if (accessToken) {
-                headers['Authorization'] = `Bearer ${accessToken}`;
-            }
+            const formData = new FormData();
+            Object.entries(ticket.fields).forEach(([name, value]) => formData.append(name, value));
+            formData.append('file', file);  // S3 requires the file to be the last field
 
-            const response = await fetch(url, {
+            const response = await fetch(ticket.uploadUrl, {
                 method: 'POST',
-                headers,
                 body: formData,
             });
 
@@ -649,7 +695,10 @@ export const api = {
                 throw new Error(`Upload failed: ${response.status}`);
             }
 
-            return response.json();
+            return apiRequest<{ url: string }>('/api/admin/upload-image/confirm', {
+                method: 'POST',
+                body: JSON.stringify({ key: ticket.key }),
+            });
         },
     },
 
@@ -786,7 +835,7 @@ export interface Message {
     target_ids: string[];
     is_active: boolean;
     created_at?: string;
-    read_by: string[];
+    read_count: number;
 }
 
 export interface MessageListResponse {
@@ -382,8 +382,16 @@ export default function Movies() {
                             onClick={async () => {
                                 try {
                                     toast.info("Fetching metadata from TMDB... This may take a while.");
-                                    const result = await api.movies.enrichAll();
-                                    toast.success(`Enriched ${result.enriched} movies (${result.failed} failed)`);
+                                    let job = await api.movies.enrichAll();
+                                    while (job.status === "pending" || job.status === "running") {
+                                        await new Promise((resolve) => setTimeout(resolve, 2000));
+                                        job = await api.movies.enrichJob(job.id);
+                                    }
+                                    if (job.status === "completed") {
+                                        toast.success(`Enriched ${job.enriched} movies (${job.failed} failed)`);
+                                    } else {
+                                        toast.error(`Metadata job ${job.status} after ${job.processed} of ${job.total} movies`);
+                                    }
                                     fetchMovies();
                                 } catch (error) {
                                     toast.error("Failed to enrich movies. Make sure TMDB_API_KEY is set.");
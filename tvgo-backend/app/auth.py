@@ -1,13 +1,14 @@
+import hashlib
 import secrets
 from datetime import datetime, timedelta
 from types import SimpleNamespace
 from typing import Optional
-from uuid import uuid4
 
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from pymongo import DESCENDING
 from pymongo.database import Database
 
 from . import schemas
@@ -48,26 +49,85 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def create_refresh_token(db: Database, username: str) -> tuple[str, datetime]:
+# Refresh tokens are stored as SHA-256 hashes in the uniquely indexed
+# ``token_hash`` (so lookups are a point read and a leaked collection holds no
+# usable tokens), expire through a TTL index on ``expires_at`` and are rotated
+# on use. A device's token document is keyed on its owner and device, so a
+# login replaces the previous token with one upsert; logins without a device
+# (browsers) are keyed on the hash and keep at most MAX_REFRESH_TOKENS_PER_OWNER.
+MAX_REFRESH_TOKENS_PER_OWNER = 10
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def device_token_id(owner: dict, device: str) -> str:
+    """``_id`` of the refresh token document for one owner's device."""
+    return ":".join([*(str(value) for value in owner.values()), device])
+
+
+def _issue_refresh_token(
+    db: Database, collection: str, owner: dict, device: Optional[str] = None
+) -> tuple[str, datetime]:
     token = secrets.token_urlsafe(48)
-    expires_at = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
+    token_hash = hash_refresh_token(token)
+    now = datetime.utcnow()
+    expires_at = now + timedelta(days=settings.refresh_token_expire_days)
+    tokens = db[collection]
     document = {
-        "_id": str(uuid4()),
-        "token": token,
-        "username": username,
+        "_id": device_token_id(owner, device) if device else token_hash,
+        "token_hash": token_hash,
+        **owner,
+        "device": device,
         "expires_at": expires_at,
-        "created_at": datetime.utcnow(),
+        "created_at": now,
     }
-    db["refresh_tokens"].insert_one(document)
+    if device:
+        # Replaces the device's previous token in a single command
+        tokens.replace_one({"_id": document["_id"]}, document, upsert=True)
+    else:
+        tokens.insert_one(document)
+        surplus = [
+            older["_id"]
+            for older in tokens.find({**owner, "device": None}, {"_id": 1})
+            .sort("created_at", DESCENDING)
+            .skip(MAX_REFRESH_TOKENS_PER_OWNER)
+        ]
+        if surplus:
+            tokens.delete_many({"_id": {"$in": surplus}})
     return token, expires_at
 
 
+def create_refresh_token(db: Database, username: str, device: Optional[str] = None) -> tuple[str, datetime]:
+    return _issue_refresh_token(db, "refresh_tokens", {"username": username}, device)
+
+
 def get_refresh_token(db: Database, refresh_token: str) -> Optional[dict]:
-    return db["refresh_tokens"].find_one({"token": refresh_token})
+    return db["refresh_tokens"].find_one({
+        "token_hash": hash_refresh_token(refresh_token),
+        "expires_at": {"$gt": datetime.utcnow()},
+    })
+
+
+def rotate_refresh_token(db: Database, refresh_token: str) -> Optional[tuple[dict, str, datetime]]:
+    """Consume a refresh token and issue its replacement.
+
+    Returns (consumed document, new token, new expiry), or None if the token is
+    unknown, expired or was already used.
+    """
+    stored = db["refresh_tokens"].find_one_and_delete({
+        "token_hash": hash_refresh_token(refresh_token),
+        "expires_at": {"$gt": datetime.utcnow()},
+    })
+    if not stored:
+        return None
+    token, expires_at = create_refresh_token(db, stored["username"], stored.get("device"))
+    return stored, token, expires_at
 
 
 def revoke_refresh_token(db: Database, refresh_token: str) -> None:
-    db["refresh_tokens"].delete_one({"token": refresh_token})
+    db["refresh_tokens"].delete_one({"token_hash": hash_refresh_token(refresh_token)})
 
 
 def get_user(db: Database, username: str) -> Optional[schemas.UserInDB]:
@@ -131,6 +191,17 @@ async def get_optional_user(
     return get_user(db, username)
 
 
+def decode_subscriber_token(token: str) -> Optional[dict]:
+    """Return the claims of a valid subscriber token without touching the database."""
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
+    except JWTError:
+        return None
+    if payload.get("role") != "subscriber" or not payload.get("id"):
+        return None
+    return payload
+
+
 async def get_current_subscriber(
     token: str = Depends(oauth2_scheme),
     db: Database = Depends(get_db),
@@ -157,14 +228,18 @@ async def get_current_subscriber(
         raise unauthorized("Subscriber not found")
     
     # Check if subscriber is still active
-    status = subscriber.get("status", "active")
-    allowed_statuses = ["active", "bonus", "test"]
-    if status not in allowed_statuses and not subscriber.get("is_active", True):
+    if not is_subscriber_active(subscriber):
         raise forbidden("Account is inactive")
     
     return subscriber
 
 
+def is_subscriber_active(subscriber: dict) -> bool:
+    """The rule get_current_subscriber applies to a subscriber document."""
+    status = subscriber.get("status", "active")
+    return status in ("active", "bonus", "test") or subscriber.get("is_active", True)
+
+
 async def get_optional_subscriber(
     token: Optional[str] = Depends(optional_oauth2_scheme),
     db: Database = Depends(get_db),
@@ -223,17 +298,7 @@ def create_company_access_token(company: dict, expires_delta: Optional[timedelta
 
 def create_company_refresh_token(db: Database, company_id: str) -> tuple[str, datetime]:
     """Create a refresh token for a company."""
-    token = secrets.token_urlsafe(48)
-    expires_at = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
-    document = {
-        "_id": str(uuid4()),
-        "token": token,
-        "company_id": company_id,
-        "expires_at": expires_at,
-        "created_at": datetime.utcnow(),
-    }
-    db["company_refresh_tokens"].insert_one(document)
-    return token, expires_at
+    return _issue_refresh_token(db, "company_refresh_tokens", {"company_id": company_id})
 
 
 async def get_current_company(
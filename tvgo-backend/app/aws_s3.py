@@ -1,156 +1,137 @@
+import threading
 import uuid
 import os
-from pathlib import Path
-from typing import Optional
 
-import boto3
-from botocore.client import Config
-from botocore.exceptions import NoCredentialsError
-from fastapi import HTTPException, UploadFile
+from fastapi import HTTPException
 from .config import settings
 
 
-# Local upload directory (fallback only)
-UPLOAD_DIR = Path("/tmp/tvgo-uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Direct browser uploads (presigned POST)
+PRESIGNED_UPLOAD_EXPIRES = 300  # seconds
+MAX_IMAGE_UPLOAD_BYTES = 20 * 1024 * 1024
+# Every key names unique content (a hash or a fresh uuid), so it never changes
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+}
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def _region() -> str:
+    return settings.aws_region or os.environ.get('AWS_REGION', 'eu-central-1')
 
 
 def get_s3_client():
     """
-    Get S3 client. Works with:
+    Get the shared S3 client (created once; boto3 clients are thread safe). Works with:
     1. Explicit credentials from settings (aws_access_key_id, aws_secret_access_key)
     2. IAM role (when running on AWS Lambda/ECS - no explicit credentials needed)
     3. Environment variables (AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY)
+
+    ``settings.s3_endpoint_url`` points it at an S3-compatible store such as MinIO.
     """
+    global _s3_client
     if not settings.s3_bucket_name:
         return None
+    if _s3_client is not None:
+        return _s3_client
 
-    region = settings.aws_region or os.environ.get('AWS_REGION', 'eu-central-1')
+    # boto3 adds a few hundred ms to a cold start; only load it when S3 is used
+    import boto3
+    from botocore.client import Config
 
+    config = Config(signature_version="s3v4")
     try:
-        # If explicit credentials are provided, use them
-        if settings.aws_access_key_id and settings.aws_secret_access_key:
-            session = boto3.session.Session(
-                aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key,
-                region_name=region,
-            )
-            return session.client("s3", config=Config(signature_version="s3v4"))
-        else:
-            # Use default credential chain (IAM role, env vars, etc.)
-            return boto3.client("s3", region_name=region, config=Config(signature_version="s3v4"))
+        with _s3_client_lock:
+            if _s3_client is None:
+                # If explicit credentials are provided, use them
+                if settings.aws_access_key_id and settings.aws_secret_access_key:
+                    session = boto3.session.Session(
+                        aws_access_key_id=settings.aws_access_key_id,
+                        aws_secret_access_key=settings.aws_secret_access_key,
+                        region_name=_region(),
+                    )
+                else:
+                    # Use default credential chain (IAM role, env vars, etc.)
+                    session = boto3.session.Session(region_name=_region())
+                _s3_client = session.client("s3", endpoint_url=settings.s3_endpoint_url, config=config)
     except Exception as e:
         print(f"Failed to create S3 client: {e}")
         return None
+    return _s3_client
 
 
-async def upload_image_to_s3(file: UploadFile) -> str:
-    """Upload image to S3. Requires S3 to be configured."""
-    s3 = get_s3_client()
-    extension = (file.filename or "image").split(".")[-1] or "png"
-    unique_id = uuid.uuid4().hex
-    region = settings.aws_region or os.environ.get('AWS_REGION', 'eu-central-1')
-
-    if not s3 or not settings.s3_bucket_name:
-        raise HTTPException(
-            status_code=500,
-            detail="S3 is not configured. Please set S3_BUCKET_NAME environment variable."
-        )
-
-    key = f"images/{unique_id}.{extension}"
+def public_url(key: str) -> str:
+    """URL clients load an uploaded object from."""
     bucket = settings.s3_bucket_name
-
-    try:
-        s3.upload_fileobj(
-            Fileobj=file.file,
-            Bucket=bucket,
-            Key=key,
-            ExtraArgs={"ContentType": file.content_type or "application/octet-stream"},
-        )
-    except NoCredentialsError:
-        raise HTTPException(
-            status_code=500,
-            detail="AWS credentials not configured. Please set up IAM role or AWS credentials."
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to upload to S3: {e}")
-
     if settings.s3_public_base_url:
         base = str(settings.s3_public_base_url).rstrip("/")
         return f"{base}/{key}"
-    else:
-        return f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
+    if settings.s3_endpoint_url:
+        return f"{settings.s3_endpoint_url.rstrip('/')}/{bucket}/{key}"
+    return f"https://{bucket}.s3.{_region()}.amazonaws.com/{key}"
 
 
-async def upload_image_from_url(image_url: str, prefix: str = "logos") -> Optional[str]:
-    """
-    Download image from external URL and upload to S3.
-    Used for EPG logos that need to be stored in S3.
-
-    Args:
-        image_url: External URL of the image to download
-        prefix: S3 key prefix (folder name)
-
-    Returns:
-        S3 URL of uploaded image, or None if upload failed
-    """
-    import urllib.request
-    from io import BytesIO
-
-    if not image_url:
-        return None
-
+def _require_s3():
     s3 = get_s3_client()
-    region = settings.aws_region or os.environ.get('AWS_REGION', 'eu-central-1')
-
     if not s3 or not settings.s3_bucket_name:
-        print(f"S3 not configured, skipping upload from URL: {image_url}")
-        return None
-
-    try:
-        # Download image from external URL
-        req = urllib.request.Request(
-            image_url,
-            headers={'User-Agent': 'Mozilla/5.0 (compatible; tvGO/1.0)'}
-        )
-        with urllib.request.urlopen(req, timeout=30) as response:
-            image_data = response.read()
-            content_type = response.headers.get('Content-Type', 'image/png')
-
-        # Determine file extension from content type
-        ext_map = {
-            'image/png': 'png',
-            'image/jpeg': 'jpg',
-            'image/jpg': 'jpg',
-            'image/gif': 'gif',
-            'image/webp': 'webp',
-            'image/svg+xml': 'svg',
-        }
-        extension = ext_map.get(content_type, 'png')
-
-        # Also try to get extension from URL
-        if '.' in image_url.split('/')[-1]:
-            url_ext = image_url.split('.')[-1].split('?')[0].lower()
-            if url_ext in ['png', 'jpg', 'jpeg', 'gif', 'webp', 'svg']:
-                extension = url_ext if url_ext != 'jpeg' else 'jpg'
-
-        unique_id = uuid.uuid4().hex
-        key = f"{prefix}/{unique_id}.{extension}"
-        bucket = settings.s3_bucket_name
-
-        s3.upload_fileobj(
-            Fileobj=BytesIO(image_data),
-            Bucket=bucket,
-            Key=key,
-            ExtraArgs={"ContentType": content_type},
+        raise HTTPException(
+            status_code=500,
+            detail="S3 is not configured. Please set S3_BUCKET_NAME environment variable."
         )
+    return s3
 
-        if settings.s3_public_base_url:
-            base = str(settings.s3_public_base_url).rstrip("/")
-            return f"{base}/{key}"
-        else:
-            return f"https://{bucket}.s3.{region}.amazonaws.com/{key}"
 
+def create_presigned_image_upload(content_type: str) -> dict:
+    """Issue a short-lived policy letting the browser POST one image straight to S3.
+
+    The policy pins the key, the content type and a size limit, so the upload
+    never passes through (or occupies) an API worker.
+    """
+    extension = IMAGE_EXTENSIONS.get(content_type)
+    if not extension:
+        raise HTTPException(status_code=400, detail=f"Unsupported image type: {content_type}")
+    s3 = _require_s3()
+
+    key = f"images/{uuid.uuid4().hex}.{extension}"
+    post = s3.generate_presigned_post(
+        Bucket=settings.s3_bucket_name,
+        Key=key,
+        Fields={"Content-Type": content_type, "Cache-Control": CACHE_CONTROL},
+        Conditions=[
+            {"Content-Type": content_type},
+            {"Cache-Control": CACHE_CONTROL},
+            ["content-length-range", 1, MAX_IMAGE_UPLOAD_BYTES],
+        ],
+        ExpiresIn=PRESIGNED_UPLOAD_EXPIRES,
+    )
+    return {
+        "uploadUrl": post["url"],
+        "fields": post["fields"],
+        "key": key,
+        "url": public_url(key),
+        "expiresIn": PRESIGNED_UPLOAD_EXPIRES,
+    }
+
+
+def confirm_image_upload(key: str) -> str:
+    """Check that a presigned upload landed; return its public URL."""
+    if not key.startswith("images/") or ".." in key:
+        raise HTTPException(status_code=400, detail="Invalid upload key")
+    s3 = _require_s3()
+    try:
+        head = s3.head_object(Bucket=settings.s3_bucket_name, Key=key)
     except Exception as e:
-        print(f"Failed to download/upload logo from {image_url}: {e}")
-        return None
+        error_code = getattr(e, "response", {}).get("Error", {}).get("Code")
+        if error_code in ("404", "NoSuchKey", "NotFound"):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        raise HTTPException(status_code=500, detail=f"Failed to check upload: {e}")
+    if head.get("ContentType") not in IMAGE_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Uploaded object is not an image")
+    return public_url(key)
@@ -0,0 +1,244 @@
+"""
+Two-tier cache for admin and public list endpoints.
+
+Each ``Cache`` is a namespace with an in-process LRU tier in front of an
+optional shared tier (Redis, configured through ``settings.cache_url``;
+``memory://`` selects an in-process stand-in for tests and single workers).
+
+Invalidation is tag based: every entry records the versions of its tags when
+it was written, and ``invalidate_tag`` bumps a tag's version. Tag versions live
+in the shared tier when there is one, so an invalidation made by one worker or
+Lambda instance is seen by all of them on their next read. Loads are
+single-flight per key within a process, and hit/miss counters are kept per
+namespace.
+
+Values must be JSON-compatible (they are stored with orjson in the shared
+tier) and must not be mutated by callers.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+from .config import settings
+
+try:  # pragma: no cover - optional dependency
+    import redis  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None  # type: ignore
+
+KEY_PREFIX = "tvgo:cache"
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Process-local stand-in for the shared tier, mirroring the Redis calls used."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.monotonic()
+        with self._lock:
+            values = []
+            for key in keys:
+                entry = self._data.get(key)
+                if entry and (entry[1] is None or entry[1] > now):
+                    values.append(entry[0])
+                else:
+                    values.append(None)
+            return values
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            current = int(self._data.get(key, (b"0", None))[0]) + 1
+            self._data[key] = (str(current).encode(), None)
+            return current
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self._client.mget(keys)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+
+def _create_backend(url: Optional[str]):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if redis is None:
+        print("cache_url is set but the redis package is not installed; using the local cache tier only")
+        return None
+    return RedisBackend(url)
+
+
+_backend = _create_backend(settings.cache_url)
+# Tag versions when there is no shared tier
+_local_tags: Dict[str, int] = {}
+_local_tags_lock = threading.Lock()
+
+
+def _tag_key(tag: str) -> str:
+    return f"{KEY_PREFIX}:tag:{tag}"
+
+
+def _tag_versions(tags: Tuple[str, ...]) -> Tuple[int, ...]:
+    if _backend is not None:
+        try:
+            return tuple(int(v or 0) for v in _backend.get_many([_tag_key(t) for t in tags]))
+        except Exception as e:
+            print(f"Shared cache unavailable, skipping cache: {e}")
+            return (-1,) * len(tags)  # never matches a stored entry
+    return tuple(_local_tags.get(t, 0) for t in tags)
+
+
+def invalidate_tag(tag: str) -> None:
+    """Invalidate every entry, in every namespace and process, carrying ``tag``."""
+    if _backend is not None:
+        try:
+            _backend.incr(_tag_key(tag))
+            return
+        except Exception as e:
+            print(f"Failed to invalidate cache tag {tag}: {e}")
+    with _local_tags_lock:
+        _local_tags[tag] = _local_tags.get(tag, 0) + 1
+
+
+def tenant_tag(company_id) -> str:
+    return f"tenant:{company_id}"
+
+
+class Cache:
+    def __init__(self, namespace: str, ttl: float, max_entries: int = 512):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        # key -> (expires_at, value, tag versions)
+        self._local: "OrderedDict[str, Tuple[float, Any, Tuple[int, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> [lock, loads waiting on or holding it]; removed with the last one
+        self._flights: Dict[str, list] = {}
+        _registry[namespace] = self
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], tags: Iterable[str] = ()) -> Any:
+        """Return the cached value for ``key``, calling ``loader`` once on a miss."""
+        tags = (f"ns:{self.namespace}",) + tuple(tags)
+        value = self._lookup(key, tags)
+        if value is not _MISSING:
+            return value
+
+        with self._flight(key):
+            value = self._lookup(key, tags)
+            if value is not _MISSING:
+                return value
+            self.misses += 1
+            # Read versions before loading so an invalidation during the load wins
+            versions = _tag_versions(tags)
+            value = loader()
+            if -1 in versions:
+                return value  # Shared tier is down: serve uncached
+            self._remember(key, value, versions)
+            if _backend is not None:
+                try:
+                    payload = orjson.dumps({"v": value, "t": versions})
+                    _backend.set(self._shared_key(key), payload, self.ttl)
+                except Exception as e:
+                    print(f"Failed to write shared cache entry {self._shared_key(key)}: {e}")
+            return value
+
+    def clear(self) -> None:
+        invalidate_tag(f"ns:{self.namespace}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "entries": len(self._local),
+            "hits": self.hits,
+            "sharedHits": self.shared_hits,
+            "misses": self.misses,
+            "hitRate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+        }
+
+    def _shared_key(self, key: str) -> str:
+        return f"{KEY_PREFIX}:{self.namespace}:{key}"
+
+    def _lookup(self, key: str, tags: Tuple[str, ...]) -> Any:
+        versions = _tag_versions(tags)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] > time.monotonic() and entry[2] == versions:
+                self._local.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if _backend is None or -1 in versions:
+            return _MISSING
+        try:
+            raw = _backend.get_many([self._shared_key(key)])[0]
+        except Exception as e:
+            print(f"Failed to read shared cache entry {self._shared_key(key)}: {e}")
+            return _MISSING
+        if raw is None:
+            return _MISSING
+        payload = orjson.loads(raw)
+        if tuple(payload["t"]) != versions:
+            return _MISSING
+        self._remember(key, payload["v"], versions)
+        self.shared_hits += 1
+        return payload["v"]
+
+    def _remember(self, key: str, value: Any, versions: Tuple[int, ...]) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl, value, versions)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    @contextmanager
+    def _flight(self, key: str) -> Iterator[None]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = [threading.Lock(), 0]
+            flight[1] += 1
+        try:
+            with flight[0]:
+                yield
+        finally:
+            with self._lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    del self._flights[key]
+
+
+_registry: Dict[str, Cache] = {}
+
+
+def cache_stats() -> List[dict]:
+    return [cache.stats() for cache in _registry.values()]
+
+
+def clear_all() -> None:
+    for cache in list(_registry.values()):
+        cache.clear()
@@ -0,0 +1,161 @@
+"""
+Per-tenant catalog versions and HTTP validators for public endpoints.
+
+Every admin write that changes the catalog subscribers see bumps the owning
+tenant's counter in ``catalog_versions`` (writes that are not tenant scoped, such as
+rails or EPG mappings, bump the ``global`` counter). Public endpoints derive a
+weak ETag from those counters so idle boxes re-polling an unchanged lineup get
+a 304 without the payload being rebuilt.
+"""
+import hashlib
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from pymongo import ReturnDocument
+from pymongo.database import Database
+
+from .auth import decode_subscriber_token, is_subscriber_active, optional_oauth2_scheme
+from .cache import invalidate_tag, tenant_tag
+from .config import settings
+from .database import get_db
+from .events import publish_catalog_changed
+
+GLOBAL_SCOPE = "global"
+VERSION_TTL = 5.0  # seconds a version read from Mongo is trusted locally
+
+# scope -> (version, monotonic timestamp of the read)
+_versions: dict[str, tuple[int, float]] = {}
+
+
+def _scope(company_id) -> str:
+    return str(company_id) if company_id else GLOBAL_SCOPE
+
+
+def get_catalog_version(db: Database, company_id=None) -> int:
+    key = _scope(company_id)
+    cached = _versions.get(key)
+    if cached and (time.monotonic() - cached[1]) < VERSION_TTL:
+        return cached[0]
+    document = db["catalog_versions"].find_one({"_id": key}, {"version": 1})
+    version = document.get("version", 0) if document else 0
+    _versions[key] = (version, time.monotonic())
+    return version
+
+
+def cached_catalog_version(company_id=None) -> Optional[int]:
+    """The version this process last read or wrote, however old; None if unknown."""
+    cached = _versions.get(_scope(company_id))
+    return cached[0] if cached else None
+
+
+def remember_catalog_version(company_id, version: int) -> None:
+    _versions[_scope(company_id)] = (version, time.monotonic())
+
+
+def forget_catalog_version(company_id=None) -> None:
+    """Drop the locally cached version so the next read goes to Mongo."""
+    _versions.pop(_scope(company_id), None)
+
+
+def bump_catalog_version(db: Database, company_id=None) -> int:
+    """Mark the tenant's catalog (or the global one) as changed.
+
+    Also drops the tenant's entries from the shared list caches.
+    """
+    key = _scope(company_id)
+    invalidate_tag(tenant_tag(key))
+    document = db["catalog_versions"].find_one_and_update(
+        {"_id": key},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    _versions[key] = (document["version"], time.monotonic())
+    publish_catalog_changed(company_id or None, document["version"])
+    return document["version"]
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # "*" is not honoured: it would answer 304 without the representation
+    # (or the caller's access to it) ever having been checked
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def catalog_validators(
+    scope: str,
+    require_subscriber: bool = True,
+    extra: Optional[Callable[[Database, Optional[str]], str]] = None,
+) -> Callable:
+    """Dependency adding ETag/Cache-Control/Vary and answering If-None-Match.
+
+    Use it as a route-level dependency so it runs before the endpoint: a
+    matching ``If-None-Match`` raises a bodyless 304 that never touches the
+    catalog collections. With ``require_subscriber`` (routes behind
+    ``get_current_subscriber``) a 304 is only given to a valid token of an
+    active subscriber, checked with one point read; anything else falls
+    through to the endpoint's auth. ``extra`` adds a validator for response
+    content that changes without a catalog write (the tenant's now/next
+    overlay); it is called with the database and the tenant id.
+    """
+
+    def dependency(
+        request: Request,
+        response: Response,
+        token: Optional[str] = Depends(optional_oauth2_scheme),
+        db: Database = Depends(get_db),
+    ) -> None:
+        claims = decode_subscriber_token(token) if token else None
+        if token and claims is None:
+            return  # Invalid token: let the endpoint's auth reject it
+        if require_subscriber and claims is None:
+            return  # No token: let the endpoint's auth reject it
+        # Per-user favourites are not covered by the catalog version
+        if request.query_params.get("favorite") in ("true", "1"):
+            return
+
+        subscriber_id = claims.get("id") if claims else None
+        company_id = claims.get("company_id") if claims else None
+        entitlements = ""
+        if subscriber_id and (require_subscriber or not company_id):
+            # Deactivated accounts must reach the endpoint's auth; tokens
+            # issued before company_id was added to the claims need the tenant
+            subscriber = db["subscribers"].find_one(
+                {"_id": subscriber_id}, {"company_id": 1, "status": 1, "is_active": 1, "package_ids": 1}
+            )
+            if not subscriber or not is_subscriber_active(subscriber):
+                return
+            company_id = subscriber.get("company_id")
+            # What this subscriber may see, so a package or status change
+            # only rolls their own ETags instead of the tenant's version
+            entitlements = f'{subscriber.get("status")}:{sorted(subscriber.get("package_ids") or [])}'
+
+        parts = [
+            scope,
+            str(get_catalog_version(db, company_id) if company_id else 0),
+            str(get_catalog_version(db)),
+            str(subscriber_id or ""),
+            entitlements,
+            request.url.path,
+            str(sorted(request.query_params.multi_items())),
+            extra(db, company_id) if extra else "",
+        ]
+        digest = hashlib.blake2b(":".join(parts).encode(), digest_size=12).hexdigest()
+        etag = f'W/"{digest}"'
+
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"private, max-age={settings.catalog_cache_max_age}",
+            "Vary": "Authorization",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
@@ -1,8 +1,13 @@
+import os
 from typing import Optional
 
 from pydantic import AnyHttpUrl
 from pydantic_settings import BaseSettings
 
+# Set by the Lambda runtime. Instances are frozen between invocations, so
+# background threads and per-cold-start setup are off by default there.
+ON_LAMBDA = bool(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+
 class Settings(BaseSettings):
     app_name: str = "tvGO Middleware"
     api_v1_prefix: str = "/api"
@@ -18,12 +23,44 @@ class Settings(BaseSettings):
     admin_username: str = "admin"
     admin_password: str = "admin"
 
+    # Public catalog HTTP caching (seconds clients may reuse a response before revalidating)
+    catalog_cache_max_age: int = 30
+
+    # Shared cache tier: redis://host:6379/0, or memory:// for an in-process stand-in.
+    # Unset keeps every worker on its local LRU tier only.
+    cache_url: Optional[str] = None
+    # Invalidate caches from Mongo change streams (polling on standalone servers)
+    cache_invalidation_watcher: bool = not ON_LAMBDA
+    cache_invalidation_poll_seconds: float = 5.0
+    # Refresh the in-memory now/next overlays at programme boundaries (otherwise a
+    # read past a boundary refreshes its tenant's overlay)
+    epg_now_next_scheduler: bool = not ON_LAMBDA
+    # Create indexes at startup (on Lambda, run scripts/ensure_indexes.py on deploy)
+    ensure_indexes_on_startup: bool = not ON_LAMBDA
+    # Render TV-sized logo/artwork renditions in the background (needs Pillow and S3;
+    # on Lambda, run scripts/build_image_renditions.py instead)
+    image_renditions: bool = not ON_LAMBDA
+    image_rendition_workers: int = 2
+
+    # Request metrics: per-route latency and Mongo command accounting, served on /metrics
+    metrics_enabled: bool = True
+    # Bearer token /metrics requires; while unset, /metrics is not served
+    metrics_token: Optional[str] = None
+    # Log Mongo commands at least this slow, with their filter shape
+    slow_query_ms: float = 100.0
+    # Log a request that repeats one query shape this many times (an N+1 loop)
+    metrics_n_plus_one_threshold: int = 10
+    # Add a Server-Timing header (db and app time) to every response
+    server_timing: bool = False
+
     # AWS S3
     aws_region: Optional[str] = None
     aws_access_key_id: Optional[str] = None
     aws_secret_access_key: Optional[str] = None
     s3_bucket_name: Optional[str] = None
     s3_public_base_url: Optional[AnyHttpUrl] = None  # e.g. https://cdn.example.com/
+    # S3-compatible endpoint instead of AWS, e.g. http://localhost:9000 for MinIO
+    s3_endpoint_url: Optional[str] = None
 
     model_config = {
         "env_file": ".env",
@@ -1,18 +1,34 @@
-from typing import Iterator
+import threading
+from typing import Iterator, Optional
 import certifi
 
 from pymongo import MongoClient
 from pymongo.database import Database
 
 from .config import settings
+from .metrics import command_listener
 
-# Use certifi certificates to fix SSL verification on macOS
-_client = MongoClient(settings.mongo_uri, tlsCAFile=certifi.where())
-_database = _client[settings.mongo_db_name]
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
 
 
 def get_database() -> Database:
-    return _database
+    """Shared database handle; the client is created on first use.
+
+    Creating it lazily keeps SRV/DNS resolution out of import time, which
+    matters for Lambda cold starts.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Use certifi certificates to fix SSL verification on macOS
+                _client = MongoClient(
+                    settings.mongo_uri,
+                    tlsCAFile=certifi.where(),
+                    event_listeners=[command_listener] if settings.metrics_enabled else None,
+                )
+    return _client[settings.mongo_db_name]
 
 
 def get_db() -> Iterator[Database]:
@@ -22,3 +38,33 @@ def get_db() -> Iterator[Database]:
     finally:
         # MongoClient is managed globally; no explicit close per request
         pass
+
+
+def ensure_indexes(db: Database) -> None:
+    """Create the indexes hot read paths rely on. Safe to call repeatedly."""
+    db["epg_programs"].create_index([("channel_id", 1), ("start", 1)])
+    db["channels"].create_index([("company_id", 1), ("order", 1)])
+    db["channels"].create_index([("company_id", 1), ("id", 1)])
+    db["channels"].create_index([("company_id", 1), ("metadata.streamer_name", 1)])
+    # The now/next overlay lists a tenant's EPG channels with a distinct scan
+    db["channels"].create_index([("company_id", 1), ("epg_id", 1)])
+    db["enrichment_jobs"].create_index([("company_id", 1), ("status", 1)])
+    db["tmdb_cache"].create_index("expires_at", expireAfterSeconds=0)
+    # Renditions are looked up by source URL before anything is downloaded
+    db["image_renditions"].create_index([("sources", 1), ("kind", 1)])
+    # Read receipts: a subscriber's reads, and a message's readers
+    db["message_reads"].create_index([("subscriber_id", 1), ("message_id", 1)])
+    db["message_reads"].create_index("message_id")
+    # Group membership lookups (multikey) and inbox targeting
+    db["user_groups"].create_index([("company_id", 1), ("user_ids", 1)])
+    db["messages"].create_index([("company_id", 1), ("target_ids", 1)])
+    # Refresh tokens: token_hash holds the token's hash (uniquely indexed below);
+    # _id is "<owner>:<device>" for a device's token and the hash itself for a
+    # browser's. Expired ones are removed by TTL
+    db["refresh_tokens"].create_index("expires_at", expireAfterSeconds=0)
+    db["refresh_tokens"].create_index([("username", 1), ("device", 1), ("created_at", -1)])
+    db["company_refresh_tokens"].create_index("expires_at", expireAfterSeconds=0)
+    db["company_refresh_tokens"].create_index([("company_id", 1), ("device", 1), ("created_at", -1)])
+    # Sparse until scripts/migrate_refresh_tokens.py has backfilled older tokens
+    for collection in ("refresh_tokens", "company_refresh_tokens"):
+        db[collection].create_index("token_hash", unique=True, sparse=True)
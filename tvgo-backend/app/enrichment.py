@@ -0,0 +1,193 @@
+"""
+Resumable TMDB enrichment jobs.
+
+A job walks a tenant's movies in ``_id`` order, in chunks. Each chunk is
+enriched concurrently (bounded by a semaphore; the TMDB client's token bucket
+keeps the request rate under the API limit) and written back with a single
+``bulk_write``. After every chunk the job document in ``enrichment_jobs``
+records progress and the last processed ``_id``, so an interrupted job resumes
+where it stopped instead of starting over. The tenant's catalog version is
+bumped once, when the job stops, rather than after every chunk.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import uuid4
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.database import Database
+
+from .catalog import bump_catalog_version
+from .images import schedule_renditions
+from .tmdb import TMDBEnrichedData, enrich_movie
+
+CHUNK_SIZE = 50
+CONCURRENCY = 8
+MAX_ERROR_SAMPLES = 20
+# A running job whose heartbeat is older than this was interrupted
+STALE_AFTER = timedelta(minutes=2)
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def enrichment_update_fields(movie: dict, enriched: TMDBEnrichedData) -> dict:
+    """Fields to $set on a movie; artwork and trailers only fill gaps."""
+    update_fields = {
+        "tmdb_id": enriched.tmdb_id,
+        "synopsis": enriched.synopsis,
+        "runtime_minutes": enriched.runtime_minutes,
+        "rating": enriched.rating,
+        "genres": enriched.genres,
+        "directors": enriched.directors,
+        "cast": enriched.cast,
+    }
+    if enriched.poster_url and not movie.get("poster_url"):
+        update_fields["poster_url"] = enriched.poster_url
+    if enriched.landscape_url and not movie.get("landscape_url"):
+        update_fields["landscape_url"] = enriched.landscape_url
+    if enriched.hero_url and not movie.get("hero_url"):
+        update_fields["hero_url"] = enriched.hero_url
+    if enriched.trailer_url and not movie.get("trailer_url"):
+        update_fields["trailer_url"] = enriched.trailer_url
+    return update_fields
+
+
+def find_active_job(db: Database, company_id) -> Optional[dict]:
+    return db["enrichment_jobs"].find_one(
+        {"company_id": company_id, "status": {"$in": list(ACTIVE_STATUSES)}},
+        sort=[("created_at", -1)],
+    )
+
+
+def is_stale(job: dict) -> bool:
+    heartbeat = job.get("heartbeat_at") or job.get("created_at")
+    return heartbeat is None or datetime.utcnow() - heartbeat > STALE_AFTER
+
+
+def create_job(db: Database, company_id, missing_only: bool = False) -> dict:
+    movie_filter = {"company_id": company_id}
+    if missing_only:
+        movie_filter["tmdb_id"] = None
+    now = datetime.utcnow()
+    job = {
+        "_id": str(uuid4()),
+        "company_id": company_id,
+        "status": "pending",
+        "missing_only": missing_only,
+        "total": db["movies"].count_documents(movie_filter),
+        "processed": 0,
+        "enriched": 0,
+        "failed": 0,
+        "last_movie_id": None,
+        "errors": [],
+        "created_at": now,
+        "updated_at": now,
+        "heartbeat_at": now,
+    }
+    db["enrichment_jobs"].insert_one(job)
+    return job
+
+
+def _next_chunk(db: Database, job: dict) -> list:
+    movie_filter: dict = {"company_id": job["company_id"]}
+    if job.get("missing_only"):
+        movie_filter["tmdb_id"] = None
+    if job.get("last_movie_id") is not None:
+        movie_filter["_id"] = {"$gt": job["last_movie_id"]}
+    return list(db["movies"].find(movie_filter).sort("_id", 1).limit(CHUNK_SIZE))
+
+
+async def _enrich_one(movie: dict, semaphore: asyncio.Semaphore):
+    """Return (movie, enriched data or None, error message or None)."""
+    title = movie.get("title", "")
+    if not title:
+        return movie, None, "Movie has no title to search"
+    async with semaphore:
+        try:
+            enriched = await enrich_movie(title, movie.get("year"))
+        except Exception as e:
+            return movie, None, f"{title}: {e}"
+    if not enriched:
+        return movie, None, f"No TMDB results for '{title}'"
+    return movie, enriched, None
+
+
+async def run_job(db: Database, job_id: str) -> None:
+    """Process a job to completion (or cancellation), resuming from its cursor."""
+    job = await asyncio.to_thread(
+        db["enrichment_jobs"].find_one_and_update,
+        {"_id": job_id, "status": {"$in": list(ACTIVE_STATUSES)}},
+        {"$set": {"status": "running", "heartbeat_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not job:
+        return
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    company_id = job["company_id"]
+    enriched_any = False
+
+    try:
+        while True:
+            movies = await asyncio.to_thread(_next_chunk, db, job)
+            if not movies:
+                break
+
+            results = await asyncio.gather(*(_enrich_one(m, semaphore) for m in movies))
+            operations = []
+            updated = []
+            errors = []
+            for movie, enriched, error in results:
+                if enriched is None:
+                    errors.append(error)
+                    continue
+                update_fields = enrichment_update_fields(movie, enriched)
+                operations.append(UpdateOne(
+                    {"_id": movie["_id"], "company_id": company_id},
+                    {"$set": update_fields},
+                ))
+                updated.append({**movie, **update_fields})
+            if operations:
+                await asyncio.to_thread(db["movies"].bulk_write, operations, ordered=False)
+                enriched_any = True
+                # Mirrored TMDB artwork gets TV-sized renditions in the background
+                for movie in updated:
+                    schedule_renditions(db, "movies", movie)
+
+            job["last_movie_id"] = movies[-1]["_id"]
+            job = await asyncio.to_thread(
+                db["enrichment_jobs"].find_one_and_update,
+                {"_id": job_id},
+                {
+                    "$set": {
+                        "last_movie_id": job["last_movie_id"],
+                        "updated_at": datetime.utcnow(),
+                        "heartbeat_at": datetime.utcnow(),
+                    },
+                    "$inc": {
+                        "processed": len(movies),
+                        "enriched": len(operations),
+                        "failed": len(errors),
+                    },
+                    "$push": {"errors": {"$each": errors, "$slice": -MAX_ERROR_SAMPLES}},
+                },
+                return_document=ReturnDocument.AFTER,
+            )
+            if job.get("status") == "cancelled":
+                return
+
+        await asyncio.to_thread(
+            db["enrichment_jobs"].update_one,
+            {"_id": job_id, "status": "running"},
+            {"$set": {"status": "completed", "updated_at": datetime.utcnow(), "finished_at": datetime.utcnow()}},
+        )
+    except Exception as e:
+        print(f"Enrichment job {job_id} failed: {e}")
+        await asyncio.to_thread(
+            db["enrichment_jobs"].update_one,
+            {"_id": job_id},
+            {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}},
+        )
+    finally:
+        # Completed, cancelled or failed: publish what was written so far
+        if enriched_any:
+            await asyncio.to_thread(bump_catalog_version, db, company_id)
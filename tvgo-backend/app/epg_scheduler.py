@@ -0,0 +1,207 @@
+"""
+Now/next programme overlay for channel lists.
+
+The current and next programme of each of a tenant's EPG channels (in
+``ProgramScheduleItem`` shape) is computed from ``epg_programs`` with one
+aggregation and kept in memory, already JSON encoded, until the tenant's next
+programme boundary. Lineups splice it into each channel when a page is
+rendered, so the guide moving on touches neither the channel documents nor
+the catalog version: lineup snapshots, list caches and SSE clients are left
+alone, and only the tenant's channel list ETags (which include
+``now_next_digest``) roll over.
+
+Overlays are built by the first read for a tenant and refreshed off the
+request path: long-running servers start a thread that refreshes every
+tenant's overlay just after its boundary, and reads past a boundary keep
+serving the previous overlay and wake that thread. Without the thread (on
+Lambda) one read refreshes the overlay while concurrent reads serve the
+previous one. Nothing is written, so every worker keeping its own copy costs
+one read per tenant per boundary.
+"""
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+
+import orjson
+from pymongo.database import Database
+from pymongo.errors import PyMongoError
+
+# Only the current and next programme are needed; this just bounds the scan
+WINDOW = timedelta(hours=6)
+# Re-check at least this often so freshly synced guides show up promptly
+MAX_SLEEP = 300.0
+# Keep serving the previous overlay this long after a failed refresh
+RETRY_AFTER = timedelta(seconds=30)
+
+_scheduler: Optional["NowNextScheduler"] = None
+
+
+class Overlay(NamedTuple):
+    """One tenant's now/next items, replaced wholesale on refresh."""
+
+    items: Dict[str, bytes]  # epg_id -> encoded list of schedule items
+    digest: str
+    valid_until: datetime
+
+
+# str(company_id) -> overlay
+_overlays: Dict[str, Overlay] = {}
+_refresh_lock = threading.Lock()
+
+
+def _schedule_item(program: dict, now: datetime) -> dict:
+    return {
+        "id": program.get("program_id"),
+        "title": program.get("title") or "",
+        "category": program.get("category"),
+        "start": program["start"],
+        "end": program["end"],
+        "isLive": program["start"] <= now < program["end"],
+    }
+
+
+def refresh_now_next(db: Database, company_id, now: Optional[datetime] = None) -> Overlay:
+    """Recompute one tenant's overlay, valid until its next programme boundary."""
+    now = now or datetime.utcnow()
+    epg_ids = [e for e in db["channels"].distinct("epg_id", {"company_id": company_id}) if e]
+    upcoming: Dict[str, list] = {}
+    if epg_ids:
+        pipeline = [
+            {"$match": {
+                "channel_id": {"$in": epg_ids},
+                "end": {"$gt": now},
+                "start": {"$lt": now + WINDOW},
+            }},
+            {"$group": {
+                "_id": "$channel_id",
+                "programs": {"$topN": {
+                    "n": 2,
+                    "sortBy": {"start": 1},
+                    "output": {
+                        "program_id": "$program_id",
+                        "title": "$title",
+                        "category": "$category",
+                        "start": "$start",
+                        "end": "$end",
+                    },
+                }},
+            }},
+        ]
+        upcoming = {r["_id"]: r["programs"] for r in db["epg_programs"].aggregate(pipeline)}
+
+    items: Dict[str, bytes] = {}
+    boundary: Optional[datetime] = None
+    digest = hashlib.blake2b(digest_size=12)
+    for epg_id in sorted(upcoming):
+        programs = upcoming[epg_id]
+        for p in programs:
+            for edge in (p["start"], p["end"]):
+                if edge > now and (boundary is None or edge < boundary):
+                    boundary = edge
+        items[epg_id] = orjson.dumps([_schedule_item(p, now) for p in programs])
+        digest.update(epg_id.encode() + b"=" + items[epg_id] + b";")
+
+    overlay = Overlay(items, digest.hexdigest(), boundary or now + timedelta(seconds=MAX_SLEEP))
+    _overlays[str(company_id)] = overlay
+    return overlay
+
+
+def _refresh_or_keep(db: Database, company_id) -> Overlay:
+    try:
+        return refresh_now_next(db, company_id)
+    except PyMongoError as e:
+        print(f"Failed to refresh now/next programmes for {company_id}: {e}")
+        previous = _overlays.get(str(company_id)) or Overlay({}, "", datetime.utcnow())
+        overlay = previous._replace(valid_until=datetime.utcnow() + RETRY_AFTER)
+        _overlays[str(company_id)] = overlay
+        return overlay
+
+
+def _current(db: Database, company_id) -> Overlay:
+    overlay = _overlays.get(str(company_id))
+    if overlay is None:
+        # First read for this tenant: nothing to serve until it is built
+        with _refresh_lock:
+            overlay = _overlays.get(str(company_id)) or _refresh_or_keep(db, company_id)
+        return overlay
+    if datetime.utcnow() < overlay.valid_until:
+        return overlay
+    if _scheduler is not None and _scheduler.is_alive():
+        _scheduler.wake()
+    elif _refresh_lock.acquire(blocking=False):
+        # No scheduler: this read refreshes, concurrent ones serve the old overlay
+        try:
+            overlay = _refresh_or_keep(db, company_id)
+        finally:
+            _refresh_lock.release()
+    return overlay
+
+
+def now_next_overlay(db: Database, company_id) -> Dict[str, bytes]:
+    """Encoded now/next items per EPG channel id of the tenant."""
+    return _current(db, company_id).items
+
+
+def now_next_digest(db: Database, company_id) -> str:
+    """Changes whenever one of the tenant's channels' now/next does; part of its channel list ETag."""
+    return _current(db, company_id).digest
+
+
+class NowNextScheduler(threading.Thread):
+    def __init__(self, db: Database):
+        super().__init__(name="epg-now-next", daemon=True)
+        self.db = db
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake.set()
+
+    def wake(self) -> None:
+        """Refresh the overlays past their boundary now, e.g. after an EPG sync."""
+        self._wake.set()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            boundary: Optional[datetime] = None
+            # Tenants are added by their first read
+            for scope in list(_overlays):
+                overlay = _overlays[scope]
+                if datetime.utcnow() >= overlay.valid_until:
+                    with _refresh_lock:
+                        overlay = _refresh_or_keep(self.db, scope)
+                if boundary is None or overlay.valid_until < boundary:
+                    boundary = overlay.valid_until
+            delay = MAX_SLEEP
+            if boundary is not None:
+                # Land just after the boundary so the new programme is current
+                seconds = (boundary - datetime.utcnow()).total_seconds() + 1
+                delay = min(max(seconds, 1.0), MAX_SLEEP)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+
+def start_now_next_scheduler(db: Database) -> NowNextScheduler:
+    """Start the process-wide scheduler (idempotent)."""
+    global _scheduler
+    if _scheduler is None or not _scheduler.is_alive():
+        _scheduler = NowNextScheduler(db)
+        _scheduler.start()
+    return _scheduler
+
+
+def stop_now_next_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def request_now_next_refresh() -> None:
+    """The guide changed: every tenant's overlay is recomputed (by the scheduler, now)."""
+    for scope, overlay in list(_overlays.items()):
+        _overlays[scope] = overlay._replace(valid_until=datetime.min)
+    if _scheduler is not None:
+        _scheduler.wake()
@@ -0,0 +1,123 @@
+"""
+In-process fan-out of subscriber push events (server-sent events).
+
+Each open ``/api/messages/stream`` connection holds a ``Subscription``: a small
+asyncio queue registered under the subscriber's tenant. Publishers call
+``publish`` (or the helpers below) from any thread, whether request handlers,
+the invalidation watcher or the EPG scheduler, and the event is handed to each
+connection's event loop with ``call_soon_threadsafe``. An idle connection
+costs one queue and one suspended task, with no thread and no Mongo polling.
+
+Events published in other processes reach this one through the invalidation
+watcher (change streams), which republishes message inserts and catalog
+changes here. A message's recipients are resolved once per event, when it is
+published, not by each connection. Catalog events are hints: clients refetch, and the ETags make
+that cheap.
+"""
+import asyncio
+import threading
+from typing import Collection, Dict, FrozenSet, Iterable, Optional, Set
+
+QUEUE_SIZE = 64
+
+
+class Subscription:
+    def __init__(self, company_id: str, subscriber_id: str):
+        self.company_id = company_id
+        self.subscriber_id = subscriber_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(QUEUE_SIZE)
+
+    def push(self, event: dict) -> bool:
+        """Queue ``event`` from any thread; False once the connection's loop is gone."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:  # loop closed
+            return False
+        return True
+
+    def _put(self, event: dict) -> None:
+        if self.queue.full():
+            # A slow client loses its oldest event rather than stalling
+            # publishers; it resyncs from the REST endpoints on reconnect
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, company_id, subscriber_id: str) -> Subscription:
+        """Register a connection; must be called on the connection's event loop."""
+        subscription = Subscription(str(company_id), subscriber_id)
+        with self._lock:
+            self._subscriptions.setdefault(subscription.company_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.company_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.company_id]
+
+    def publish(
+        self, company_id: Optional[str], event: dict, recipients: Optional[Collection[str]] = None
+    ) -> None:
+        """Deliver ``event`` to a tenant's connections, or to all when ``company_id`` is None.
+
+        ``recipients`` narrows delivery to those subscriber ids.
+        """
+        with self._lock:
+            if company_id is None:
+                targets = [s for subs in self._subscriptions.values() for s in subs]
+            else:
+                targets = list(self._subscriptions.get(str(company_id), ()))
+        if recipients is not None:
+            targets = [s for s in targets if s.subscriber_id in recipients]
+        for subscription in targets:
+            if not subscription.push(event):
+                self.unsubscribe(subscription)
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscriptions.values())
+
+
+hub = EventHub()
+
+
+def message_recipients(message: dict, group_members: Iterable[str] = ()) -> Optional[FrozenSet[str]]:
+    """Subscriber ids a message is for, or None when it is for the whole tenant.
+
+    ``group_members`` are the members of the groups a group-targeted message
+    names (see ``user_groups.message_group_members``).
+    """
+    target_type = message.get("target_type", "all")
+    if target_type == "all":
+        return None
+    if target_type == "users":
+        return frozenset(message.get("target_ids") or ())
+    return frozenset(group_members)
+
+
+def publish_message(message: dict, group_members: Iterable[str] = ()) -> None:
+    """Announce a new message document to the subscribers it targets."""
+    hub.publish(
+        message.get("company_id"),
+        {"event": "message", "message": message},
+        recipients=message_recipients(message, group_members),
+    )
+
+
+def publish_message_deleted(company_id, message_id: str) -> None:
+    hub.publish(company_id, {"event": "message_deleted", "data": {"id": message_id}})
+
+
+def publish_catalog_changed(company_id=None, version: Optional[int] = None) -> None:
+    """Hint that a tenant's catalog (or, without ``company_id``, everyone's) changed."""
+    data = {"scope": "tenant" if company_id else "global", "version": version}
+    hub.publish(company_id, {"event": "catalog", "data": data})
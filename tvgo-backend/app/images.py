@@ -0,0 +1,304 @@
+"""
+TV-sized renditions of channel logos and movie artwork.
+
+Source images (``logo_url``, ``poster_url``, ``landscape_url``, ``hero_url``)
+are used at whatever size they came in; TMDB ``original`` backdrops run to
+several MB. When one of those fields is written, the source is downloaded and
+resized to the fixed sizes set-top boxes draw it at, as WebP plus a JPEG (PNG
+for transparent logos) fallback, and uploaded to S3 under a key derived from
+the source's SHA-256. Identical sources are therefore rendered once, across
+documents and tenants (``image_renditions`` records what was produced, and
+the source URLs it was produced from, so a known URL is not even downloaded).
+
+Resizing is CPU bound, so it runs in a process pool (spawned, not forked: the
+API process has threads); downloads, uploads and the Mongo write run on a
+small thread pool, so requests never wait for any of it. The result lands on
+the document as ``renditions.<kind> = {"source": url, "items": [...]}`` and
+is only served while ``source`` still matches the field it was built from.
+
+Pillow and S3 are optional: without either, nothing is scheduled and clients
+keep using the source URLs.
+"""
+import hashlib
+import importlib.util
+import multiprocessing
+import threading
+import time
+import urllib.request
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.database import Database
+
+from .config import settings
+
+# name, width, height per kind. Logos are fitted inside the box (keeping
+# transparency); artwork is centre-cropped to the exact size.
+RENDITIONS: Dict[str, List[Tuple[str, int, int]]] = {
+    "logo": [("sm", 96, 96), ("md", 256, 256)],
+    "poster": [("sm", 185, 278), ("md", 342, 513), ("lg", 500, 750)],
+    "landscape": [("sm", 480, 270), ("md", 960, 540)],
+    "hero": [("md", 1280, 720), ("lg", 1920, 1080)],
+}
+FITTED_KINDS = ("logo",)
+
+# Source fields per collection, by rendition kind
+SOURCE_FIELDS: Dict[str, Dict[str, str]] = {
+    "channels": {"logo": "logo_url"},
+    "movies": {"poster": "poster_url", "landscape": "landscape_url", "hero": "hero_url"},
+}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+MAX_SOURCE_BYTES = 25 * 1024 * 1024
+CONTENT_TYPES = {"webp": "image/webp", "jpg": "image/jpeg", "png": "image/png"}
+
+_render_pool: Optional[Executor] = None
+_job_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Jobs queued or running, so a document saved twice is rendered once
+# (guarded by _bump_lock: the done callbacks run on the job threads)
+_pending: set = set()
+
+# Tenants whose documents gained renditions since the last catalog bump. Each
+# tenant is bumped once when the job queue drains (or every BUMP_INTERVAL
+# while it does not), rather than once per finished job.
+BUMP_INTERVAL = 10.0
+_bump_lock = threading.Lock()
+_dirty_tenants: set = set()
+_outstanding = 0
+_last_bump = 0.0
+
+
+def renditions_available() -> bool:
+    return (
+        settings.image_renditions
+        and bool(settings.s3_bucket_name)
+        and importlib.util.find_spec("PIL") is not None
+    )
+
+
+def render(data: bytes, kind: str) -> List[dict]:
+    """Resize ``data`` to every size of ``kind``. Runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    source = Image.open(BytesIO(data))
+    source = ImageOps.exif_transpose(source)
+    has_alpha = source.mode in ("RGBA", "LA") or (
+        source.mode == "P" and "transparency" in source.info
+    )
+    source = source.convert("RGBA" if has_alpha else "RGB")
+
+    outputs = []
+    for name, width, height in RENDITIONS[kind]:
+        if kind in FITTED_KINDS:
+            image = source.copy()
+            image.thumbnail((width, height), Image.LANCZOS)
+        else:
+            image = ImageOps.fit(source, (width, height), Image.LANCZOS)
+
+        fallback = "png" if has_alpha else "jpg"
+        for fmt in ("webp", fallback):
+            buffer = BytesIO()
+            if fmt == "webp":
+                image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+            elif fmt == "jpg":
+                image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            else:
+                image.save(buffer, "PNG", optimize=True)
+            outputs.append({
+                "name": name,
+                "width": image.width,
+                "height": image.height,
+                "format": fmt,
+                "data": buffer.getvalue(),
+            })
+    return outputs
+
+
+def _pools() -> Tuple[Executor, ThreadPoolExecutor]:
+    global _render_pool, _job_pool
+    with _pool_lock:
+        if _job_pool is None:
+            _job_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="renditions")
+        if _render_pool is None:
+            try:
+                _render_pool = ProcessPoolExecutor(
+                    max_workers=settings.image_rendition_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (OSError, NotImplementedError) as e:
+                # No POSIX semaphores (e.g. Lambda): resize on threads instead
+                print(f"Image renditions: process pool unavailable ({e}); using threads")
+                _render_pool = ThreadPoolExecutor(max_workers=settings.image_rendition_workers)
+        return _render_pool, _job_pool
+
+
+def _reset_render_pool(pool: Executor) -> None:
+    global _render_pool
+    with _pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False)
+
+
+def shutdown() -> None:
+    global _render_pool, _job_pool
+    with _pool_lock:
+        for pool in (_job_pool, _render_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = _job_pool = None
+
+
+def _download(url: str) -> bytes:
+    request = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0 (compatible; tvGO/1.0)"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        data = response.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError(f"source larger than {MAX_SOURCE_BYTES} bytes")
+    return data
+
+
+def build_renditions(db: Database, url: str, kind: str) -> List[dict]:
+    """Renditions of the image at ``url``, rendering and uploading them if new."""
+    from .aws_s3 import get_s3_client, public_url
+    from .media_store import put_object
+
+    record = db["image_renditions"].find_one({"sources": url, "kind": kind}, {"items": 1})
+    if record:
+        return record["items"]
+
+    data = _download(url)
+    digest = hashlib.sha256(data).hexdigest()
+    record_id = f"{digest}:{kind}"
+    record = db["image_renditions"].find_one({"_id": record_id}, {"items": 1})
+    if record:
+        # Same image under another URL: remember this one too
+        db["image_renditions"].update_one({"_id": record_id}, {"$addToSet": {"sources": url}})
+        return record["items"]
+
+    render_pool, _ = _pools()
+    try:
+        outputs = render_pool.submit(render, data, kind).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        _reset_render_pool(render_pool)
+        raise
+
+    s3 = get_s3_client()
+    items = []
+    for output in outputs:
+        key = f"renditions/{digest[:2]}/{digest}/{kind}-{output['name']}.{output['format']}"
+        put_object(s3, key, output["data"], CONTENT_TYPES[output["format"]])
+        items.append({
+            "url": public_url(key),
+            "width": output["width"],
+            "height": output["height"],
+            "format": output["format"],
+        })
+    db["image_renditions"].update_one(
+        {"_id": record_id},
+        {
+            "$setOnInsert": {"kind": kind, "items": items, "created_at": datetime.utcnow()},
+            "$addToSet": {"sources": url},
+        },
+        upsert=True,
+    )
+    return items
+
+
+def _finish_job(db: Database, company_id, changed: bool) -> None:
+    """Count a job out; bump the tenants it dirtied once the queue drains."""
+    global _outstanding, _last_bump
+    from .catalog import bump_catalog_version
+
+    with _bump_lock:
+        _outstanding -= 1
+        if changed:
+            _dirty_tenants.add(company_id)
+        due = _outstanding <= 0 or time.monotonic() - _last_bump >= BUMP_INTERVAL
+        if not _dirty_tenants or not due:
+            return
+        tenants = list(_dirty_tenants)
+        _dirty_tenants.clear()
+        _last_bump = time.monotonic()
+    for tenant in tenants:
+        bump_catalog_version(db, tenant)
+
+
+def _run(db: Database, collection: str, document_id, company_id, sources: Dict[str, str]) -> None:
+    changed = False
+    try:
+        for kind, url in sources.items():
+            try:
+                items = build_renditions(db, url, kind)
+            except Exception as e:
+                print(f"Image renditions for {collection}/{document_id} {kind} failed: {e}")
+                continue
+            # Skip the write if the source field changed while we were rendering
+            result = db[collection].update_one(
+                {"_id": document_id, SOURCE_FIELDS[collection][kind]: url},
+                {"$set": {f"renditions.{kind}": {"source": url, "items": items}}},
+            )
+            changed = changed or result.modified_count > 0
+    finally:
+        _finish_job(db, company_id, changed)
+
+
+def missing_sources(collection: str, document: dict) -> Dict[str, str]:
+    """Source URLs of ``document`` that have no current renditions."""
+    renditions = document.get("renditions") or {}
+    sources = {}
+    for kind, field in SOURCE_FIELDS[collection].items():
+        url = document.get(field)
+        if url and url.startswith(("http://", "https://")):
+            if (renditions.get(kind) or {}).get("source") != url:
+                sources[kind] = url
+    return sources
+
+
+def schedule_renditions(db: Database, collection: str, document: dict):
+    """Queue renditions for the sources of ``document`` that lack them.
+
+    Returns the future, or None when there is nothing to do.
+    """
+    global _outstanding
+    if not renditions_available():
+        return None
+    sources = missing_sources(collection, document)
+    if not sources:
+        return None
+    key = (collection, document.get("_id"), tuple(sorted(sources.items())))
+    with _bump_lock:
+        if key in _pending:
+            return None
+        _pending.add(key)
+        _outstanding += 1
+    _, job_pool = _pools()
+    future = job_pool.submit(
+        _run, db, collection, document["_id"], document.get("company_id"), sources
+    )
+    future.add_done_callback(lambda _: _job_done(key))
+    return future
+
+
+def _job_done(key: tuple) -> None:
+    with _bump_lock:
+        _pending.discard(key)
+
+
+def rendition_map(document: dict) -> Optional[Dict[str, List[dict]]]:
+    """``{kind: [{url, width, height, format}, ...]}`` for current renditions."""
+    renditions = document.get("renditions")
+    if not renditions:
+        return None
+    image_set = {}
+    for kind, entry in renditions.items():
+        field = SOURCE_FIELDS["channels"].get(kind) or SOURCE_FIELDS["movies"].get(kind)
+        if field and entry.get("source") == document.get(field):
+            image_set[kind] = entry["items"]
+    return image_set or None
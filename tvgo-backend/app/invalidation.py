@@ -0,0 +1,239 @@
+"""
+Change-stream driven cache invalidation.
+
+A background thread watches the collections subscriber-facing caches are
+built from. Every worker sees each change, but only one of them counts it:
+the ``$inc`` of the owning tenant's catalog version is conditional on the
+change's cluster time being newer than the ``last_change`` stored with the
+version, so the other workers' updates match nothing and write nothing. That
+single version write reaches every worker through ``catalog_versions`` and
+invalidates its local caches once. Writes made by scripts or other services
+are therefore picked up even though they never call ``bump_catalog_version``
+(an API write is counted twice: by its own bump and by the watcher).
+
+Message inserts and deactivations are relayed to this process's SSE clients
+(see ``events.py``), so a message sent through another worker still reaches
+boxes connected here.
+
+``catalog_versions`` itself is watched too, so a version another process
+bumped (for a delete, whose change carries no tenant, or any API write)
+invalidates this process's caches as well. Subscriber writes are not watched:
+no cache holds subscriber data, and a subscriber's packages and status are
+part of their own ETags (see ``catalog_validators``).
+
+Standalone Mongo servers have no change streams; there the watcher falls back
+to polling ``catalog_versions`` and invalidates local caches whenever another
+process bumped a version.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from bson import Timestamp
+from pymongo import ReturnDocument
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+from .cache import clear_all, invalidate_tag, tenant_tag
+from .catalog import GLOBAL_SCOPE, cached_catalog_version, forget_catalog_version, remember_catalog_version
+from .events import publish_catalog_changed, publish_message, publish_message_deleted
+from .routers.user_groups import message_group_members
+
+WATCHED_COLLECTIONS = ("channels", "packages", "movies", "games", "brand_config")
+# Bumps made by other processes (including their deletes) arrive through here
+VERSIONS_COLLECTION = "catalog_versions"
+# Relayed to this process's SSE clients rather than invalidating anything
+EVENT_COLLECTIONS = ("messages",)
+# Coalesced changes are published at least this often under steady traffic
+FLUSH_INTERVAL_MS = 500
+MAX_PENDING_CHANGES = 1000
+# Server errors meaning "no change streams here" (standalone mongod)
+CHANGE_STREAMS_UNSUPPORTED = (40573,)
+
+_watcher: Optional["InvalidationWatcher"] = None
+
+
+def _change_stream_pipeline() -> list:
+    """Server-side filter, so unrelated traffic (logins, now/next) never reaches us."""
+    return [{"$match": {"$or": [
+        # Deletes carry no document to scope them by; the deleting process's
+        # bump_catalog_version reaches everyone through catalog_versions
+        {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)}, "operationType": {"$in": ["insert", "update", "replace"]}},
+        {"ns.coll": VERSIONS_COLLECTION, "operationType": {"$in": ["insert", "update", "replace"]}},
+        {"ns.coll": {"$in": list(EVENT_COLLECTIONS)}, "operationType": "insert"},
+        # Only deactivations are relayed, so read_count bumps must not cost an
+        # updateLookup each ($ifNull: $expr may be evaluated for any event)
+        {"ns.coll": {"$in": list(EVENT_COLLECTIONS)}, "operationType": "update", "$expr": {"$in": [
+            "is_active",
+            {"$map": {
+                "input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+                "in": "$$this.k",
+            }},
+        ]}},
+    ]}}]
+
+
+def _scope_of(change: dict) -> Optional[str]:
+    """Tenant scope of a change, or None when the document is gone."""
+    document = change.get("fullDocument")
+    if document is None:
+        # Deleted before the lookup; its deleter bumped the version
+        return None
+    company_id = document.get("company_id")
+    return str(company_id) if company_id else GLOBAL_SCOPE
+
+
+def _apply_version_change(change: dict) -> None:
+    """Another process bumped a catalog version: drop what we cached for it."""
+    document = change.get("fullDocument") or {}
+    scope, version = change["documentKey"]["_id"], document.get("version")
+    known = cached_catalog_version(scope)
+    if version is None or (known is not None and known >= version):
+        return  # Our own write, or one we already applied
+    notify_local(scope)
+    remember_catalog_version(scope, version)
+
+
+def _relay_message_change(db: Database, change: dict) -> None:
+    # Hard deletes carry no tenant and are not relayed; clients drop them
+    # when they refetch the inbox on reconnect
+    operation = change["operationType"]
+    document = change.get("fullDocument") or {}
+    message_id = change["documentKey"]["_id"]
+    if operation == "insert":
+        publish_message(document, message_group_members(db, document))
+    elif operation == "update" and document.get("is_active") is False:
+        publish_message_deleted(document.get("company_id"), message_id)
+
+
+def notify_local(scope: str) -> None:
+    """Drop everything this process cached for ``scope`` and tell its SSE clients."""
+    forget_catalog_version(scope)
+    if scope == GLOBAL_SCOPE:
+        clear_all()
+        publish_catalog_changed()
+    else:
+        invalidate_tag(tenant_tag(scope))
+        publish_catalog_changed(scope)
+
+
+def publish_change(db: Database, scope: str, change_time: Timestamp) -> None:
+    """Count a change against ``scope`` unless another worker already did."""
+    versions = db[VERSIONS_COLLECTION]
+    now = datetime.utcnow()
+    document = versions.find_one_and_update(
+        # A missing last_change also matches; an equal or newer one does not
+        {"_id": scope, "last_change": {"$not": {"$gte": change_time}}},
+        {"$inc": {"version": 1}, "$set": {"last_change": change_time, "updated_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if document is None:
+        document = {"_id": scope, "version": 1, "last_change": change_time, "updated_at": now}
+        try:
+            versions.insert_one(document)
+        except DuplicateKeyError:
+            return  # Counted by another worker; its write reaches us as a version change
+    notify_local(scope)
+    remember_catalog_version(scope, document["version"])
+
+
+class InvalidationWatcher(threading.Thread):
+    def __init__(self, db: Database, poll_interval: float = 5.0):
+        super().__init__(name="cache-invalidation", daemon=True)
+        self.db = db
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._resume_token = None
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            try:
+                self._watch()
+                return
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    print(f"Change streams unavailable ({e}); polling catalog versions instead")
+                    self._poll()
+                    return
+                # e.g. the resume token fell off the oplog: start from now
+                print(f"Change stream failed, reopening in {backoff:.0f}s: {e}")
+                self._resume_token = None
+            except PyMongoError as e:
+                print(f"Cache invalidation watcher error, retrying in {backoff:.0f}s: {e}")
+            self._stop_event.wait(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    def _watch(self) -> None:
+        with self.db.watch(
+            _change_stream_pipeline(),
+            full_document="updateLookup",
+            resume_after=self._resume_token,
+            max_await_time_ms=FLUSH_INTERVAL_MS,
+        ) as stream:
+            # Bulk ingests produce thousands of events for one tenant; they
+            # are coalesced per scope and published when the stream goes
+            # idle, FLUSH_INTERVAL_MS after the first one, or every
+            # MAX_PENDING_CHANGES changes, whichever comes first
+            pending: Dict[str, Timestamp] = {}
+            coalesced = 0
+            flush_at = 0.0
+            while not self._stop_event.is_set():
+                change = stream.try_next()
+                self._resume_token = stream.resume_token
+                if change is not None:
+                    collection = change["ns"]["coll"]
+                    if collection in EVENT_COLLECTIONS:
+                        _relay_message_change(self.db, change)
+                    elif collection == VERSIONS_COLLECTION:
+                        _apply_version_change(change)
+                    else:
+                        scope = _scope_of(change)
+                        if scope is not None:
+                            if not pending:
+                                flush_at = time.monotonic() + FLUSH_INTERVAL_MS / 1000
+                            latest = pending.get(scope)
+                            if latest is None or change["clusterTime"] > latest:
+                                pending[scope] = change["clusterTime"]
+                            coalesced += 1
+                if pending and (
+                    change is None or coalesced >= MAX_PENDING_CHANGES or time.monotonic() >= flush_at
+                ):
+                    for scope, change_time in pending.items():
+                        publish_change(self.db, scope, change_time)
+                    pending.clear()
+                    coalesced = 0
+
+    def _poll(self) -> None:
+        seen: Dict[str, int] = {}
+        while True:
+            try:
+                for document in self.db[VERSIONS_COLLECTION].find({}, {"version": 1}):
+                    scope, version = document["_id"], document.get("version", 0)
+                    if scope in seen and seen[scope] != version:
+                        notify_local(scope)
+                    seen[scope] = version
+            except PyMongoError as e:
+                print(f"Failed to poll catalog versions: {e}")
+            if self._stop_event.wait(self.poll_interval):
+                return
+
+
+def start_invalidation_watcher(db: Database, poll_interval: float = 5.0) -> InvalidationWatcher:
+    """Start the process-wide watcher (idempotent)."""
+    global _watcher
+    if _watcher is None or not _watcher.is_alive():
+        _watcher = InvalidationWatcher(db, poll_interval)
+        _watcher.start()
+    return _watcher
+
+
+def stop_invalidation_watcher() -> None:
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
@@ -0,0 +1,174 @@
+"""
+In-memory per-tenant channel lineups for the subscriber API.
+
+A snapshot holds a tenant's channels sorted by ``order``, each already
+serialised to JSON, plus the lookups the list filters need (id -> position,
+group -> positions, package -> positions). Snapshots are keyed on the tenant
+and global catalog versions (see ``catalog.py``), so any channel or package
+write triggers a rebuild on the next request; in between, lineup requests are
+answered from memory without touching Mongo.
+
+Each channel's ``programSchedule`` changes with the guide rather than the
+catalog, so it is left out of the encoded channel and spliced in from the
+``epg_scheduler`` overlay when a page is rendered.
+"""
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+import orjson
+from bson import ObjectId
+from pymongo.database import Database
+
+from .catalog import get_catalog_version
+from .images import rendition_map
+
+
+def channel_document_to_payload(document: dict) -> dict:
+    """Plain-dict twin of ``public._channel_document_to_schema``.
+
+    Channel documents are validated when written, so lineups skip building
+    pydantic models and FastAPI's second pass through ``response_model``.
+    ``programSchedule`` is not included; see ``LineupSnapshot.render``.
+    """
+    drm = None
+    if document.get("drm_type") and document.get("drm_license_url"):
+        drm = {"type": document["drm_type"], "licenseUrl": document["drm_license_url"]}
+    metadata = document.get("metadata") or {}
+    return {
+        "id": document.get("_id"),
+        "name": document.get("name"),
+        "group": document.get("group"),
+        "category": document.get("group"),
+        "description": metadata.get("description", ""),
+        "logoColor": metadata.get("logo_color", "#000000"),
+        "logo": document.get("logo_url"),
+        "imageSet": rendition_map(document),
+        "streamUrl": document.get("stream_url"),
+        "drm": drm,
+        "lang": document.get("lang"),
+        "country": document.get("country"),
+        "badges": document.get("badges"),
+        "metadata": metadata,
+        "streamerName": document.get("streamer_name"),
+        "order": document.get("order"),
+    }
+
+
+class LineupSnapshot:
+    """Immutable view of one tenant's channels, in lineup order."""
+
+    def __init__(self, key: tuple, documents: Sequence[dict], packages: Iterable[dict]):
+        self.key = key
+        self.names: List[str] = []
+        self.encoded: List[bytes] = []
+        self.epg_ids: List[Optional[str]] = []
+        self.index: Dict[str, int] = {}
+        self.groups: Dict[Optional[str], List[int]] = {}
+        aliases: Dict[str, int] = {}
+        for position, document in enumerate(documents):
+            self.names.append(document.get("name") or "")
+            self.encoded.append(orjson.dumps(channel_document_to_payload(document)))
+            self.epg_ids.append(document.get("epg_id"))
+            self.index[document["_id"]] = position
+            if document.get("id"):
+                # M3U imported channels are also addressed by their unprefixed id
+                aliases.setdefault(document["id"], position)
+            self.groups.setdefault(document.get("group"), []).append(position)
+        self._aliases = aliases
+        self.packages: Dict[str, FrozenSet[int]] = {
+            str(package["_id"]): frozenset(
+                self.index[channel_id]
+                for channel_id in package.get("channel_ids") or []
+                if channel_id in self.index
+            )
+            for package in packages
+        }
+
+    def __len__(self) -> int:
+        return len(self.encoded)
+
+    def position(self, channel_id: str) -> Optional[int]:
+        position = self.index.get(channel_id)
+        return position if position is not None else self._aliases.get(channel_id)
+
+    def allowed_positions(self, package_ids: Optional[List[str]]) -> Optional[FrozenSet[int]]:
+        """Positions a subscriber's packages grant, or None when unrestricted.
+
+        Mirrors ``public._get_user_allowed_channels``: no (valid) package ids
+        means every channel is allowed.
+        """
+        keys = [str(ObjectId(pid)) for pid in package_ids or [] if ObjectId.is_valid(pid)]
+        if not keys:
+            return None
+        allowed: set = set()
+        for key in keys:
+            allowed.update(self.packages.get(key, ()))
+        return frozenset(allowed)
+
+    def select(
+        self,
+        group: Optional[str] = None,
+        search: Optional[str] = None,
+        allowed: Optional[FrozenSet[int]] = None,
+        favorites: Optional[List[str]] = None,
+    ) -> List[int]:
+        positions: Iterable[int] = self.groups.get(group, []) if group else range(len(self.encoded))
+        if allowed is not None:
+            positions = [p for p in positions if p in allowed]
+        if favorites is not None:
+            wanted = {self.index[c] for c in favorites if c in self.index}
+            positions = [p for p in positions if p in wanted]
+        if search:
+            try:
+                pattern = re.compile(search, re.IGNORECASE)
+            except re.error:
+                pattern = re.compile(re.escape(search), re.IGNORECASE)
+            positions = [p for p in positions if pattern.search(self.names[p])]
+        return list(positions)
+
+    def render(self, position: int, now_next: Dict[str, bytes]) -> bytes:
+        """Encode one channel, with its entry from the now/next overlay."""
+        schedule = now_next.get(self.epg_ids[position]) or b"[]"
+        # Encoded channels are JSON objects; reopen them before the closing brace
+        return b"".join((self.encoded[position][:-1], b',"programSchedule":', schedule, b"}"))
+
+    def render_page(self, positions: List[int], offset: int, limit: int, now_next: Dict[str, bytes]) -> bytes:
+        """Encode a ``ChannelsListResponse`` body for one page of ``positions``."""
+        total = len(positions)
+        next_offset = offset + limit if offset + limit < total else None
+        items = b",".join(self.render(p, now_next) for p in positions[offset:offset + limit])
+        return b"".join((
+            b'{"total":', str(total).encode(),
+            b',"items":[', items,
+            b'],"nextOffset":', orjson.dumps(next_offset), b"}",
+        ))
+
+
+_snapshots: Dict[str, LineupSnapshot] = {}
+_build_locks: Dict[str, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+
+
+def _build_lock(scope: str) -> threading.Lock:
+    with _build_locks_guard:
+        return _build_locks.setdefault(scope, threading.Lock())
+
+
+def get_lineup(db: Database, company_id) -> LineupSnapshot:
+    """Return the tenant's current lineup, rebuilding it if its versions moved."""
+    key = (get_catalog_version(db, company_id), get_catalog_version(db))
+    scope = str(company_id)
+    snapshot = _snapshots.get(scope)
+    if snapshot is not None and snapshot.key == key:
+        return snapshot
+
+    # One rebuild per tenant at a time; concurrent requests wait for it
+    with _build_lock(scope):
+        snapshot = _snapshots.get(scope)
+        if snapshot is None or snapshot.key != key:
+            documents = list(db["channels"].find({"company_id": company_id}).sort("order", 1))
+            packages = db["packages"].find({"company_id": company_id}, {"channel_ids": 1})
+            snapshot = LineupSnapshot(key, documents, packages)
+            _snapshots[scope] = snapshot
+    return snapshot
@@ -1,15 +1,29 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from mangum import Mangum
+from fastapi.responses import ORJSONResponse, Response
 from pathlib import Path
+import secrets
+import sys
 
 from .routers import auth as auth_router
 from .routers import public as public_router
 from .routers import admin_channels, admin_movies, admin_rails, admin_config, upload, ingest, streamers, packages, admin_users, epg, admin_games
 from .routers import user_groups, messages
+from .auth import get_current_active_admin
+from .cache import cache_stats
+from .compression import CompressionMiddleware
+from .config import settings
+from .database import ensure_indexes, get_database
+from .epg_scheduler import start_now_next_scheduler, stop_now_next_scheduler
+from .events import hub
+from .images import shutdown as stop_image_renditions
+from .media_store import ImmutableStaticFiles
+from .metrics import PROMETHEUS_CONTENT_TYPE, RequestMetricsMiddleware, render_prometheus
+from .invalidation import start_invalidation_watcher, stop_invalidation_watcher
 
-app = FastAPI(title="tvGO Middleware API")
+app = FastAPI(title="tvGO Middleware API", default_response_class=ORJSONResponse)
+
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
 
 # CORS for dev and production
 app.add_middleware(
@@ -43,10 +57,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so the timings include compression and CORS handling
+if settings.metrics_enabled:
+    app.add_middleware(RequestMetricsMiddleware, server_timing=settings.server_timing)
+
 # Static file serving for local uploads
 UPLOAD_DIR = Path("/tmp/tvgo-uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+app.mount("/uploads", ImmutableStaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+
+
+@app.on_event("startup")
+def create_indexes():
+    if not settings.ensure_indexes_on_startup:
+        return
+    try:
+        ensure_indexes(get_database())
+    except Exception as e:
+        print(f"Failed to ensure MongoDB indexes: {e}")
+
+
+@app.on_event("startup")
+def start_cache_invalidation():
+    if settings.cache_invalidation_watcher:
+        start_invalidation_watcher(get_database(), settings.cache_invalidation_poll_seconds)
+
+
+@app.on_event("startup")
+def start_epg_scheduler():
+    if settings.epg_now_next_scheduler:
+        start_now_next_scheduler(get_database())
+
+
+@app.on_event("shutdown")
+def stop_background_tasks():
+    stop_invalidation_watcher()
+    stop_now_next_scheduler()
+    stop_image_renditions()
+
+
+@app.on_event("shutdown")
+async def close_tmdb_client():
+    # tmdb (and httpx) are imported on first use; nothing to close otherwise
+    tmdb = sys.modules.get("app.tmdb")
+    if tmdb is not None:
+        await tmdb.close_client()
 
 
 @app.get("/")
@@ -54,6 +109,23 @@ def root():
     return {"status": "ok", "service": "tvGO middleware"}
 
 
+@app.get("/api/admin/cache/stats", dependencies=[Depends(get_current_active_admin)])
+def get_cache_stats():
+    """Hit/miss counters of this process's caches, and its open SSE streams."""
+    return {"caches": cache_stats(), "eventStreams": hub.connection_count()}
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    """Request latency and Mongo command metrics in the Prometheus text format."""
+    # Never served without a token: route names and query shapes describe the API
+    if not settings.metrics_enabled or not settings.metrics_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {settings.metrics_token}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 app.include_router(auth_router.router)
 app.include_router(public_router.router)
 app.include_router(admin_channels.router)
@@ -71,6 +143,20 @@ app.include_router(messages.admin_router)
 app.include_router(messages.public_router)
 app.include_router(admin_games.router)
 
-handler = Mangum(app)
+_lambda_handler = None
+
+
+def get_lambda_handler():
+    """Mangum adapter for AWS Lambda, created on first invocation."""
+    global _lambda_handler
+    if _lambda_handler is None:
+        from mangum import Mangum
+
+        _lambda_handler = Mangum(app)
+    return _lambda_handler
+
+
+def handler(event, context):
+    return get_lambda_handler()(event, context)
 
 
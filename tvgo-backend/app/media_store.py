@@ -0,0 +1,189 @@
+"""
+Content-addressed media storage.
+
+Objects are stored under the SHA-256 of their bytes
+(``<prefix>/<sha256>.<ext>``), so a given image is uploaded once however
+often it is imported, and its URL never changes meaning: everything is served
+with ``Cache-Control: immutable`` and a year's max-age.
+
+Mirrored remote images (EPG logos and the like) are also remembered by source
+URL in ``media_sources``. A known source is not downloaded again until it is
+``SOURCE_REVALIDATE_AFTER`` old, and then only with a conditional GET, so
+re-syncing a guide costs a few 304s instead of a download and an upload per
+channel.
+"""
+import asyncio
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.staticfiles import StaticFiles
+from pymongo.database import Database
+
+from .aws_s3 import CACHE_CONTROL, IMAGE_EXTENSIONS, MAX_IMAGE_UPLOAD_BYTES, get_s3_client, public_url
+from .config import settings
+
+SOURCE_REVALIDATE_AFTER = timedelta(days=7)
+MAX_SOURCE_BYTES = 25 * 1024 * 1024
+USER_AGENT = "Mozilla/5.0 (compatible; tvGO/1.0)"
+
+# Keys this process has seen in the bucket; saves a HEAD per repeat upload
+_known_keys: set = set()
+_known_keys_lock = threading.Lock()
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names are content hashes, cached for a year."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = CACHE_CONTROL
+        return response
+
+
+def content_key(data: bytes, content_type: str, prefix: str) -> str:
+    extension = IMAGE_EXTENSIONS.get(content_type.split(";")[0].strip(), "bin")
+    return f"{prefix}/{hashlib.sha256(data).hexdigest()}.{extension}"
+
+
+def _object_exists(s3, key: str) -> bool:
+    with _known_keys_lock:
+        if key in _known_keys:
+            return True
+    try:
+        s3.head_object(Bucket=settings.s3_bucket_name, Key=key)
+    except Exception as e:
+        error_code = getattr(e, "response", {}).get("Error", {}).get("Code")
+        if error_code in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    with _known_keys_lock:
+        _known_keys.add(key)
+    return True
+
+
+def put_object(s3, key: str, data: bytes, content_type: str) -> None:
+    """Upload ``data`` under ``key`` (a content hash), unless it is already there."""
+    if _object_exists(s3, key):
+        return
+    s3.put_object(
+        Bucket=settings.s3_bucket_name,
+        Key=key,
+        Body=data,
+        ContentType=content_type,
+        CacheControl=CACHE_CONTROL,
+    )
+    with _known_keys_lock:
+        _known_keys.add(key)
+
+
+def store_bytes(data: bytes, content_type: str, prefix: str = "images") -> str:
+    """Store ``data`` by content hash and return its public URL.
+
+    Raises RuntimeError when S3 is not configured.
+    """
+    s3 = get_s3_client()
+    if not s3:
+        raise RuntimeError("S3 is not configured")
+    key = content_key(data, content_type, prefix)
+    put_object(s3, key, data, content_type)
+    return public_url(key)
+
+
+async def store_upload(file: UploadFile, prefix: str = "images") -> str:
+    """Store an image uploaded through the API; return its public URL."""
+    if not get_s3_client():
+        raise HTTPException(
+            status_code=500,
+            detail="S3 is not configured. Please set S3_BUCKET_NAME environment variable."
+        )
+    data = await file.read()
+    if len(data) > MAX_IMAGE_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    content_type = _normalise_content_type(file.content_type, file.filename or "")
+    try:
+        # boto3 is blocking; keep it off the event loop
+        return await asyncio.to_thread(store_bytes, data, content_type, prefix)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload to S3: {e}")
+
+
+def _normalise_content_type(content_type: Optional[str], url: str) -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == "image/jpg":
+        content_type = "image/jpeg"
+    if content_type in IMAGE_EXTENSIONS:
+        return content_type
+    # Many EPG hosts send application/octet-stream; trust the file name instead
+    extension = url.split("?")[0].rsplit(".", 1)[-1].lower()
+    by_extension = {ext: ctype for ctype, ext in IMAGE_EXTENSIONS.items()}
+    by_extension["jpeg"] = "image/jpeg"
+    return by_extension.get(extension, "image/png")
+
+
+def mirror_url(db: Database, url: str, prefix: str = "logos") -> Optional[str]:
+    """Copy the image at ``url`` into the store; return its URL (None on failure).
+
+    Known sources are answered from ``media_sources`` and revalidated with a
+    conditional GET once they are older than ``SOURCE_REVALIDATE_AFTER``.
+    """
+    if not get_s3_client():
+        print(f"S3 not configured, skipping upload from URL: {url}")
+        return None
+
+    source = db["media_sources"].find_one({"_id": url})
+    now = datetime.utcnow()
+    if source and now - source["checked_at"] < SOURCE_REVALIDATE_AFTER:
+        return source["url"]
+
+    headers = {"User-Agent": USER_AGENT}
+    if source and source.get("etag"):
+        headers["If-None-Match"] = source["etag"]
+    if source and source.get("last_modified"):
+        headers["If-Modified-Since"] = source["last_modified"]
+
+    try:
+        request = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(request, timeout=30) as response:
+            data = response.read(MAX_SOURCE_BYTES + 1)
+            content_type = _normalise_content_type(response.headers.get("Content-Type"), url)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+        if len(data) > MAX_SOURCE_BYTES:
+            raise ValueError(f"image larger than {MAX_SOURCE_BYTES} bytes")
+        stored_url = store_bytes(data, content_type, prefix)
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and source:
+            db["media_sources"].update_one({"_id": url}, {"$set": {"checked_at": now}})
+            return source["url"]
+        print(f"Failed to download/upload image from {url}: {e}")
+        return source["url"] if source else None
+    except Exception as e:
+        print(f"Failed to download/upload image from {url}: {e}")
+        # A transient failure should not drop an image we already have
+        return source["url"] if source else None
+
+    db["media_sources"].update_one(
+        {"_id": url},
+        {"$set": {
+            "url": stored_url,
+            "content_type": content_type,
+            "etag": etag,
+            "last_modified": last_modified,
+            "checked_at": now,
+        }},
+        upsert=True,
+    )
+    return stored_url
+
+
+async def mirror_image(db: Database, url: str, prefix: str = "logos") -> Optional[str]:
+    """``mirror_url`` in a worker thread (the download and upload block)."""
+    if not url:
+        return None
+    return await asyncio.to_thread(mirror_url, db, url, prefix)
@@ -0,0 +1,306 @@
+"""
+Per-request latency and query accounting.
+
+``RequestMetricsMiddleware`` times every HTTP request by route template (an
+event stream only up to its response headers, not for the life of the
+connection) and opens an accounting record for it in a context variable.
+``CommandMetrics``, a PyMongo command listener registered on the shared
+client, adds each Mongo command to that record (sync endpoints run in a
+thread pool that copies the context, so the record follows the request
+there). When the request ends:
+
+* its latency, command count and database time feed per-route histograms;
+* the same command shape (command, collection, filter with the values
+  stripped) issued ``metrics_n_plus_one_threshold`` times or more is logged
+  and counted as an N+1 pattern;
+* with ``server_timing`` on, a ``Server-Timing`` header reports ``db`` and
+  ``app`` time so browser dev tools show where the time went.
+
+Commands slower than ``slow_query_ms`` are logged with their filter shape.
+``render_prometheus()`` returns everything in the Prometheus text format for
+``/metrics``. Figures are per process.
+"""
+import contextvars
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+MAX_SHAPE_LENGTH = 500
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Where the filter of each command lives, for the query shape
+_FILTER_FIELDS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+_WRITE_FILTER_FIELDS = {"update": ("updates", "q"), "delete": ("deletes", "q")}
+
+_current: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_metrics", default=None)
+_lock = threading.Lock()
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+# (method, route) -> histogram
+_request_seconds: Dict[Tuple[str, str], _Histogram] = {}
+_request_db_seconds: Dict[Tuple[str, str], _Histogram] = {}
+_request_db_commands: Dict[Tuple[str, str], _Histogram] = {}
+# (method, route, status) -> count
+_responses: Dict[Tuple[str, str, str], int] = {}
+# (command, collection) -> [count, seconds, failures, slow]
+_commands: Dict[Tuple[str, str], List[float]] = {}
+# (route, command, collection) -> requests flagged
+_n_plus_one: Dict[Tuple[str, str, str], int] = {}
+
+
+def query_shape(value):
+    """``value`` with every literal replaced by ``"?"``; keys and operators stay."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, (dict, list, tuple)) for item in value):
+            return [query_shape(item) for item in value]
+        # Scalar lists ($in, $all, ...) are one placeholder whatever their length
+        return "?"
+    return "?"
+
+
+def command_shape(command_name: str, command) -> Tuple[str, str]:
+    """(collection, filter shape as compact JSON) of a command document."""
+    if command_name == "getMore":
+        return str(command.get("collection", "")), ""
+    collection = command.get(command_name)
+    collection = collection if isinstance(collection, str) else ""
+    query = None
+    if command_name in _FILTER_FIELDS:
+        query = command.get(_FILTER_FIELDS[command_name])
+    elif command_name in _WRITE_FILTER_FIELDS:
+        field, key = _WRITE_FILTER_FIELDS[command_name]
+        statements = command.get(field) or []
+        query = statements[0].get(key) if statements else None
+    if query is None:
+        return collection, ""
+    shape = json.dumps(query_shape(query), separators=(",", ":"), default=str)
+    return collection, shape[:MAX_SHAPE_LENGTH]
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Attributes Mongo commands to the request that issued them."""
+
+    def __init__(self):
+        self._inflight: Dict[Tuple, Tuple[Optional[dict], str, str]] = {}
+        self._inflight_lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection, shape = command_shape(event.command_name, event.command)
+        with self._inflight_lock:
+            self._inflight[(event.connection_id, event.request_id)] = (_current.get(), collection, shape)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool) -> None:
+        with self._inflight_lock:
+            inflight = self._inflight.pop((event.connection_id, event.request_id), None)
+        if inflight is None:
+            return
+        state, collection, shape = inflight
+        seconds = event.duration_micros / 1_000_000
+        slow = seconds * 1000 >= settings.slow_query_ms
+
+        with _lock:
+            totals = _commands.setdefault((event.command_name, collection), [0, 0.0, 0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += int(failed)
+            totals[3] += int(slow)
+            if state is not None:
+                state["commands"] += 1
+                state["db_seconds"] += seconds
+                key = (event.command_name, collection, shape)
+                state["shapes"][key] = state["shapes"].get(key, 0) + 1
+        if slow:
+            route = _route_of(state["scope"]) if state is not None else "-"
+            print(
+                f"Slow query {seconds * 1000:.0f} ms: {event.command_name} {event.database_name}.{collection} "
+                f"{shape or '{}'} ({route})"
+            )
+
+
+command_listener = CommandMetrics()
+
+
+def _route_of(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+def _record_request(method: str, state: dict, status: int, seconds: float) -> None:
+    key = (method, state["route"])
+    flagged = [
+        (shape_key, count) for shape_key, count in state["shapes"].items()
+        if shape_key[0] != "getMore" and count >= settings.metrics_n_plus_one_threshold
+    ]
+    with _lock:
+        for histograms, value in (
+            (_request_seconds, seconds),
+            (_request_db_seconds, state["db_seconds"]),
+        ):
+            if key not in histograms:
+                histograms[key] = _Histogram(LATENCY_BUCKETS)
+            histograms[key].observe(value)
+        if key not in _request_db_commands:
+            _request_db_commands[key] = _Histogram(COMMAND_COUNT_BUCKETS)
+        _request_db_commands[key].observe(state["commands"])
+        response_key = (method, state["route"], str(status))
+        _responses[response_key] = _responses.get(response_key, 0) + 1
+        for (command_name, collection, _shape), _count in flagged:
+            flag_key = (state["route"], command_name, collection)
+            _n_plus_one[flag_key] = _n_plus_one.get(flag_key, 0) + 1
+    for (command_name, collection, shape), count in flagged:
+        print(
+            f"Possible N+1 in {method} {state['route']}: {count}x {command_name} {collection} "
+            f"{shape or '{}'} ({state['commands']} commands, {state['db_seconds'] * 1000:.0f} ms in Mongo)"
+        )
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app: ASGIApp, server_timing: bool = False) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = {"scope": scope, "route": "<unmatched>", "commands": 0, "db_seconds": 0.0, "shapes": {}}
+        status = 500
+        started = time.perf_counter()
+        recorded = False
+
+        def record() -> None:
+            nonlocal recorded
+            recorded = True
+            state["route"] = _route_of(scope)
+            _record_request(scope["method"], state, status, time.perf_counter() - started)
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = MutableHeaders(scope=message).get("content-type", "")
+                if content_type.startswith("text/event-stream"):
+                    # Streams stay open for hours; time them to the first byte
+                    record()
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    app_ms = (time.perf_counter() - started) * 1000
+                    headers.append(
+                        "Server-Timing",
+                        f'db;dur={state["db_seconds"] * 1000:.1f};desc="{state["commands"]} commands", '
+                        f"app;dur={app_ms:.1f}",
+                    )
+            await send(message)
+
+        token = _current.set(state)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if not recorded:
+                record()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, histograms: Dict[Tuple[str, str], _Histogram]) -> List[str]:
+    lines = []
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=f'{bound:g}')} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {histogram.total}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.total}")
+    return lines
+
+
+def render_prometheus() -> str:
+    """Every metric of this process in the Prometheus text exposition format."""
+    lines: List[str] = []
+    with _lock:
+        lines += [
+            "# HELP tvgo_http_request_duration_seconds Time from request start to the end of the response.",
+            "# TYPE tvgo_http_request_duration_seconds histogram",
+            *_histogram_lines("tvgo_http_request_duration_seconds", _request_seconds),
+            "# HELP tvgo_http_requests_total Responses by route and status.",
+            "# TYPE tvgo_http_requests_total counter",
+            *(
+                f"tvgo_http_requests_total{_labels(method=method, route=route, status=status)} {count}"
+                for (method, route, status), count in sorted(_responses.items())
+            ),
+            "# HELP tvgo_request_db_commands Mongo commands issued per request.",
+            "# TYPE tvgo_request_db_commands histogram",
+            *_histogram_lines("tvgo_request_db_commands", _request_db_commands),
+            "# HELP tvgo_request_db_seconds Time spent in Mongo commands per request.",
+            "# TYPE tvgo_request_db_seconds histogram",
+            *_histogram_lines("tvgo_request_db_seconds", _request_db_seconds),
+        ]
+        command_metrics = (
+            ("tvgo_db_commands_total", "counter", "Mongo commands by command and collection.", 0, "{:.0f}"),
+            ("tvgo_db_command_seconds_total", "counter", "Time spent in Mongo commands.", 1, "{:.6f}"),
+            ("tvgo_db_command_failures_total", "counter", "Mongo commands that failed.", 2, "{:.0f}"),
+            ("tvgo_db_slow_commands_total", "counter", "Mongo commands slower than SLOW_QUERY_MS.", 3, "{:.0f}"),
+        )
+        for name, kind, help_text, index, number in command_metrics:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [
+                f"{name}{_labels(command=command, collection=collection)} {number.format(totals[index])}"
+                for (command, collection), totals in sorted(_commands.items())
+            ]
+        lines += [
+            "# HELP tvgo_n_plus_one_requests_total Requests that repeated one query shape past the N+1 threshold.",
+            "# TYPE tvgo_n_plus_one_requests_total counter",
+            *(
+                f"tvgo_n_plus_one_requests_total{_labels(route=route, command=command, collection=collection)} {count}"
+                for (route, command, collection), count in sorted(_n_plus_one.items())
+            ),
+        ]
+    return "\n".join(lines) + "\n"
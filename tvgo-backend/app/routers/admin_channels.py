@@ -2,27 +2,28 @@ from fastapi import APIRouter, Depends, HTTPException
 from pymongo.database import Database
 from typing import List, Optional
 from bson import ObjectId
-import time
 
 from .. import schemas
 from ..auth import get_current_company_or_admin as get_current_company
+from ..cache import Cache, invalidate_tag, tenant_tag
+from ..catalog import bump_catalog_version
 from ..config import settings
 from ..database import get_db
+from ..images import rendition_map, schedule_renditions
+from ..tenant_stats import refresh_streamer_channel_counts
 
 router = APIRouter(
     prefix=f"{settings.api_v1_prefix}/admin/channels",
     tags=["admin-channels"],
 )
 
-# Per-company cache: Dict[company_id, (channels_list, timestamp)]
-_channels_cache: dict[str, tuple[List[schemas.Channel], float]] = {}
+# Per-company admin channel lists
 CACHE_TTL = 60  # Cache for 60 seconds
+_channels_cache = Cache("admin-channels", ttl=CACHE_TTL)
 
 
 def _invalidate_cache(company_id: str):
-    global _channels_cache
-    if company_id in _channels_cache:
-        del _channels_cache[company_id]
+    invalidate_tag(f"channels:{company_id}")
 
 
 def _channel_document_to_schema(document: dict) -> schemas.Channel:
@@ -36,6 +37,7 @@ def _channel_document_to_schema(document: dict) -> schemas.Channel:
         name=document.get("name"),
         group=document.get("group"),
         logo=document.get("logo_url"),
+        imageSet=rendition_map(document),
         streamUrl=document.get("stream_url"),
         drm=drm,
         lang=document.get("lang"),
@@ -53,20 +55,16 @@ def admin_list_channels(
     company: dict = Depends(get_current_company),
     db: Database = Depends(get_db)
 ):
-    global _channels_cache
     company_id = str(company["_id"])
-    
-    # Return cached result if still valid
-    if company_id in _channels_cache:
-        cached, timestamp = _channels_cache[company_id]
-        if (time.time() - timestamp) < CACHE_TTL:
-            return cached
-    
-    # Fetch from database filtered by company_id
-    channels = list(db["channels"].find({"company_id": company["_id"]}).sort([("order", 1), ("name", 1)]))
-    result = [_channel_document_to_schema(ch) for ch in channels]
-    _channels_cache[company_id] = (result, time.time())
-    return result
+
+    def load() -> list:
+        # Fetch from database filtered by company_id
+        channels = list(db["channels"].find({"company_id": company["_id"]}).sort([("order", 1), ("name", 1)]))
+        return [_channel_document_to_schema(ch).model_dump(mode="json") for ch in channels]
+
+    return _channels_cache.get_or_load(
+        company_id, load, tags=[f"channels:{company_id}", tenant_tag(company_id)]
+    )
 
 
 @router.post("", response_model=schemas.Channel)
@@ -98,7 +96,11 @@ def admin_create_channel(
         "order": payload.order,
     }
     db["channels"].insert_one(document)
+    if (document.get("metadata") or {}).get("streamer_name"):
+        refresh_streamer_channel_counts(db, company["_id"])
     _invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
+    schedule_renditions(db, "channels", document)
     return _channel_document_to_schema(document)
 
 
@@ -123,6 +125,7 @@ def admin_reorder_channels(
         db["channels"].bulk_write(operations)
         
     _invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
     return {"status": "ok"}
 
 
@@ -149,12 +152,16 @@ def admin_update_channel(
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Channel not found")
+        if "metadata" in update_fields:
+            refresh_streamer_channel_counts(db, company["_id"])
     else:
         if not db["channels"].find_one({"_id": channel_id, "company_id": company["_id"]}):
             raise HTTPException(status_code=404, detail="Channel not found")
 
     document = db["channels"].find_one({"_id": channel_id, "company_id": company["_id"]})
     _invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
+    schedule_renditions(db, "channels", document)
     return _channel_document_to_schema(document)
 
 
@@ -165,8 +172,14 @@ def admin_delete_channel(
     db: Database = Depends(get_db)
 ):
     # Only delete if channel belongs to this company
-    result = db["channels"].delete_one({"_id": channel_id, "company_id": company["_id"]})
-    if result.deleted_count == 0:
+    document = db["channels"].find_one_and_delete(
+        {"_id": channel_id, "company_id": company["_id"]},
+        {"metadata.streamer_name": 1},
+    )
+    if document is None:
         raise HTTPException(status_code=404, detail="Channel not found")
+    if (document.get("metadata") or {}).get("streamer_name"):
+        refresh_streamer_channel_counts(db, company["_id"])
     _invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
     return {"status": "ok"}
@@ -6,6 +6,8 @@ from .. import schemas
 from ..auth import get_current_company_or_admin as get_current_company
 from ..config import settings
 from ..database import get_db
+from ..tenant_config import get_config, refresh_config
+from ..tenant_stats import tenant_stats
 
 router = APIRouter(
     prefix=f"{settings.api_v1_prefix}/admin/config",
@@ -27,8 +29,7 @@ def admin_get_config(
     company: dict = Depends(get_current_company),
     db: Database = Depends(get_db)
 ):
-    from .public import build_config_response
-    return build_config_response(db, company["_id"])
+    return get_config(db, company["_id"])
 
 
 @router.put("/brand", response_model=schemas.ConfigResponse)
@@ -53,9 +54,7 @@ def admin_update_brand(
         {"$set": document}, 
         upsert=True
     )
-
-    from .public import build_config_response
-    return build_config_response(db, company_id)
+    return refresh_config(db, company_id)
 
 
 @router.put("/features", response_model=schemas.ConfigResponse)
@@ -80,9 +79,7 @@ def admin_update_features(
         {"$set": document}, 
         upsert=True
     )
-
-    from .public import build_config_response
-    return build_config_response(db, company_id)
+    return refresh_config(db, company_id)
 
 
 @router.get("/stats", response_model=DashboardStats)
@@ -93,17 +90,13 @@ def get_dashboard_stats(
     """Get dashboard statistics for this company."""
     company_id = company["_id"]
     
-    total_channels = db["channels"].count_documents({"company_id": company_id})
-    active_channels = db["channels"].count_documents({"company_id": company_id, "is_active": {"$ne": False}})
-    total_streamers = db["streamers"].count_documents({"company_id": company_id})
-    total_packages = db["packages"].count_documents({"company_id": company_id})
-    total_users = db["subscribers"].count_documents({"company_id": company_id})
+    stats = tenant_stats(db, company_id)
     
     return DashboardStats(
-        total_channels=total_channels,
-        active_channels=active_channels,
-        inactive_channels=total_channels - active_channels,
-        total_streamers=total_streamers,
-        total_packages=total_packages,
-        total_users=total_users,
+        total_channels=stats["channels"],
+        active_channels=stats["active_channels"],
+        inactive_channels=stats["channels"] - stats["active_channels"],
+        total_streamers=stats["streamers"],
+        total_packages=stats["packages"],
+        total_users=stats["users"],
     )
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pymongo.database import Database
 from typing import List, Optional
-import time
 
 from .. import schemas
 from ..auth import get_current_company_or_admin as get_current_company
+from ..cache import Cache, invalidate_tag, tenant_tag
+from ..catalog import bump_catalog_version
 from ..config import settings
 from ..database import get_db
 
@@ -28,15 +29,13 @@ GAME_CATEGORIES = [
     "Other"
 ]
 
-# Per-company cache
-_games_cache: dict[str, tuple[List[schemas.Game], float]] = {}
+# Per-company admin game lists
 CACHE_TTL = 60
+_games_cache = Cache("admin-games", ttl=CACHE_TTL)
 
 
 def _invalidate_cache(company_id: str):
-    global _games_cache
-    if company_id in _games_cache:
-        del _games_cache[company_id]
+    invalidate_tag(f"games:{company_id}")
 
 
 def _game_document_to_schema(document: dict) -> schemas.Game:
@@ -64,24 +63,16 @@ def admin_list_games(
     company: dict = Depends(get_current_company),
     db: Database = Depends(get_db)
 ):
-    global _games_cache
     company_id = str(company["_id"])
-    
-    if company_id in _games_cache:
-        cached, timestamp = _games_cache[company_id]
-        if (time.time() - timestamp) < CACHE_TTL:
-            categories = list(set(g.category for g in cached if g.category))
-            return schemas.GamesListResponse(
-                total=len(cached),
-                items=cached,
-                categories=sorted(categories)
-            )
-    
-    games = list(db["games"].find({"company_id": company["_id"]}).sort([("order", 1), ("name", 1)]))
-    games_list = [_game_document_to_schema(g) for g in games]
-    _games_cache[company_id] = (games_list, time.time())
-    
-    categories = list(set(g.category for g in games_list if g.category))
+
+    def load() -> list:
+        games = list(db["games"].find({"company_id": company["_id"]}).sort([("order", 1), ("name", 1)]))
+        return [_game_document_to_schema(g).model_dump(mode="json") for g in games]
+
+    games_list = _games_cache.get_or_load(
+        company_id, load, tags=[f"games:{company_id}", tenant_tag(company_id)]
+    )
+    categories = list(set(g["category"] for g in games_list if g.get("category")))
     return schemas.GamesListResponse(
         total=len(games_list),
         items=games_list,
@@ -113,6 +104,7 @@ def admin_create_game(
     }
     db["games"].insert_one(document)
     _invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
     return _game_document_to_schema(document)
 
 
@@ -136,6 +128,7 @@ def admin_reorder_games(
         db["games"].bulk_write(operations)
         
     _invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
     return {"status": "ok"}
 
 
@@ -172,6 +165,7 @@ def admin_update_game(
 
     document = db["games"].find_one({"_id": game_id, "company_id": company["_id"]})
     _invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
     return _game_document_to_schema(document)
 
 
@@ -185,4 +179,5 @@ def admin_delete_game(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Game not found")
     _invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
     return {"status": "ok"}
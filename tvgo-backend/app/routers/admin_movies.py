@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from pymongo import ReturnDocument
 from pymongo.database import Database
 
 from .. import schemas
 from ..auth import get_current_company_or_admin as get_current_company
+from ..cache import Cache, tenant_tag
+from ..catalog import bump_catalog_version
 from ..config import settings
 from ..database import get_db
+from ..images import rendition_map, schedule_renditions
 
 router = APIRouter(
     prefix=f"{settings.api_v1_prefix}/admin/movies",
     tags=["admin-movies"],
 )
 
+# Per-company admin movie lists; every movie write bumps the catalog
+# version, which invalidates the tenant tag
+_movies_cache = Cache("admin-movies", ttl=60)
+
 
 def _movie_document_to_schema(document: dict) -> schemas.Movie:
     movie_id = document.get("id") or document.get("_id")
@@ -44,6 +54,7 @@ def _movie_document_to_schema(document: dict) -> schemas.Movie:
         runtimeMinutes=document.get("runtime_minutes"),
         synopsis=document.get("synopsis"),
         images=images,
+        imageSet=rendition_map(document),
         media=media,
         badges=document.get("badges"),
         credits=credits,
@@ -72,6 +83,7 @@ def admin_reorder_movies(
     
     if operations:
         db["movies"].bulk_write(operations)
+        bump_catalog_version(db, company["_id"])
     
     return {"status": "ok", "updated": len(operations)}
 
@@ -130,6 +142,10 @@ def admin_batch_create_movies(
             created = len(result.inserted_ids)
         except BulkWriteError as e:
             created = e.details.get("nInserted", 0)
+    if created:
+        bump_catalog_version(db, company["_id"])
+        for document in documents:
+            schedule_renditions(db, "movies", document)
     
     return {"status": "ok", "created": created, "skipped": skipped}
 
@@ -139,8 +155,13 @@ def admin_list_movies(
     company: dict = Depends(get_current_company),
     db: Database = Depends(get_db)
 ):
-    movies = list(db["movies"].find({"company_id": company["_id"]}).sort("order", 1))
-    return [_movie_document_to_schema(m) for m in movies]
+    company_id = str(company["_id"])
+
+    def load() -> list:
+        movies = list(db["movies"].find({"company_id": company["_id"]}).sort("order", 1))
+        return [_movie_document_to_schema(m).model_dump(mode="json") for m in movies]
+
+    return _movies_cache.get_or_load(company_id, load, tags=[tenant_tag(company_id)])
 
 
 @router.post("", response_model=schemas.Movie)
@@ -178,6 +199,8 @@ def admin_create_movie(
         "order": payload.order,
     }
     db["movies"].insert_one(document)
+    bump_catalog_version(db, company["_id"])
+    schedule_renditions(db, "movies", document)
     return _movie_document_to_schema(document)
 
 
@@ -208,6 +231,8 @@ def admin_update_movie(
             raise HTTPException(status_code=404, detail="Movie not found")
 
     document = db["movies"].find_one({"_id": movie_id, "company_id": company["_id"]})
+    bump_catalog_version(db, company["_id"])
+    schedule_renditions(db, "movies", document)
     return _movie_document_to_schema(document)
 
 
@@ -220,6 +245,7 @@ def admin_delete_movie(
     result = db["movies"].delete_one({"_id": movie_id, "company_id": company["_id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Movie not found")
+    bump_catalog_version(db, company["_id"])
     return {"status": "ok"}
 
 
@@ -230,6 +256,7 @@ async def admin_enrich_movie(
     db: Database = Depends(get_db)
 ):
     """Fetch metadata from TMDB for this movie and update the database."""
+    from ..enrichment import enrichment_update_fields
     from ..tmdb import enrich_movie
     
     movie = db["movies"].find_one({"_id": movie_id, "company_id": company["_id"]})
@@ -252,91 +279,88 @@ async def admin_enrich_movie(
     if not enriched:
         raise HTTPException(status_code=404, detail=f"No TMDB results for '{title}'")
     
-    update_fields = {
-        "tmdb_id": enriched.tmdb_id,
-        "synopsis": enriched.synopsis,
-        "runtime_minutes": enriched.runtime_minutes,
-        "rating": enriched.rating,
-        "genres": enriched.genres,
-        "directors": enriched.directors,
-        "cast": enriched.cast,
-    }
-    
-    if enriched.poster_url and not movie.get("poster_url"):
-        update_fields["poster_url"] = enriched.poster_url
-    if enriched.landscape_url and not movie.get("landscape_url"):
-        update_fields["landscape_url"] = enriched.landscape_url
-    if enriched.hero_url and not movie.get("hero_url"):
-        update_fields["hero_url"] = enriched.hero_url
-    if enriched.trailer_url and not movie.get("trailer_url"):
-        update_fields["trailer_url"] = enriched.trailer_url
-    
+    update_fields = enrichment_update_fields(movie, enriched)
     db["movies"].update_one({"_id": movie_id, "company_id": company["_id"]}, {"$set": update_fields})
+    bump_catalog_version(db, company["_id"])
     
     updated = db["movies"].find_one({"_id": movie_id, "company_id": company["_id"]})
+    schedule_renditions(db, "movies", updated)
     return _movie_document_to_schema(updated)
 
 
-@router.post("/enrich-all")
-async def admin_enrich_all_movies(
+def _enrichment_job_to_schema(job: dict) -> schemas.EnrichmentJob:
+    return schemas.EnrichmentJob(
+        id=job["_id"],
+        status=job["status"],
+        missingOnly=job.get("missing_only", False),
+        total=job.get("total", 0),
+        processed=job.get("processed", 0),
+        enriched=job.get("enriched", 0),
+        failed=job.get("failed", 0),
+        errors=job.get("errors", []),
+        createdAt=job.get("created_at"),
+        updatedAt=job.get("updated_at"),
+    )
+
+
+@router.post("/enrich-all", response_model=schemas.EnrichmentJob)
+def admin_enrich_all_movies(
+    missing_only: bool = Query(False, alias="missingOnly"),
+    background_tasks: BackgroundTasks = None,
     company: dict = Depends(get_current_company),
     db: Database = Depends(get_db)
 ):
-    """Fetch metadata from TMDB for ALL movies of this company."""
-    from ..tmdb import enrich_movie
-    import asyncio
+    """Start (or resume) a background TMDB enrichment job for this company's movies.
+
+    Poll ``GET /enrich-jobs/{id}`` for progress. If a job is already running it
+    is returned instead of starting a second one; an interrupted job is resumed
+    from the last movie it processed.
+    """
+    from ..enrichment import create_job, find_active_job, is_stale, run_job
+    from ..tmdb import TMDB_API_KEY, TMDB_CACHE
     
-    movies = list(db["movies"].find({"company_id": company["_id"]}))
-    enriched_count = 0
-    failed_count = 0
+    if not TMDB_API_KEY and TMDB_CACHE != "replay":
+        raise HTTPException(status_code=500, detail="TMDB_API_KEY not configured")
     
-    for movie in movies:
-        title = movie.get("title", "")
-        year = movie.get("year")
-        movie_id = movie.get("_id")
-        
-        if not title:
-            failed_count += 1
-            continue
-        
-        try:
-            enriched = await enrich_movie(title, year)
-            
-            if not enriched:
-                failed_count += 1
-                continue
-            
-            update_fields = {
-                "tmdb_id": enriched.tmdb_id,
-                "synopsis": enriched.synopsis,
-                "runtime_minutes": enriched.runtime_minutes,
-                "rating": enriched.rating,
-                "genres": enriched.genres,
-                "directors": enriched.directors,
-                "cast": enriched.cast,
-            }
-            
-            if enriched.poster_url and not movie.get("poster_url"):
-                update_fields["poster_url"] = enriched.poster_url
-            if enriched.landscape_url and not movie.get("landscape_url"):
-                update_fields["landscape_url"] = enriched.landscape_url
-            if enriched.hero_url and not movie.get("hero_url"):
-                update_fields["hero_url"] = enriched.hero_url
-            if enriched.trailer_url and not movie.get("trailer_url"):
-                update_fields["trailer_url"] = enriched.trailer_url
-            
-            db["movies"].update_one({"_id": movie_id, "company_id": company["_id"]}, {"$set": update_fields})
-            enriched_count += 1
-            
-            await asyncio.sleep(0.3)
-            
-        except Exception as e:
-            print(f"Failed to enrich {title}: {e}")
-            failed_count += 1
+    job = find_active_job(db, company["_id"])
+    if job and not is_stale(job):
+        return _enrichment_job_to_schema(job)
+    if not job:
+        job = create_job(db, company["_id"], missing_only)
     
-    return {
-        "status": "ok",
-        "enriched": enriched_count,
-        "failed": failed_count,
-        "total": len(movies)
-    }
+    if background_tasks:
+        background_tasks.add_task(run_job, db, job["_id"])
+    return _enrichment_job_to_schema(job)
+
+
+@router.get("/enrich-jobs/{job_id}", response_model=schemas.EnrichmentJob)
+def admin_get_enrich_job(
+    job_id: str,
+    company: dict = Depends(get_current_company),
+    db: Database = Depends(get_db)
+):
+    job = db["enrichment_jobs"].find_one({"_id": job_id, "company_id": company["_id"]})
+    if not job:
+        raise HTTPException(status_code=404, detail="Enrichment job not found")
+    return _enrichment_job_to_schema(job)
+
+
+@router.post("/enrich-jobs/{job_id}/cancel", response_model=schemas.EnrichmentJob)
+def admin_cancel_enrich_job(
+    job_id: str,
+    company: dict = Depends(get_current_company),
+    db: Database = Depends(get_db)
+):
+    """Stop a job after its current chunk; the movies done so far keep their metadata."""
+    from ..enrichment import ACTIVE_STATUSES
+    
+    job = db["enrichment_jobs"].find_one_and_update(
+        {"_id": job_id, "company_id": company["_id"], "status": {"$in": list(ACTIVE_STATUSES)}},
+        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not job:
+        job = db["enrichment_jobs"].find_one({"_id": job_id, "company_id": company["_id"]})
+        if not job:
+            raise HTTPException(status_code=404, detail="Enrichment job not found")
+    return _enrichment_job_to_schema(job)
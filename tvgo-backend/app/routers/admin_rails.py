@@ -3,6 +3,7 @@ from pymongo.database import Database
 
 from .. import schemas
 from ..auth import get_current_active_admin
+from ..catalog import bump_catalog_version
 from ..config import settings
 from ..database import get_db
 
@@ -44,6 +45,7 @@ def admin_create_rail(payload: schemas.RailAdminCreate, db: Database = Depends(g
         "sort_order": payload.sort_order,
     }
     db["rails"].insert_one(document)
+    bump_catalog_version(db)
     return _rail_document_to_schema(document)
 
 
@@ -59,6 +61,7 @@ def admin_update_rail(rail_id: str, payload: schemas.RailAdminUpdate, db: Databa
             raise HTTPException(status_code=404, detail="Rail not found")
 
     document = db["rails"].find_one({"_id": rail_id})
+    bump_catalog_version(db)
     return _rail_document_to_schema(document)
 
 
@@ -67,4 +70,5 @@ def admin_delete_rail(rail_id: str, db: Database = Depends(get_db)):
     result = db["rails"].delete_one({"_id": rail_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Rail not found")
+    bump_catalog_version(db)
     return {"status": "ok"}
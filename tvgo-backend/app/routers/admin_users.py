@@ -13,6 +13,7 @@ from .. import schemas
 from ..auth import get_current_company_or_admin as get_current_company, get_password_hash
 from ..config import settings
 from ..database import get_db
+from ..tenant_stats import invalidate_tenant_stats
 
 router = APIRouter(
     prefix=f"{settings.api_v1_prefix}/admin/users",
@@ -124,6 +125,7 @@ def create_subscriber_by_mac(
     }
     
     db["subscribers"].insert_one(doc)
+    invalidate_tenant_stats(company["_id"])
     return _subscriber_document_to_schema(doc)
 
 
@@ -170,6 +172,7 @@ def create_subscriber_generated(
     }
     
     db["subscribers"].insert_one(doc)
+    invalidate_tenant_stats(company["_id"])
     
     return _subscriber_document_to_schema(doc)
 
@@ -234,6 +237,8 @@ async def import_mac_users(
         except Exception as e:
             results["errors"].append(f"Error importing {mac}: {str(e)}")
 
+    if results["imported"]:
+        invalidate_tenant_stats(company["_id"])
     return results
 
 
@@ -267,6 +272,8 @@ def update_subscriber(
             if update_data["status"] in is_active_map:
                 update_data["is_active"] = is_active_map[update_data["status"]]
 
+        # Package and status changes reach the subscriber's own ETags
+        # (catalog_validators); the tenant's catalog did not change
         db["subscribers"].update_one({"_id": user_id, "company_id": company["_id"]}, {"$set": update_data})
         
     updated = db["subscribers"].find_one({"_id": user_id, "company_id": company["_id"]})
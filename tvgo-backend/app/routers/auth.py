@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
+from typing import Optional
 
 from fastapi import APIRouter, Depends
+from pymongo import ReturnDocument
 from pymongo.database import Database
 
 from .. import schemas
@@ -13,12 +15,14 @@ from ..auth import (
     create_company_refresh_token,
     get_current_user,
     get_password_hash,
-    get_refresh_token,
+    rotate_refresh_token,
     verify_password,
 )
 from ..config import settings
 from ..database import get_db
 from ..errors import unauthorized, forbidden
+from ..tenant_config import get_config
+from ..tenant_stats import tenant_stats
 
 router = APIRouter(prefix=f"{settings.api_v1_prefix}/auth", tags=["auth"])
 
@@ -39,125 +43,129 @@ def _subscriber_document_to_schema(doc: dict) -> schemas.SubscriberResponse:
     )
 
 
+# Accounts that may log in: an allowed status, or (legacy) no status and not deactivated
+ALLOWED_STATUSES = ["active", "bonus", "test"]
+_ACTIVE_ACCOUNT = {"$or": [
+    {"status": {"$in": ALLOWED_STATUSES}},
+    {"status": {"$in": [None, ""]}, "is_active": {"$ne": False}},
+]}
+
+
+def _touch_device(db: Database, query: dict, mac: str, device_name, now: datetime) -> Optional[dict]:
+    """Update a registered device's last_seen; return the subscriber, or None."""
+    touch = {"devices.$.last_seen": now, "last_login": now}
+    if device_name:
+        touch["devices.$.device_name"] = device_name
+    return db["subscribers"].find_one_and_update(
+        {**query, "devices.mac_address": mac},
+        {"$set": touch},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _register_device(db: Database, subscriber_id, mac: str, device_name, now: datetime) -> Optional[dict]:
+    """Add a device unless the subscriber already has ``max_devices`` of them.
+
+    The limit is checked by the update itself, so concurrent logins from new
+    boxes cannot push an account past it.
+    """
+    new_device = {
+        "mac_address": mac,
+        "device_name": device_name or "Unknown Device",
+        "first_seen": now,
+        "last_seen": now,
+    }
+    return db["subscribers"].find_one_and_update(
+        {
+            "_id": subscriber_id,
+            "devices.mac_address": {"$ne": mac},
+            "$expr": {"$lt": [
+                {"$size": {"$ifNull": ["$devices", []]}},
+                {"$ifNull": ["$max_devices", 1]},
+            ]},
+        },
+        {"$push": {"devices": new_device}, "$set": {"last_login": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
 @router.post("/subscriber/login", response_model=schemas.SubscriberLoginResponse)
 def login_subscriber(
     payload: schemas.SubscriberLogin,
     db: Database = Depends(get_db),
 ):
-    # 1. Authenticate
-    subscriber = None
-    if payload.username and payload.password:
-        subscriber = db["subscribers"].find_one({"username": payload.username})
-        if not subscriber or not verify_password(payload.password, subscriber.get("password_hash", "")):
-             raise unauthorized("Invalid username or password", code="INVALID_CREDENTIALS")
-    elif payload.mac_address:
-        # Login by MAC only (if supported/for initial MAC creation users)
-        subscriber = db["subscribers"].find_one({"mac_address": payload.mac_address})
-        if not subscriber:
-             raise unauthorized("Device not registered", code="INVALID_DEVICE")
-    else:
-        raise unauthorized("Username/Password or MAC required", code="INVALID_REQUEST")
-
-    # Status Check
-    status = subscriber.get("status")
-    # Allowed statuses: active, bonus, test
-    allowed_statuses = ["active", "bonus", "test"]
-    
-    if status and status not in allowed_statuses:
-         raise forbidden(f"Account status is {status}", code="ACCOUNT_INACTIVE")
-    elif not status and not subscriber.get("is_active", True):
-         # Legacy fallback
-         raise forbidden("Account is inactive", code="ACCOUNT_INACTIVE")
-
-    # 2. Check Device / MAC
     current_mac = payload.mac_address
-    if not current_mac:
-        # If logging in with username/pass but no MAC sent, we can't track device
-        # The prompt says "we should receive also user mac address"
-        raise unauthorized("MAC address required for device tracking", code="MAC_REQUIRED")
-
-    devices = subscriber.get("devices", [])
-    device_entry = next((d for d in devices if d["mac_address"] == current_mac), None)
-
     now = datetime.utcnow()
+    subscriber = None
 
-    if device_entry:
-        # Known device, update last seen
-        db["subscribers"].update_one(
-            {"_id": subscriber["_id"], "devices.mac_address": current_mac},
-            {
-                "$set": {
-                    "devices.$.last_seen": now,
-                    "last_login": now,
-                    "devices.$.device_name": payload.device_name or device_entry.get("device_name")
-                }
-            }
-        )
-    else:
-        # New device
-        if len(devices) >= subscriber.get("max_devices", 1):
-            raise forbidden("Device limit reached", code="DEVICE_LIMIT_REACHED")
-        
-        new_device = {
-            "mac_address": current_mac,
-            "device_name": payload.device_name or "Unknown Device",
-            "first_seen": now,
-            "last_seen": now
-        }
-        db["subscribers"].update_one(
-            {"_id": subscriber["_id"]},
-            {
-                "$push": {"devices": new_device},
-                "$set": {"last_login": now}
-            }
+    # Fast path: a registered box logging in by MAC (every app start) is one
+    # update. Anything else, including every error, takes the path below.
+    if current_mac and not (payload.username and payload.password):
+        subscriber = _touch_device(
+            db, {"mac_address": current_mac, **_ACTIVE_ACCOUNT}, current_mac, payload.device_name, now
         )
-        # Update local subscriber object for response
-        devices.append(new_device)
-        subscriber["devices"] = devices
+
+    if subscriber is None:
+        # 1. Authenticate
+        if payload.username and payload.password:
+            subscriber = db["subscribers"].find_one({"username": payload.username})
+            if not subscriber or not verify_password(payload.password, subscriber.get("password_hash", "")):
+                raise unauthorized("Invalid username or password", code="INVALID_CREDENTIALS")
+        elif current_mac:
+            # Login by MAC only (if supported/for initial MAC creation users)
+            subscriber = db["subscribers"].find_one({"mac_address": current_mac})
+            if not subscriber:
+                raise unauthorized("Device not registered", code="INVALID_DEVICE")
+        else:
+            raise unauthorized("Username/Password or MAC required", code="INVALID_REQUEST")
+
+        # Status Check
+        status = subscriber.get("status")
+        if status and status not in ALLOWED_STATUSES:
+            raise forbidden(f"Account status is {status}", code="ACCOUNT_INACTIVE")
+        elif not status and not subscriber.get("is_active", True):
+            # Legacy fallback
+            raise forbidden("Account is inactive", code="ACCOUNT_INACTIVE")
+
+        # 2. Check Device / MAC
+        if not current_mac:
+            # If logging in with username/pass but no MAC sent, we can't track device
+            raise unauthorized("MAC address required for device tracking", code="MAC_REQUIRED")
+
+        known = any(d.get("mac_address") == current_mac for d in subscriber.get("devices", []))
+        if known:
+            updated = _touch_device(db, {"_id": subscriber["_id"]}, current_mac, payload.device_name, now)
+        else:
+            updated = _register_device(db, subscriber["_id"], current_mac, payload.device_name, now)
+            if updated is None:
+                # Either the limit is reached, or a concurrent login registered this box
+                updated = _touch_device(db, {"_id": subscriber["_id"]}, current_mac, payload.device_name, now)
+                if updated is None:
+                    raise forbidden("Device limit reached", code="DEVICE_LIMIT_REACHED")
+        subscriber = updated or subscriber
 
     # 3. Issue Token
-    # We use a special prefix or claim to distinguish subscribers from admins?
-    # Or just use "sub": username.
-    # Users have generated usernames, Admins have "admin".
-    # Conflict risk: low if admins are specialized.
-    # Ideally use "role": "subscriber" or "scope".
-    
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes * 24 * 30) # Long expiration for TV
     access_token = create_access_token(
-        data={"sub": subscriber.get("username") or subscriber["_id"], "role": "subscriber", "id": subscriber["_id"]},
+        data={
+            "sub": subscriber.get("username") or subscriber["_id"],
+            "role": "subscriber",
+            "id": subscriber["_id"],
+            "company_id": subscriber.get("company_id"),
+        },
         expires_delta=access_token_expires
     )
-    refresh_token, _ = create_refresh_token(db, subscriber.get("username") or subscriber["_id"])
-    
-    # Fetch Config for App (Logo, Colors, etc.)
-    brand_doc = db["brand_config"].find_one({"_id": "brand"}) or {}
-    
-    brand = schemas.Brand(
-        appName=brand_doc.get("app_name", "tvGO"),
-        logoUrl=brand_doc.get("logo_url", "https://cdn.tvgo.cloud/brand/tvgo-logo.png"),
-        accentColor=brand_doc.get("accent_color", "#1EA7FD"),
-        backgroundColor=brand_doc.get("background_color", "#050607"),
-    )
-    
-    features = schemas.Features(
-         enableFavorites=brand_doc.get("enable_favorites", True),
-         enableSearch=brand_doc.get("enable_search", True),
-         autoplayPreview=brand_doc.get("autoplay_preview", True),
-    )
-    
-    config_response = schemas.ConfigResponse(
-        brand=brand,
-        features=features,
-        channelGroups=brand_doc.get("channel_groups", ["All", "Favorites", "Kids", "Sports", "News", "Entertainment", "Movies"]),
-        movieGenres=brand_doc.get("movie_genres", ["All", "Action", "Comedy", "Drama", "Kids & Family", "Sci-Fi", "Thriller", "Horror", "Romance"]),
+    refresh_token, _ = create_refresh_token(
+        db, subscriber.get("username") or subscriber["_id"], device=current_mac
     )
 
+    # The tenant's app config (logo, colours, features), from the tenant config cache
     return schemas.SubscriberLoginResponse(
         accessToken=access_token,
         refreshToken=refresh_token,
         expiresIn=int(access_token_expires.total_seconds()),
         subscriber=_subscriber_document_to_schema(subscriber),
-        config=config_response
+        config=get_config(db, subscriber.get("company_id")),
     )
 
 
@@ -215,17 +223,17 @@ def bootstrap_admin(db: Database = Depends(get_db)):
 
 @router.post("/refresh", response_model=schemas.RefreshResponse)
 def refresh_access_token(request: schemas.RefreshRequest, db: Database = Depends(get_db)):
-    stored = get_refresh_token(db, request.refreshToken)
-    if not stored:
-        raise unauthorized("Invalid refresh token", code="INVALID_REFRESH_TOKEN")
-    if stored.get("expires_at") and stored["expires_at"] < datetime.utcnow():
-        raise unauthorized("Refresh token expired", code="INVALID_REFRESH_TOKEN")
+    rotated = rotate_refresh_token(db, request.refreshToken)
+    if not rotated:
+        raise unauthorized("Invalid or expired refresh token", code="INVALID_REFRESH_TOKEN")
+    stored, refresh_token, _ = rotated
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": stored["username"]}, expires_delta=access_token_expires
     )
     return schemas.RefreshResponse(
         accessToken=access_token,
+        refreshToken=refresh_token,
         expiresIn=int(access_token_expires.total_seconds()),
     )
 
@@ -288,9 +296,7 @@ def _company_document_to_response(doc: dict, db) -> schemas.CompanyResponse:
     company_id = doc.get("_id") or doc.get("id")
     
     # Get counts
-    user_count = db["subscribers"].count_documents({"company_id": company_id})
-    channel_count = db["channels"].count_documents({"company_id": company_id})
-    movie_count = db["movies"].count_documents({"company_id": company_id})
+    stats = tenant_stats(db, company_id)
     
     # Parse services
     services_data = doc.get("services", {})
@@ -309,9 +315,9 @@ def _company_document_to_response(doc: dict, db) -> schemas.CompanyResponse:
         is_active=doc.get("is_active", True),
         services=services,
         created_at=doc.get("created_at"),
-        user_count=user_count,
-        channel_count=channel_count,
-        movie_count=movie_count,
+        user_count=stats["users"],
+        channel_count=stats["channels"],
+        movie_count=stats["movies"],
     )
 
 
@@ -7,17 +7,23 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File,
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+import asyncio
 import urllib.request
 import xml.etree.ElementTree as ET
 import os
 import re
 import shutil
+import uuid
 from pymongo.database import Database
 
 # Fix: Import proper auth dependency and alias it
 from ..auth import get_current_active_admin as require_admin
+from ..catalog import bump_catalog_version
 from ..database import get_db
-from ..aws_s3 import upload_image_from_url
+from ..epg_scheduler import request_now_next_refresh
+from ..images import schedule_renditions
+from ..media_store import mirror_image
+from ..xmltv import XMLTVDateParser, merge_epg_sources
 
 router = APIRouter(prefix="/api/admin/epg", tags=["EPG Management"])
 
@@ -68,6 +74,7 @@ class EPGParseResponse(BaseModel):
     channels: List[EPGChannel]
     programs_count: int
     source_url: Optional[str] = None
+    malformed_dates: int = 0
 
 
 class EPGSyncResult(BaseModel):
@@ -76,6 +83,8 @@ class EPGSyncResult(BaseModel):
     programs_parsed: int
     mappings_applied: int
     errors: List[str] = []
+    sources_merged: int = 0
+    duplicates_dropped: int = 0
 
 
 # --- EPG Cache Directory ---
@@ -85,31 +94,6 @@ os.makedirs(EPG_CACHE_DIR, exist_ok=True)
 
 # --- Helper Functions ---
 
-def parse_xmltv_date(date_str: str) -> datetime:
-    """Convert XMLTV date format to datetime object using standard library"""
-    try:
-        # XMLTV format: YYYYMMDDhhmmss +0000
-        return datetime.strptime(date_str, "%Y%m%d%H%M%S %z")
-    except Exception:
-        try:
-            # Try parsing just the date part if format is slightly diff or no space
-            # normalize "20080715003000+0200" -> "20080715003000 +0200"
-            if '+' in date_str and ' ' not in date_str:
-                # Insert space before +
-                idx = date_str.find('+')
-                date_str = date_str[:idx] + ' ' + date_str[idx:]
-                return datetime.strptime(date_str, "%Y%m%d%H%M%S %z")
-            
-            # Use split to ignore timezone or garbage
-            clean_date = date_str.split()[0]
-            if '+' in clean_date: clean_date = clean_date.split('+')[0]
-            if '-' in clean_date: clean_date = clean_date.split('-')[0] # risky if YYYY-MM
-             
-            return datetime.strptime(clean_date, "%Y%m%d%H%M%S")
-        except:
-            return datetime.utcnow()
-
-
 def download_epg(url: str, force: bool = False) -> str:
     """Download EPG XML from URL with caching"""
     cache_file = os.path.join(
@@ -139,8 +123,16 @@ def download_epg(url: str, force: bool = False) -> str:
         raise HTTPException(status_code=500, detail=f"Failed to download EPG: {str(e)}")
 
 
-def parse_epg_xml(xml_path: str) -> tuple[List[EPGChannel], List[EPGProgram]]:
-    """Parse EPG XML file and return channels and programs"""
+def parse_epg_xml(
+    xml_path: str,
+    date_parser: Optional[XMLTVDateParser] = None
+) -> tuple[List[EPGChannel], List[EPGProgram]]:
+    """Parse EPG XML file and return channels and programs.
+
+    Programmes with malformed timestamps are skipped and counted on
+    ``date_parser`` so callers can report them.
+    """
+    date_parser = date_parser or XMLTVDateParser()
     try:
         context = ET.iterparse(xml_path, events=('end',))
         channels = []
@@ -168,11 +160,16 @@ def parse_epg_xml(xml_path: str) -> tuple[List[EPGChannel], List[EPGProgram]]:
                 category_elem = elem.find('category')
                 
                 if channel_id and start and title_elem is not None:
+                    start_dt = date_parser.parse(start)
+                    stop_dt = date_parser.parse(stop) if stop else start_dt
+                    if start_dt is None or stop_dt is None:
+                        elem.clear()
+                        continue
                     programs.append(EPGProgram(
                         channel_id=channel_id,
                         title=title_elem.text or "",
-                        start=parse_xmltv_date(start),
-                        stop=parse_xmltv_date(stop) if stop else parse_xmltv_date(start),
+                        start=start_dt,
+                        stop=stop_dt,
                         description=desc_elem.text if desc_elem is not None else None,
                         category=category_elem.text if category_elem is not None else None
                     ))
@@ -236,63 +233,68 @@ async def delete_epg_source(source_id: str, db: Database = Depends(get_db)):
 @router.post("/preview", dependencies=[Depends(require_admin)])
 async def preview_epg_url(url: str, force: bool = False):
     xml_path = download_epg(url, force)
-    channels, programs = parse_epg_xml(xml_path)
+    date_parser = XMLTVDateParser()
+    channels, programs = parse_epg_xml(xml_path, date_parser)
     return EPGParseResponse(
         channels=channels[:100],
         programs_count=len(programs),
-        source_url=url
+        source_url=url,
+        malformed_dates=date_parser.malformed
     )
 
 
+def _program_to_document(p: EPGProgram) -> dict:
+    return {
+        "channel_id": p.channel_id,
+        "program_id": f"{p.channel_id}_{p.start.timestamp()}",
+        "title": p.title,
+        "start": p.start,
+        "end": p.stop,
+        "description": p.description,
+        "category": p.category,
+        "is_live": False
+    }
+
+
 def save_programs_to_mongo(programs: List[EPGProgram], db: Database):
     """Save programs to MongoDB"""
-    docs = []
-    for p in programs:
-        docs.append({
-            "channel_id": p.channel_id,
-            "program_id": f"{p.channel_id}_{p.start.timestamp()}",
-            "title": p.title,
-            "start": p.start,
-            "end": p.stop,
-            "description": p.description,
-            "category": p.category,
-            "is_live": False
-        })
+    docs = [_program_to_document(p) for p in programs]
     
     if docs:
         try:
             db["epg_programs"].insert_many(docs, ordered=False)
         except Exception:
             pass 
+        request_now_next_refresh()
 
 
-@router.post("/sync", dependencies=[Depends(require_admin)])
-async def sync_epg(
-    source_id: Optional[str] = None,
-    url: Optional[str] = None,
-    force: bool = False,
-    background_tasks: BackgroundTasks = None,
-    db: Database = Depends(get_db)
-):
-    if not source_id and not url:
-        raise HTTPException(status_code=400, detail="Provide either source_id or url")
-    
-    errors = []
-    if source_id:
-        source = db["epg_sources"].find_one({"_id": source_id})
-        if not source: raise HTTPException(status_code=404, detail="Source not found")
-        url = source.get('url')
-    
-    try:
-        xml_path = download_epg(url, force)
-        epg_channels, programs = parse_epg_xml(xml_path)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse EPG: {str(e)}")
+def replace_programs_in_mongo(programs: List[EPGProgram], db: Database):
+    """Replace the stored guide of every channel present in a merged result.
 
+    The new programmes are written first, tagged with this run's id, and the
+    previous runs' programmes are deleted afterwards, so guide reads never see
+    a channel without programmes. An insert failure propagates and leaves the
+    old guide in place.
+    """
+    channel_ids = list({p.channel_id for p in programs})
+    if not channel_ids:
+        return
+    sync_run = uuid.uuid4().hex
+    docs = []
+    for program in programs:
+        document = _program_to_document(program)
+        document["sync_run"] = sync_run
+        docs.append(document)
+    db["epg_programs"].insert_many(docs, ordered=False)
+    db["epg_programs"].delete_many({"channel_id": {"$in": channel_ids}, "sync_run": {"$ne": sync_run}})
+    request_now_next_refresh()
+
+
+async def apply_channel_mappings(epg_channels: List[EPGChannel], db: Database) -> int:
+    """Auto-map our channels to EPG channels by name, mirroring missing logos"""
     mappings_applied = 0
     our_channels = list(db["channels"].find())
     
-    # Auto Map
     for channel in our_channels:
         channel_name = channel.get('name', '').lower()
         if not channel_name: continue
@@ -311,7 +313,7 @@ async def sync_epg(
             # Download logo from EPG and upload to S3 if channel doesn't have one
             if not channel.get('logo_url') and best_match.icon_url:
                 try:
-                    s3_logo_url = await upload_image_from_url(best_match.icon_url, prefix="channel-logos")
+                    s3_logo_url = await mirror_image(db, best_match.icon_url, prefix="channel-logos")
                     if s3_logo_url:
                         update_fields["logo_url"] = s3_logo_url
                         print(f"Uploaded logo for {channel.get('name')}: {s3_logo_url}")
@@ -324,8 +326,55 @@ async def sync_epg(
                 {"_id": channel["_id"]},
                 {"$set": update_fields}
             )
+            if "logo_url" in update_fields:
+                schedule_renditions(db, "channels", {**channel, **update_fields})
             mappings_applied += 1
 
+    if mappings_applied:
+        # Mapping runs across every tenant's channels
+        bump_catalog_version(db)
+        request_now_next_refresh()
+    return mappings_applied
+
+
+def load_epg_source(
+    url: str, force: bool = False
+) -> tuple[List[EPGChannel], List[EPGProgram], XMLTVDateParser]:
+    """Download and parse a single source (blocking, run in a worker thread)"""
+    xml_path = download_epg(url, force)
+    date_parser = XMLTVDateParser()
+    channels, programs = parse_epg_xml(xml_path, date_parser)
+    return channels, programs, date_parser
+
+
+@router.post("/sync", dependencies=[Depends(require_admin)])
+async def sync_epg(
+    source_id: Optional[str] = None,
+    url: Optional[str] = None,
+    force: bool = False,
+    background_tasks: BackgroundTasks = None,
+    db: Database = Depends(get_db)
+):
+    if not source_id and not url:
+        raise HTTPException(status_code=400, detail="Provide either source_id or url")
+    
+    errors = []
+    if source_id:
+        source = db["epg_sources"].find_one({"_id": source_id})
+        if not source: raise HTTPException(status_code=404, detail="Source not found")
+        url = source.get('url')
+    
+    date_parser = XMLTVDateParser()
+    try:
+        xml_path = download_epg(url, force)
+        epg_channels, programs = parse_epg_xml(xml_path, date_parser)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to parse EPG: {str(e)}")
+    if date_parser.malformed:
+        errors.append(date_parser.summary())
+
+    mappings_applied = await apply_channel_mappings(epg_channels, db)
+
     # Save Programs
     if background_tasks:
         background_tasks.add_task(save_programs_to_mongo, programs, db)
@@ -347,6 +396,68 @@ async def sync_epg(
     )
 
 
+@router.post("/sync-all", dependencies=[Depends(require_admin)])
+async def sync_all_epg_sources(
+    force: bool = False,
+    background_tasks: BackgroundTasks = None,
+    db: Database = Depends(get_db)
+):
+    """Load every enabled source concurrently and store one merged guide.
+
+    Lower ``priority`` values win; lower-priority sources only fill the gaps.
+    """
+    sources = list(db["epg_sources"].find({"enabled": {"$ne": False}}).sort("priority", 1))
+    if not sources:
+        raise HTTPException(status_code=404, detail="No enabled EPG sources")
+
+    results = await asyncio.gather(
+        *(asyncio.to_thread(load_epg_source, s.get("url"), force) for s in sources),
+        return_exceptions=True
+    )
+
+    errors = []
+    loaded = []
+    loaded_sources = []
+    for source, result in zip(sources, results):
+        if isinstance(result, Exception):
+            detail = result.detail if isinstance(result, HTTPException) else str(result)
+            errors.append(f"{source.get('name', source['_id'])}: {detail}")
+            continue
+        source_channels, source_programs, date_parser = result
+        if date_parser.malformed:
+            errors.append(f"{source.get('name', source['_id'])}: {date_parser.summary()}")
+        loaded.append((source_channels, source_programs))
+        loaded_sources.append(source)
+
+    if not loaded:
+        raise HTTPException(status_code=500, detail=f"Failed to load EPG sources: {'; '.join(errors)}")
+
+    epg_channels, programs, dropped = merge_epg_sources(loaded)
+    mappings_applied = await apply_channel_mappings(epg_channels, db)
+
+    if background_tasks:
+        background_tasks.add_task(replace_programs_in_mongo, programs, db)
+    else:
+        replace_programs_in_mongo(programs, db)
+
+    now = datetime.utcnow()
+    for source, (source_channels, _) in zip(loaded_sources, loaded):
+        db["epg_sources"].update_one(
+            {"_id": source["_id"]},
+            {"$set": {"last_sync": now, "channel_count": len(source_channels)}}
+        )
+
+    return EPGSyncResult(
+        status="completed" if len(loaded) == len(sources) else "partial",
+        channels_parsed=len(epg_channels),
+        programs_parsed=len(programs),
+        mappings_applied=mappings_applied,
+        errors=errors,
+        sources_merged=len(loaded),
+        duplicates_dropped=dropped
+    )
+
+
 @router.post("/upload", dependencies=[Depends(require_admin)])
 async def upload_epg_file(
     file: UploadFile = File(...), 
@@ -358,7 +469,8 @@ async def upload_epg_file(
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
             
-        epg_channels, programs = parse_epg_xml(file_path)
+        date_parser = XMLTVDateParser()
+        epg_channels, programs = parse_epg_xml(file_path, date_parser)
         
         if background_tasks:
             background_tasks.add_task(save_programs_to_mongo, programs, db)
@@ -366,42 +478,15 @@ async def upload_epg_file(
             save_programs_to_mongo(programs, db)
             
         # Also perform mapping
-        mappings_applied = 0
-        our_channels = list(db["channels"].find())
-        for channel in our_channels:
-            channel_name = channel.get('name', '').lower()
-            if not channel_name: continue
-            best_match = None
-            best_score = 0
-            for epg_ch in epg_channels:
-                score = calculate_similarity(channel_name, epg_ch.display_name)
-                if score > best_score:
-                    best_score = score
-                    best_match = epg_ch
-            if best_match and best_score >= 0.8:
-                update_fields = {"epg_id": best_match.id}
-
-                # Download logo from EPG and upload to S3 if channel doesn't have one
-                if not channel.get('logo_url') and best_match.icon_url:
-                    try:
-                        s3_logo_url = await upload_image_from_url(best_match.icon_url, prefix="channel-logos")
-                        if s3_logo_url:
-                            update_fields["logo_url"] = s3_logo_url
-                            print(f"Uploaded logo for {channel.get('name')}: {s3_logo_url}")
-                    except Exception as e:
-                        print(f"Failed to upload logo for {channel.get('name')}: {e}")
-                        # Fallback to original URL
-                        update_fields["logo_url"] = best_match.icon_url
-
-                db["channels"].update_one({"_id": channel["_id"]}, {"$set": update_fields})
-                mappings_applied += 1
+        mappings_applied = await apply_channel_mappings(epg_channels, db)
         
         return {
             "status": "uploaded", 
             "channels": len(epg_channels), 
             "programs": len(programs),
             "mapped": mappings_applied,
-            "message": "File processed."
+            "malformed_dates": date_parser.malformed,
+            "message": date_parser.summary() or "File processed."
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload: {str(e)}")
@@ -441,4 +526,6 @@ async def set_channel_mapping(mapping: ChannelMapping, db: Database = Depends(ge
         {"_id": mapping.channel_id},
         {"$set": {"epg_id": mapping.epg_channel_id}}
     )
+    bump_catalog_version(db)
+    request_now_next_refresh()
     return {"status": "mapped", "channel_id": mapping.channel_id, "epg_id": mapping.epg_channel_id}
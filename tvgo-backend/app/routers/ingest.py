@@ -1,14 +1,15 @@
 import re
 from typing import List, Optional
 
-import httpx
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from pymongo.database import Database
 
 from .. import schemas
 from ..auth import get_current_company_or_admin
+from ..catalog import bump_catalog_version
 from ..config import settings
 from ..database import get_db
+from ..tenant_stats import refresh_streamer_channel_counts
 
 router = APIRouter(
     prefix=f"{settings.api_v1_prefix}/admin/ingest",
@@ -85,10 +86,17 @@ def parse_m3u_content(content: str) -> List[schemas.M3UChannelPreview]:
 
 async def fetch_m3u_from_url(url: str) -> str:
     """Fetch M3U content from a URL, following redirects."""
-    async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        return response.text
+    import httpx  # deferred: only M3U imports need it, and it slows cold starts
+
+    try:
+        async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            return response.text
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to fetch M3U: HTTP {e.response.status_code}")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to fetch M3U: {str(e)}")
 
 
 @router.post("/m3u")
@@ -123,11 +131,10 @@ async def ingest_m3u(file: UploadFile = File(...), db: Database = Depends(get_db
         if result.upserted_id is not None:
             created += 1
 
-    try:
-        from . import admin_channels
-        admin_channels._invalidate_cache()
-    except ImportError:
-        pass
+    # Channels uploaded here are not tenant scoped
+    from . import admin_channels
+    admin_channels._channels_cache.clear()
+    bump_catalog_version(db)
 
     return {"status": "ok", "created": created}
 
@@ -141,12 +148,7 @@ async def preview_m3u_from_url(
     Fetch M3U from URL and return parsed channels for preview.
     This allows the frontend to show channels before importing.
     """
-    try:
-        content = await fetch_m3u_from_url(request.url)
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=400, detail=f"Failed to fetch M3U: HTTP {e.response.status_code}")
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=400, detail=f"Failed to fetch M3U: {str(e)}")
+    content = await fetch_m3u_from_url(request.url)
     
     channels = parse_m3u_content(content)
     return schemas.M3UParseResponse(channels=channels, total=len(channels))
@@ -175,12 +177,7 @@ async def ingest_m3u_from_url(
     """
     company_id = company["_id"]
     
-    try:
-        content = await fetch_m3u_from_url(request.url)
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=400, detail=f"Failed to fetch M3U: HTTP {e.response.status_code}")
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=400, detail=f"Failed to fetch M3U: {str(e)}")
+    content = await fetch_m3u_from_url(request.url)
     
     channels = parse_m3u_content(content)
     
@@ -222,11 +219,11 @@ async def ingest_m3u_from_url(
         elif result.modified_count > 0:
             updated += 1
 
-    try:
-        from . import admin_channels
-        admin_channels._invalidate_cache(str(company_id))
-    except ImportError:
-        pass
+    from . import admin_channels
+    admin_channels._invalidate_cache(str(company_id))
+    bump_catalog_version(db, company_id)
+    if created or updated:
+        refresh_streamer_channel_counts(db, company_id)
 
     return {
         "status": "ok",
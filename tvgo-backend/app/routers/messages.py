@@ -1,14 +1,20 @@
+import asyncio
+from collections import deque
 from datetime import datetime
 import uuid
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pymongo.database import Database
 
 from .. import schemas
 from ..auth import get_current_company_or_admin as get_current_company, get_current_subscriber
 from ..config import settings
 from ..database import get_db
+from ..events import hub, publish_message, publish_message_deleted
+from .user_groups import message_group_members, subscriber_group_ids
 
 # Admin router for message management
 admin_router = APIRouter(
@@ -34,23 +40,40 @@ def _message_doc_to_response(doc: dict) -> schemas.MessageResponse:
         target_ids=doc.get("target_ids", []),
         is_active=doc.get("is_active", True),
         created_at=doc.get("created_at"),
-        read_by=doc.get("read_by", []),
+        read_count=doc.get("read_count", 0),
     )
 
 
-def _message_doc_to_subscriber_response(doc: dict, subscriber_id: str) -> schemas.SubscriberMessageResponse:
+def _message_doc_to_subscriber_response(doc: dict, is_read: bool) -> schemas.SubscriberMessageResponse:
     """Convert MongoDB document to SubscriberMessageResponse"""
-    read_by = doc.get("read_by", [])
     return schemas.SubscriberMessageResponse(
         id=doc["_id"],
         title=doc["title"],
         body=doc["body"],
         url=doc.get("url"),
         created_at=doc.get("created_at"),
-        is_read=subscriber_id in read_by,
+        is_read=is_read,
     )
 
 
+# Read receipts live in message_reads, one document per (message, subscriber),
+# with a read_count counter on the message. Messages never carry the list of
+# readers, so a broadcast stays small however many subscribers read it.
+# Documents written before this carry a read_by array; the projection keeps it
+# out of reads (scripts/migrate_message_reads.py moves it over).
+MESSAGE_PROJECTION = {"read_by": 0}
+
+
+def _read_message_ids(db: Database, subscriber_id: str, message_ids: List[str]) -> set:
+    if not message_ids:
+        return set()
+    reads = db["message_reads"].find(
+        {"subscriber_id": subscriber_id, "message_id": {"$in": message_ids}},
+        {"message_id": 1, "_id": 0},
+    )
+    return {r["message_id"] for r in reads}
+
+
 # ============ Admin Endpoints ============
 
 @admin_router.get("", response_model=schemas.MessageListResponse)
@@ -67,7 +90,7 @@ def list_messages(
         query["is_active"] = True
 
     total = db["messages"].count_documents(query)
-    cursor = db["messages"].find(query).skip(skip).limit(limit).sort("created_at", -1)
+    cursor = db["messages"].find(query, MESSAGE_PROJECTION).skip(skip).limit(limit).sort("created_at", -1)
     
     items = [_message_doc_to_response(doc) for doc in cursor]
     return {"items": items, "total": total}
@@ -80,7 +103,7 @@ def get_message(
     db: Database = Depends(get_db)
 ):
     """Get a single message by ID"""
-    doc = db["messages"].find_one({"_id": message_id, "company_id": company["_id"]})
+    doc = db["messages"].find_one({"_id": message_id, "company_id": company["_id"]}, MESSAGE_PROJECTION)
     if not doc:
         raise HTTPException(status_code=404, detail="Message not found")
     return _message_doc_to_response(doc)
@@ -96,21 +119,16 @@ def send_message(
     message_id = uuid.uuid4().hex
     now = datetime.utcnow()
     
-    resolved_user_ids = []
-    
-    if payload.target_type == schemas.MessageTargetType.ALL:
-        pass
-    elif payload.target_type == schemas.MessageTargetType.GROUPS:
-        if payload.target_ids:
-            groups = db["user_groups"].find({
-                "_id": {"$in": payload.target_ids},
-                "company_id": company["_id"]
-            })
-            for group in groups:
-                resolved_user_ids.extend(group.get("user_ids", []))
-            resolved_user_ids = list(set(resolved_user_ids))
-    elif payload.target_type == schemas.MessageTargetType.USERS:
-        resolved_user_ids = payload.target_ids
+    # Group targets are stored as group ids and resolved against membership
+    # when subscribers fetch their inbox, so messages stay small however
+    # large the groups are
+    if payload.target_type == schemas.MessageTargetType.GROUPS and payload.target_ids:
+        found = db["user_groups"].count_documents({
+            "_id": {"$in": payload.target_ids},
+            "company_id": company["_id"]
+        })
+        if found != len(set(payload.target_ids)):
+            raise HTTPException(status_code=400, detail="Unknown user group")
     
     doc = {
         "_id": message_id,
@@ -120,13 +138,13 @@ def send_message(
         "url": payload.url,
         "target_type": payload.target_type.value,
         "target_ids": payload.target_ids,
-        "resolved_user_ids": resolved_user_ids,
         "is_active": True,
         "created_at": now,
-        "read_by": [],
+        "read_count": 0,
     }
     
     db["messages"].insert_one(doc)
+    publish_message(doc, message_group_members(db, doc))
     return _message_doc_to_response(doc)
 
 
@@ -138,18 +156,21 @@ def delete_message(
     db: Database = Depends(get_db)
 ):
     """Delete or deactivate a message"""
-    existing = db["messages"].find_one({"_id": message_id, "company_id": company["_id"]})
+    existing = db["messages"].find_one({"_id": message_id, "company_id": company["_id"]}, {"_id": 1})
     if not existing:
         raise HTTPException(status_code=404, detail="Message not found")
 
     if hard_delete:
         db["messages"].delete_one({"_id": message_id, "company_id": company["_id"]})
+        db["message_reads"].delete_many({"message_id": message_id})
+        publish_message_deleted(company["_id"], message_id)
         return {"status": "ok", "message": "Message permanently deleted"}
     else:
         db["messages"].update_one(
             {"_id": message_id, "company_id": company["_id"]},
             {"$set": {"is_active": False}}
         )
+        publish_message_deleted(company["_id"], message_id)
         return {"status": "ok", "message": "Message deactivated"}
 
 
@@ -166,31 +187,96 @@ def get_subscriber_messages(
     subscriber_id = current_user["_id"]
     company_id = current_user.get("company_id")
     
-    user_groups = db["user_groups"].find({"user_ids": subscriber_id, "company_id": company_id})
-    user_group_ids = [g["_id"] for g in user_groups]
+    user_group_ids = subscriber_group_ids(db, company_id, subscriber_id)
     
     query = {
         "is_active": True,
         "company_id": company_id,  # Only messages for subscriber's company
         "$or": [
             {"target_type": "all"},
-            {"target_type": "users", "resolved_user_ids": subscriber_id},
+            {"target_type": "users", "target_ids": subscriber_id},
             {"target_type": "groups", "target_ids": {"$in": user_group_ids}},
         ]
     }
     
-    total = db["messages"].count_documents(query)
-    cursor = db["messages"].find(query).skip(skip).limit(limit).sort("created_at", -1)
+    # Total and unread counts in one round trip: each visible message probes
+    # the (subscriber_id, message_id) index of message_reads for a receipt
+    counts = next(db["messages"].aggregate([
+        {"$match": query},
+        {"$project": {"_id": 1}},
+        {"$lookup": {
+            "from": "message_reads",
+            "let": {"message_id": "$_id"},
+            "pipeline": [
+                {"$match": {"subscriber_id": subscriber_id, "$expr": {"$eq": ["$message_id", "$$message_id"]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 1}},
+            ],
+            "as": "read",
+        }},
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "unread": {"$sum": {"$cond": [{"$eq": [{"$size": "$read"}, 0]}, 1, 0]}},
+        }},
+    ]), {"total": 0, "unread": 0})
     
-    items = []
-    unread_count = 0
-    for doc in cursor:
-        msg = _message_doc_to_subscriber_response(doc, subscriber_id)
-        items.append(msg)
-        if not msg.is_read:
-            unread_count += 1
+    docs = list(db["messages"].find(query, MESSAGE_PROJECTION).skip(skip).limit(limit).sort("created_at", -1))
+    read_ids = _read_message_ids(db, subscriber_id, [doc["_id"] for doc in docs])
+    items = [_message_doc_to_subscriber_response(doc, doc["_id"] in read_ids) for doc in docs]
     
-    return {"items": items, "total": total, "unread_count": unread_count}
+    return {"items": items, "total": counts["total"], "unread_count": counts["unread"]}
+
+
+# Seconds between SSE keep-alive comments; proxies drop silent connections
+STREAM_HEARTBEAT = 20
+
+
+def _sse(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+async def _event_stream(company_id, subscriber_id: str) -> AsyncIterator[bytes]:
+    subscription = hub.subscribe(company_id, subscriber_id)
+    # Local sends are also relayed by the change-stream watcher
+    delivered = deque(maxlen=256)
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+
+            if event["event"] != "message":
+                yield _sse(event["event"], event["data"])
+                continue
+            message = event["message"]
+            # The hub only delivers messages to the subscribers they target
+            if message["_id"] in delivered or not message.get("is_active", True):
+                continue
+            delivered.append(message["_id"])
+            payload = _message_doc_to_subscriber_response(message, is_read=False)
+            yield _sse("message", payload.model_dump(mode="json"))
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@public_router.get("/stream")
+async def stream_messages(current_user: dict = Depends(get_current_subscriber)):
+    """Server-sent events for the current subscriber, replacing inbox polling.
+
+    Events: ``message`` (a new message for this subscriber, same shape as the
+    inbox items), ``message_deleted`` (``{"id"}``) and ``catalog``
+    (``{"scope", "version"}``, a hint to refetch config and lineups). Clients
+    should fetch ``/api/messages`` once on (re)connect to catch up.
+    """
+    return StreamingResponse(
+        _event_stream(current_user.get("company_id"), current_user["_id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @public_router.get("/broadcast", response_model=schemas.SubscriberMessagesListResponse)
@@ -210,18 +296,11 @@ def get_broadcast_messages(
     }
     
     total = db["messages"].count_documents(query)
-    cursor = db["messages"].find(query).skip(skip).limit(limit).sort("created_at", -1)
+    cursor = db["messages"].find(query, MESSAGE_PROJECTION).skip(skip).limit(limit).sort("created_at", -1)
     
     items = []
     for doc in cursor:
-        items.append(schemas.SubscriberMessageResponse(
-            id=doc["_id"],
-            title=doc["title"],
-            body=doc["body"],
-            url=doc.get("url"),
-            created_at=doc.get("created_at"),
-            is_read=False
-        ))
+        items.append(_message_doc_to_subscriber_response(doc, is_read=False))
     
     return {"items": items, "total": total, "unread_count": total}
 
@@ -236,12 +315,22 @@ def mark_message_read(
     subscriber_id = current_user["_id"]
     company_id = current_user.get("company_id")
     
-    result = db["messages"].update_one(
-        {"_id": message_id, "company_id": company_id},
-        {"$addToSet": {"read_by": subscriber_id}}
-    )
-    
-    if result.matched_count == 0:
+    if not db["messages"].find_one({"_id": message_id, "company_id": company_id}, {"_id": 1}):
         raise HTTPException(status_code=404, detail="Message not found")
     
+    now = datetime.utcnow()
+    result = db["message_reads"].update_one(
+        {"_id": f"{message_id}:{subscriber_id}"},
+        {"$setOnInsert": {
+            "message_id": message_id,
+            "subscriber_id": subscriber_id,
+            "company_id": company_id,
+            "read_at": now,
+        }},
+        upsert=True,
+    )
+    # Count each subscriber once, however often the client reports the read
+    if result.upserted_id is not None:
+        db["messages"].update_one({"_id": message_id}, {"$inc": {"read_count": 1}})
+    
     return {"status": "ok", "message": "Message marked as read"}
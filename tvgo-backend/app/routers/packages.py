@@ -7,6 +7,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from pymongo.database import Database
 
 from ..auth import get_current_company_or_admin as get_current_company
+from ..catalog import bump_catalog_version
 from ..config import settings
 from ..database import get_db
 
@@ -108,6 +109,7 @@ def create_package(
     }
     result = db["packages"].insert_one(document)
     document["_id"] = result.inserted_id
+    bump_catalog_version(db, company["_id"])
     return package_doc_to_response(document)
 
 
@@ -140,6 +142,7 @@ def update_package(
     
     db["packages"].update_one({"_id": oid, "company_id": company["_id"]}, {"$set": update_data})
     updated_doc = db["packages"].find_one({"_id": oid, "company_id": company["_id"]})
+    bump_catalog_version(db, company["_id"])
     return package_doc_to_response(updated_doc)
 
 
@@ -159,4 +162,5 @@ def delete_package(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Package not found")
     
+    bump_catalog_version(db, company["_id"])
     return None
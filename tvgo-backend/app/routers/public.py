@@ -1,53 +1,25 @@
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, timezone, date
 from typing import List, Optional, Set
 
+import orjson
 from bson import ObjectId
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from pymongo.database import Database
 
 from .. import schemas
-from ..auth import get_current_subscriber, get_optional_subscriber
+from ..auth import decode_subscriber_token, get_current_subscriber, optional_oauth2_scheme
+from ..catalog import catalog_validators
 from ..config import settings
 from ..database import get_db
+from ..epg_scheduler import now_next_digest, now_next_overlay
+from ..images import rendition_map
+from ..lineup import get_lineup
+from ..tenant_config import get_config as get_tenant_config
 from ..errors import not_found, unauthorized
 
 router = APIRouter(prefix=settings.api_v1_prefix, tags=["public"])
 
 
-DEFAULT_BRAND_DOCUMENT = {
-    "_id": "brand",
-    "app_name": "tvGO",
-    "logo_url": "https://cdn.tvgo.cloud/brand/tvgo-logo.png",
-    "accent_color": "#1EA7FD",
-    "background_color": "#050607",
-    "enable_favorites": True,
-    "enable_search": True,
-    "autoplay_preview": True,
-    "enable_live_tv": True,
-    "enable_vod": True,
-    "channel_groups": [
-        "All",
-        "Favorites",
-        "Kids",
-        "Sports",
-        "News",
-        "Entertainment",
-        "Movies",
-    ],
-    "movie_genres": [
-        "All",
-        "Action",
-        "Comedy",
-        "Drama",
-        "Kids & Family",
-        "Sci-Fi",
-        "Thriller",
-        "Horror",
-        "Romance",
-    ],
-}
-
-
 def _get_user_allowed_channels(db: Database, user: dict) -> Optional[Set[str]]:
     """
     Get the set of channel IDs that a user is allowed to access based on their packages.
@@ -77,77 +49,13 @@ def _get_user_allowed_channels(db: Database, user: dict) -> Optional[Set[str]]:
     return allowed_channel_ids
 
 
-def _default_programs_window() -> List[schemas.ProgramScheduleItem]:
-    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
-    items = []
-    items.append(
-        schemas.ProgramScheduleItem(
-            id="p1",
-            title="Action Movie",
-            category="Movie",
-            start=now,
-            end=now + timedelta(hours=1),
-            isLive=True,
-        )
-    )
-    items.append(
-        schemas.ProgramScheduleItem(
-            id="p2",
-            title="News",
-            category="News",
-            start=now + timedelta(hours=1),
-            end=now + timedelta(hours=1, minutes=30),
-            isLive=True,
-        )
-    )
-    items.append(
-        schemas.ProgramScheduleItem(
-            id="p3",
-            title="Weather Program",
-            category="Weather",
-            start=now + timedelta(hours=1, minutes=30),
-            end=now + timedelta(hours=2),
-            isLive=True,
-        )
-    )
-    return items
-
-
-def _ensure_brand_document(db: Database, company_id=None) -> dict:
-    """Get brand config. If company_id provided, look for company-specific config first."""
-    if company_id:
-        # Check for company-specific brand config
-        document = db["brand_config"].find_one({"company_id": company_id})
-        if document:
-            return document
-    
-    # Fallback to global brand config
-    document = db["brand_config"].find_one({"_id": "brand"})
-    if document:
-        return document
-    db["brand_config"].insert_one(DEFAULT_BRAND_DOCUMENT.copy())
-    return DEFAULT_BRAND_DOCUMENT.copy()
-
-
-def _channel_document_to_schema(document: dict, schedule: Optional[List[schemas.ProgramScheduleItem]] = None) -> schemas.Channel:
+def _channel_document_to_schema(document: dict, program_schedule: Optional[list] = None) -> schemas.Channel:
     # Use _id as the channel identifier (unique document key with company prefix)
     # This ensures consistency with schedule/EPG lookups
     channel_id = document.get("_id")
     drm = None
     if document.get("drm_type") and document.get("drm_license_url"):
         drm = {"type": document["drm_type"], "licenseUrl": document["drm_license_url"]}
-    program_schedule = schedule
-    if program_schedule is None:
-        raw_schedule = document.get("program_schedule") or []
-        if raw_schedule:
-            program_schedule = [
-                schemas.ProgramScheduleItem(**item)
-                if not isinstance(item, schemas.ProgramScheduleItem)
-                else item
-                for item in raw_schedule
-            ]
-    if program_schedule is None:
-        program_schedule = _default_programs_window()
     metadata = document.get("metadata") or {}
     return schemas.Channel(
         id=channel_id,
@@ -157,11 +65,13 @@ def _channel_document_to_schema(document: dict, schedule: Optional[List[schemas.
         description=metadata.get("description", ""),
         logoColor=metadata.get("logo_color", "#000000"),
         logo=document.get("logo_url"),
+        imageSet=rendition_map(document),
         streamUrl=document.get("stream_url"),
         drm=drm,
         lang=document.get("lang"),
         country=document.get("country"),
-        programSchedule=program_schedule,
+        # Current and next programme, from the epg_scheduler overlay
+        programSchedule=[schemas.ProgramScheduleItem(**item) for item in program_schedule or []],
         badges=document.get("badges"),
         metadata=metadata,
         streamerName=document.get("streamer_name"),
@@ -169,6 +79,16 @@ def _channel_document_to_schema(document: dict, schedule: Optional[List[schemas.
     )
 
 
+def _encoded_json_response(body: bytes, response: Response) -> Response:
+    """Return pre-encoded JSON, keeping headers set by dependencies.
+
+    FastAPI only merges dependency headers into responses it builds itself.
+    """
+    result = Response(content=body, media_type="application/json")
+    result.headers.raw.extend(response.headers.raw)
+    return result
+
+
 def _movie_document_to_schema(document: dict) -> schemas.Movie:
     movie_id = document.get("id") or document.get("_id")
     poster = document.get("poster_url") or document.get("thumbnail")
@@ -210,6 +130,7 @@ def _movie_document_to_schema(document: dict) -> schemas.Movie:
         runtimeMinutes=document.get("runtime_minutes"),
         synopsis=synopsis,
         images=images,
+        imageSet=rendition_map(document),
         media=media,
         badges=document.get("badges"),
         credits=credits,
@@ -218,43 +139,26 @@ def _movie_document_to_schema(document: dict) -> schemas.Movie:
     )
 
 
-def build_config_response(db: Database, company_id=None) -> schemas.ConfigResponse:
-    brand_doc = _ensure_brand_document(db, company_id)
-
-    brand = schemas.Brand(
-        appName=brand_doc.get("app_name", DEFAULT_BRAND_DOCUMENT["app_name"]),
-        logoUrl=brand_doc.get("logo_url"),
-        accentColor=brand_doc.get("accent_color", DEFAULT_BRAND_DOCUMENT["accent_color"]),
-        backgroundColor=brand_doc.get("background_color", DEFAULT_BRAND_DOCUMENT["background_color"]),
-    )
-    features = schemas.Features(
-        enableFavorites=brand_doc.get("enable_favorites", DEFAULT_BRAND_DOCUMENT["enable_favorites"]),
-        enableSearch=brand_doc.get("enable_search", DEFAULT_BRAND_DOCUMENT["enable_search"]),
-        autoplayPreview=brand_doc.get("autoplay_preview", DEFAULT_BRAND_DOCUMENT["autoplay_preview"]),
-        enableLiveTv=brand_doc.get("enable_live_tv", DEFAULT_BRAND_DOCUMENT["enable_live_tv"]),
-        enableVod=brand_doc.get("enable_vod", DEFAULT_BRAND_DOCUMENT["enable_vod"]),
-    )
-    channel_groups = brand_doc.get("channel_groups", DEFAULT_BRAND_DOCUMENT["channel_groups"])
-    movie_genres = brand_doc.get("movie_genres", DEFAULT_BRAND_DOCUMENT["movie_genres"])
-    return schemas.ConfigResponse(
-        brand=brand,
-        features=features,
-        channelGroups=channel_groups,
-        movieGenres=movie_genres,
-    )
-
-
-@router.get("/config", response_model=schemas.ConfigResponse)
+@router.get("/config", response_model=schemas.ConfigResponse, dependencies=[Depends(catalog_validators("config", require_subscriber=False))])
 def get_config(
+    response: Response,
     db: Database = Depends(get_db),
-    current_user=Depends(get_optional_subscriber)
+    token: Optional[str] = Depends(optional_oauth2_scheme),
 ):
-    company_id = current_user.get("company_id") if current_user else None
-    return build_config_response(db, company_id)
-
-
-@router.get("/channels", response_model=schemas.ChannelsListResponse)
+    # The tenant comes from the token claims; invalid tokens get the global config
+    claims = decode_subscriber_token(token) if token else None
+    company_id = claims.get("company_id") if claims else None
+    if claims and not company_id:
+        # Tokens issued before company_id was added to the claims
+        subscriber = db["subscribers"].find_one({"_id": claims["id"]}, {"company_id": 1})
+        company_id = subscriber.get("company_id") if subscriber else None
+    # Served from the tenant config cache, already serialised
+    return _encoded_json_response(orjson.dumps(get_tenant_config(db, company_id)), response)
+
+
+@router.get("/channels", response_model=schemas.ChannelsListResponse, dependencies=[Depends(catalog_validators("channels", extra=now_next_digest))])
 def list_channels(
+    response: Response,
     db: Database = Depends(get_db),
     group: Optional[str] = None,
     search: Optional[str] = Query(None, alias="search"),
@@ -264,46 +168,21 @@ def list_channels(
     current_user=Depends(get_current_subscriber),
 ):
     """List channels for the subscriber's company, filtered by user's packages"""
-    company_id = current_user.get("company_id")
-
-    filters: dict[str, object] = {"company_id": company_id}
-
-    # Package-based channel filtering
-    allowed_channels = _get_user_allowed_channels(db, current_user)
-    if allowed_channels is not None:
-        if not allowed_channels:
-            # User has packages but no channels in them - return empty
-            return schemas.ChannelsListResponse(total=0, items=[], nextOffset=None)
-        filters["_id"] = {"$in": list(allowed_channels)}
-
-    if group:
-        filters["group"] = group
-    if search:
-        filters["name"] = {"$regex": search, "$options": "i"}
+    lineup = get_lineup(db, current_user.get("company_id"))
 
+    favorite_channels = None
     if favorite:
         favorites_doc = db["favorites"].find_one({"_id": current_user["_id"]}) or {}
         favorite_channels = favorites_doc.get("channels") or []
-        # Combine with package filter if exists
-        if "_id" in filters and "$in" in filters["_id"]:
-            # Intersect allowed channels with favorites
-            allowed = set(filters["_id"]["$in"])
-            favorite_set = set(favorite_channels) if favorite_channels else set()
-            intersection = allowed & favorite_set
-            filters["_id"] = {"$in": list(intersection) or ["__none__"]}
-        else:
-            filters["_id"] = {"$in": favorite_channels or ["__none__"]}
-
-    total = db["channels"].count_documents(filters)
-    cursor = db["channels"].find(filters).sort("order", 1).skip(offset).limit(limit)
-    items = list(cursor)
-
-    channels_schema = []
-    for ch in items:
-        channels_schema.append(_channel_document_to_schema(ch))
 
-    next_offset = offset + limit if offset + limit < total else None
-    return schemas.ChannelsListResponse(total=total, items=channels_schema, nextOffset=next_offset)
+    positions = lineup.select(
+        group=group,
+        search=search,
+        allowed=lineup.allowed_positions(current_user.get("package_ids")),
+        favorites=favorite_channels,
+    )
+    page = lineup.render_page(positions, offset, limit, now_next_overlay(db, current_user.get("company_id")))
+    return _encoded_json_response(page, response)
 
 
 @router.get("/channels/{channel_id}", response_model=schemas.Channel)
@@ -312,23 +191,18 @@ def get_channel(
     db: Database = Depends(get_db),
     current_user=Depends(get_current_subscriber)
 ):
-    company_id = current_user.get("company_id")
-    # Try to find channel by _id first, then by id field (for M3U imported channels)
-    document = db["channels"].find_one({"_id": channel_id, "company_id": company_id})
-    if not document:
-        # Fallback: try finding by the 'id' field (M3U ID without company prefix)
-        document = db["channels"].find_one({"id": channel_id, "company_id": company_id})
-    if not document:
+    lineup = get_lineup(db, current_user.get("company_id"))
+    # Matches _id first, then the 'id' field (M3U ID without company prefix)
+    position = lineup.position(channel_id)
+    if position is None:
         raise not_found("Channel not found")
 
     # Package-based access control
-    allowed_channels = _get_user_allowed_channels(db, current_user)
-    if allowed_channels is not None:
-        actual_channel_id = document.get("_id")
-        if actual_channel_id not in allowed_channels:
-            raise not_found("Channel not found")
+    allowed = lineup.allowed_positions(current_user.get("package_ids"))
+    if allowed is not None and position not in allowed:
+        raise not_found("Channel not found")
 
-    return _channel_document_to_schema(document)
+    return Response(content=lineup.render(position, now_next_overlay(db, current_user.get("company_id"))), media_type="application/json")
 
 
 @router.get("/epg/now")
@@ -446,6 +320,102 @@ def get_channel_schedule(
     return {"channel_id": channel_id, "programs": items}
 
 
+@router.get("/epg/grid", response_model=schemas.EpgGridResponse)
+def get_epg_grid(
+    ids: Optional[List[str]] = Query(None, alias="ids"),
+    group: Optional[str] = None,
+    from_param: Optional[datetime] = Query(None, alias="from"),
+    to_param: Optional[datetime] = Query(None, alias="to"),
+    hours: int = Query(6, ge=1, le=48),
+    limit: int = Query(30, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Database = Depends(get_db),
+    current_user=Depends(get_current_subscriber)
+):
+    """Guide rows for many channels in one request.
+
+    Pass ``ids`` (repeatable) for specific channels, or page through the
+    subscriber's lineup with ``offset``/``limit`` (and optional ``group``).
+    Programmes overlapping the ``from``..``to`` window are returned grouped per
+    channel; the window defaults to now + ``hours``.
+    """
+    company_id = current_user.get("company_id")
+    now = datetime.utcnow()
+    window_start = from_param or now
+    window_end = to_param or window_start + timedelta(hours=hours)
+    if window_start.tzinfo is not None:
+        window_start = window_start.astimezone(timezone.utc).replace(tzinfo=None)
+    if window_end.tzinfo is not None:
+        window_end = window_end.astimezone(timezone.utc).replace(tzinfo=None)
+
+    allowed_channels = _get_user_allowed_channels(db, current_user)
+    projection = {"_id": 1, "id": 1, "epg_id": 1}
+    next_offset = None
+
+    if ids:
+        ids = ids[:limit]
+        channels = list(db["channels"].find(
+            {"company_id": company_id, "$or": [{"_id": {"$in": ids}}, {"id": {"$in": ids}}]},
+            projection
+        ))
+        by_key = {}
+        for ch in channels:
+            by_key.setdefault(ch["_id"], ch)
+            if ch.get("id"):
+                by_key.setdefault(ch["id"], ch)
+        # Keep the caller's order and ids so rows can be matched client-side
+        rows_for = [(requested, by_key[requested]) for requested in ids if requested in by_key]
+    else:
+        filters: dict[str, object] = {"company_id": company_id}
+        if allowed_channels is not None:
+            filters["_id"] = {"$in": list(allowed_channels)}
+        if group:
+            filters["group"] = group
+        cursor = db["channels"].find(filters, projection).sort("order", 1).skip(offset).limit(limit + 1)
+        channels = list(cursor)
+        if len(channels) > limit:
+            channels = channels[:limit]
+            next_offset = offset + limit
+        rows_for = [(ch["_id"], ch) for ch in channels]
+
+    if allowed_channels is not None:
+        rows_for = [(key, ch) for key, ch in rows_for if ch["_id"] in allowed_channels]
+
+    epg_ids = list({ch.get("epg_id") or ch["_id"] for _, ch in rows_for})
+    programs_by_channel: dict[str, list] = {}
+    if epg_ids:
+        cursor = db["epg_programs"].find({
+            "channel_id": {"$in": epg_ids},
+            "start": {"$lt": window_end},
+            "end": {"$gt": window_start},
+        }).sort([("channel_id", 1), ("start", 1)])
+        for p in cursor:
+            start = p.get("start")
+            end = p.get("end")
+            programs_by_channel.setdefault(p.get("channel_id"), []).append(
+                schemas.EpgProgramItem(
+                    id=p.get("program_id"),
+                    title=p.get("title"),
+                    category=p.get("category"),
+                    description=p.get("description"),
+                    season=p.get("season"),
+                    episode=p.get("episode"),
+                    start=start,
+                    end=end,
+                    isLive=bool(start and end and start <= now < end),
+                )
+            )
+
+    rows = [
+        schemas.EpgGridRow(
+            channelId=key,
+            items=programs_by_channel.get(ch.get("epg_id") or ch["_id"], []),
+        )
+        for key, ch in rows_for
+    ]
+    return schemas.EpgGridResponse(start=window_start, end=window_end, rows=rows, nextOffset=next_offset)
+
+
 @router.get("/channels/{channel_id}/epg", response_model=schemas.EpgResponse)
 def get_epg(
     channel_id: str,
@@ -503,29 +473,11 @@ def get_epg(
         for p in programs
     ]
 
-    if not items:
-        default_items = _default_programs_window()
-        items = [
-            schemas.EpgProgramItem(
-                id=i.id,
-                title=i.title,
-                category=i.category,
-                description=None,
-                season=None,
-                episode=None,
-                start=i.start,
-                end=i.end,
-                isLive=i.isLive,
-            )
-            for i in default_items
-        ]
-        total = len(items)
-
     next_offset = offset + limit if offset + limit < total else None
     return schemas.EpgResponse(channelId=channel_id, date=date_param, items=items, nextOffset=next_offset)
 
 
-@router.get("/movies", response_model=schemas.MoviesListResponse)
+@router.get("/movies", response_model=schemas.MoviesListResponse, dependencies=[Depends(catalog_validators("movies"))])
 def list_movies(
     db: Database = Depends(get_db),
     genre: Optional[str] = None,
@@ -573,7 +525,7 @@ def get_movie(
     return _movie_document_to_schema(document)
 
 
-@router.get("/rails", response_model=list[schemas.RailPublic])
+@router.get("/rails", response_model=list[schemas.RailPublic], dependencies=[Depends(catalog_validators("rails"))])
 def get_rails(
     db: Database = Depends(get_db),
     current_user=Depends(get_current_subscriber)
@@ -641,7 +593,7 @@ def _game_document_to_schema(document: dict) -> schemas.Game:
     )
 
 
-@router.get("/games", response_model=schemas.GamesListResponse)
+@router.get("/games", response_model=schemas.GamesListResponse, dependencies=[Depends(catalog_validators("games"))])
 def list_games(
     db: Database = Depends(get_db),
     category: Optional[str] = None,
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 import re
 
 from fastapi import APIRouter, Depends, HTTPException
@@ -7,8 +7,11 @@ from pymongo.database import Database
 
 from .. import schemas
 from ..auth import get_current_company_or_admin as get_current_company
+from ..catalog import bump_catalog_version
 from ..config import settings
 from ..database import get_db
+from ..tenant_stats import invalidate_tenant_stats, refresh_streamer_channel_counts
+from . import admin_channels
 
 router = APIRouter(
     prefix=f"{settings.api_v1_prefix}/admin/streamers",
@@ -16,13 +19,23 @@ router = APIRouter(
 )
 
 
-def _streamer_document_to_schema(document: dict, db: Database, company_id) -> schemas.StreamerResponse:
+def _streamer_document_to_schema(
+    document: dict,
+    db: Database,
+    company_id,
+    counts: Optional[Dict[str, int]] = None,
+) -> schemas.StreamerResponse:
     streamer_id = document.get("_id") or document.get("id")
     # Count channels associated with this streamer (for this company)
-    channel_count = db["channels"].count_documents({
-        "company_id": company_id,
-        "metadata.streamer_name": document.get("name")
-    })
+    if counts is not None:
+        channel_count = counts.get(document.get("name"), 0)
+    elif "channel_count" in document:
+        channel_count = document["channel_count"]
+    else:
+        channel_count = db["channels"].count_documents({
+            "company_id": company_id,
+            "metadata.streamer_name": document.get("name")
+        })
     return schemas.StreamerResponse(
         id=str(streamer_id),
         name=document.get("name", ""),
@@ -40,7 +53,12 @@ def list_streamers(
 ):
     """List all configured streamers for this company."""
     streamers = list(db["streamers"].find({"company_id": company["_id"]}))
-    items = [_streamer_document_to_schema(s, db, company["_id"]) for s in streamers]
+    # Counts are materialised on the documents by ingest; streamers created
+    # before that need one aggregation (which also backfills the counters)
+    counts = None
+    if any("channel_count" not in s for s in streamers):
+        counts = refresh_streamer_channel_counts(db, company["_id"])
+    items = [_streamer_document_to_schema(s, db, company["_id"], counts) for s in streamers]
     return schemas.StreamerListResponse(items=items, total=len(items))
 
 
@@ -67,7 +85,12 @@ def create_streamer(
         "last_sync": None,
         "created_at": datetime.utcnow(),
     }
+    document["channel_count"] = db["channels"].count_documents({
+        "company_id": company["_id"],
+        "metadata.streamer_name": payload.name,
+    })
     db["streamers"].insert_one(document)
+    invalidate_tenant_stats(company["_id"])
     return _streamer_document_to_schema(document, db, company["_id"])
 
 
@@ -94,7 +117,11 @@ def update_streamer(
     """Update an existing streamer."""
     result = db["streamers"].update_one(
         {"_id": streamer_id, "company_id": company["_id"]},
-        {"$set": {"name": payload.name, "url": payload.url}},
+        {
+            "$set": {"name": payload.name, "url": payload.url},
+            # The name decides which channels are counted
+            "$unset": {"channel_count": ""},
+        },
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Streamer not found")
@@ -126,6 +153,10 @@ def delete_streamer(
         })
         
     db["streamers"].delete_one({"_id": streamer_id, "company_id": company["_id"]})
+    # Streamers sharing the name lost their channels too
+    refresh_streamer_channel_counts(db, company["_id"])
+    admin_channels._invalidate_cache(str(company["_id"]))
+    bump_catalog_version(db, company["_id"])
         
     return {"status": "ok"}
 
@@ -9,8 +9,10 @@ from pymongo.database import Database
 
 from .. import schemas
 from ..auth import get_super_admin, get_password_hash
+from ..catalog import bump_catalog_version
 from ..config import settings
 from ..database import get_db
+from ..tenant_stats import tenant_stats, tenants_stats
 
 router = APIRouter(
     prefix=f"{settings.api_v1_prefix}/super-admin",
@@ -19,14 +21,13 @@ router = APIRouter(
 )
 
 
-def _company_document_to_response(doc: dict, db: Database) -> schemas.CompanyResponse:
+def _company_document_to_response(doc: dict, db: Database, stats: Optional[dict] = None) -> schemas.CompanyResponse:
     """Convert MongoDB document to CompanyResponse schema."""
     company_id = doc.get("_id") or doc.get("id")
     
-    # Get counts for this company
-    user_count = db["subscribers"].count_documents({"company_id": company_id})
-    channel_count = db["channels"].count_documents({"company_id": company_id})
-    movie_count = db["movies"].count_documents({"company_id": company_id})
+    # Counts for this company (list_companies passes them in, one aggregation per page)
+    if stats is None:
+        stats = tenant_stats(db, company_id)
     
     # Parse services
     services_data = doc.get("services", {})
@@ -45,9 +46,9 @@ def _company_document_to_response(doc: dict, db: Database) -> schemas.CompanyRes
         is_active=doc.get("is_active", True),
         services=services,
         created_at=doc.get("created_at"),
-        user_count=user_count,
-        channel_count=channel_count,
-        movie_count=movie_count,
+        user_count=stats["users"],
+        channel_count=stats["channels"],
+        movie_count=stats["movies"],
     )
 
 
@@ -67,9 +68,13 @@ def list_companies(
         ]
     
     total = db["companies"].count_documents(query)
-    cursor = db["companies"].find(query).skip(skip).limit(limit).sort("created_at", -1)
+    documents = list(db["companies"].find(query).skip(skip).limit(limit).sort("created_at", -1))
     
-    items = [_company_document_to_response(doc, db) for doc in cursor]
+    stats = tenants_stats(db, [doc["_id"] for doc in documents])
+    items = [
+        _company_document_to_response(doc, db, stats[str(doc["_id"])])
+        for doc in documents
+    ]
     return schemas.CompanyListResponse(items=items, total=total)
 
 
@@ -161,6 +166,7 @@ def delete_company(company_id: str, db: Database = Depends(get_db)):
     
     # Delete the company itself
     db["companies"].delete_one({"_id": company_id})
+    bump_catalog_version(db, company_id)
     
     return {"status": "ok", "message": f"Company {doc.get('name')} deleted"}
 
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, File, UploadFile
 
+from .. import schemas
 from ..auth import get_current_active_admin
-from ..aws_s3 import upload_image_to_s3
+from ..aws_s3 import confirm_image_upload, create_presigned_image_upload
 from ..config import settings
+from ..media_store import store_upload
 
 router = APIRouter(
     prefix=f"{settings.api_v1_prefix}/admin",
@@ -13,5 +15,22 @@ router = APIRouter(
 
 @router.post("/upload-image")
 async def admin_upload_image(file: UploadFile = File(...)):
-    url = await upload_image_to_s3(file)
+    """Upload through the API. Kept for older clients; prefer the presigned flow."""
+    url = await store_upload(file)
     return {"url": url}
+
+
+@router.post("/upload-image/presign", response_model=schemas.ImageUploadTicket)
+def admin_presign_image_upload(payload: schemas.ImageUploadRequest):
+    """Issue a presigned POST so the browser uploads the image straight to S3.
+
+    Send the form ``fields`` plus the file (as the last field) to
+    ``uploadUrl``, then call ``/upload-image/confirm`` with the ``key``.
+    """
+    return create_presigned_image_upload(payload.contentType)
+
+
+@router.post("/upload-image/confirm")
+def admin_confirm_image_upload(payload: schemas.ImageUploadConfirm):
+    """Verify a presigned upload arrived and return the URL to store."""
+    return {"url": confirm_image_upload(payload.key)}
@@ -7,6 +7,7 @@ from pymongo.database import Database
 
 from .. import schemas
 from ..auth import get_current_company_or_admin as get_current_company
+from ..cache import Cache, invalidate_tag
 from ..config import settings
 from ..database import get_db
 
@@ -15,6 +16,33 @@ router = APIRouter(
     tags=["admin-user-groups"],
 )
 
+# Group ids per subscriber, for message targeting. Membership is looked up
+# through the multikey index on (company_id, user_ids); any group write
+# drops the tenant's entries.
+_membership_cache = Cache("subscriber-groups", ttl=300, max_entries=4096)
+
+
+def _membership_tag(company_id) -> str:
+    return f"groups:{company_id}"
+
+
+def subscriber_group_ids(db: Database, company_id, subscriber_id: str) -> list:
+    """Ids of the groups ``subscriber_id`` belongs to."""
+    return _membership_cache.get_or_load(
+        f"{company_id}:{subscriber_id}",
+        lambda: db["user_groups"].distinct("_id", {"company_id": company_id, "user_ids": subscriber_id}),
+        tags=[_membership_tag(company_id)],
+    )
+
+
+def message_group_members(db: Database, message: dict) -> list:
+    """Subscriber ids in the groups a group-targeted message names (one query)."""
+    if message.get("target_type") != "groups" or not message.get("target_ids"):
+        return []
+    return db["user_groups"].distinct(
+        "user_ids", {"_id": {"$in": message["target_ids"]}, "company_id": message.get("company_id")}
+    )
+
 
 def _group_doc_to_response(doc: dict) -> schemas.UserGroupResponse:
     """Convert MongoDB document to UserGroupResponse"""
@@ -86,6 +114,7 @@ def create_user_group(
     }
     
     db["user_groups"].insert_one(doc)
+    invalidate_tag(_membership_tag(company["_id"]))
     return _group_doc_to_response(doc)
 
 
@@ -111,6 +140,8 @@ def update_user_group(
     if update_data:
         update_data["updated_at"] = datetime.utcnow()
         db["user_groups"].update_one({"_id": group_id, "company_id": company["_id"]}, {"$set": update_data})
+        if "user_ids" in update_data:
+            invalidate_tag(_membership_tag(company["_id"]))
 
     updated = db["user_groups"].find_one({"_id": group_id, "company_id": company["_id"]})
     return _group_doc_to_response(updated)
@@ -126,6 +157,7 @@ def delete_user_group(
     result = db["user_groups"].delete_one({"_id": group_id, "company_id": company["_id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User group not found")
+    invalidate_tag(_membership_tag(company["_id"]))
     return {"status": "ok", "message": "Group deleted"}
 
 
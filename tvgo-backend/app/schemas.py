@@ -52,6 +52,8 @@ class RefreshRequest(BaseModel):
 
 class RefreshResponse(BaseModel):
     accessToken: str
+    # Refresh tokens are single use; store this one for the next refresh
+    refreshToken: str
     tokenType: str = "Bearer"
     expiresIn: int
 
@@ -105,6 +107,15 @@ class ConfigResponse(BaseModel):
     movieGenres: List[str]
 
 
+# ---- Images ----
+
+class ImageRendition(BaseModel):
+    url: str
+    width: int
+    height: int
+    format: str  # webp, jpg or png
+
+
 # ---- Channels / EPG ----
 
 class ProgramScheduleItem(BaseModel):
@@ -124,6 +135,8 @@ class Channel(BaseModel):
     description: Optional[str] = None # From metadata
     logoColor: Optional[str] = "#000000" # Default for App
     logo: Optional[str] = None  # Changed from HttpUrl to allow relative URLs
+    # Resized copies of the logo, {"logo": [...]}, once rendered
+    imageSet: Optional[Dict[str, List[ImageRendition]]] = None
     streamUrl: HttpUrl
     drm: Optional[Dict[str, Any]] = None
     lang: Optional[List[str]] = None
@@ -162,6 +175,18 @@ class EpgResponse(BaseModel):
     nextOffset: Optional[int] = None
 
 
+class EpgGridRow(BaseModel):
+    channelId: str
+    items: List[EpgProgramItem]
+
+
+class EpgGridResponse(BaseModel):
+    start: datetime
+    end: datetime
+    rows: List[EpgGridRow]
+    nextOffset: Optional[int] = None
+
+
 # ---- Favorites ----
 
 
@@ -183,6 +208,8 @@ class Movie(BaseModel):
     order: Optional[int] = None
 
     images: Optional[Dict[str, Optional[HttpUrl]]] = None
+    # Resized copies per image kind (poster, landscape, hero), srcset style
+    imageSet: Optional[Dict[str, List[ImageRendition]]] = None
     media: Optional[Dict[str, Any]] = None
     badges: Optional[List[str]] = None
     credits: Optional[Dict[str, List[str]]] = None
@@ -302,6 +329,19 @@ class MovieReorderRequest(BaseModel):
     items: List[MovieReorderItem]
 
 
+class EnrichmentJob(BaseModel):
+    id: str
+    status: Literal["pending", "running", "completed", "failed", "cancelled"]
+    missingOnly: bool = False
+    total: int = 0
+    processed: int = 0
+    enriched: int = 0
+    failed: int = 0
+    errors: List[str] = []
+    createdAt: Optional[datetime] = None
+    updatedAt: Optional[datetime] = None
+
+
 class RailAdminCreate(BaseModel):
     id: str
     title: str
@@ -317,6 +357,24 @@ class RailAdminUpdate(BaseModel):
     sort_order: Optional[int] = None
 
 
+# ---- Uploads ----
+
+class ImageUploadRequest(BaseModel):
+    contentType: str
+
+
+class ImageUploadTicket(BaseModel):
+    uploadUrl: str
+    fields: Dict[str, str]
+    key: str
+    url: str  # Where the image will be served from once uploaded
+    expiresIn: int
+
+
+class ImageUploadConfirm(BaseModel):
+    key: str
+
+
 # ---- Streamers ----
 
 class StreamerBase(BaseModel):
@@ -529,7 +587,7 @@ class MessageResponse(MessageBase):
     target_ids: List[str] = []
     is_active: bool = True
     created_at: Optional[datetime] = None
-    read_by: List[str] = []  # User IDs who have read this message
+    read_count: int = 0  # Subscribers who have read this message
 
     model_config = ConfigDict(from_attributes=True)
 
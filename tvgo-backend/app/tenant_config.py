@@ -0,0 +1,111 @@
+"""
+Brand and feature configuration per tenant.
+
+A tenant's ``brand_config`` document (falling back to the global ``brand``
+document) is turned into the ``ConfigResponse`` apps receive at login and from
+``/api/config``. The serialised response is cached per tenant and tagged with
+the tenant, so bumping its catalog version drops it. Admin config writes go
+through ``refresh_config``, which also reloads the entry straight away, so the
+next login or ``/api/config`` request is answered from memory.
+"""
+from pymongo.database import Database
+
+from . import schemas
+from .cache import Cache, tenant_tag
+from .catalog import GLOBAL_SCOPE, bump_catalog_version
+
+CONFIG_TTL = 300
+
+_config_cache = Cache("tenant-config", ttl=CONFIG_TTL, max_entries=1024)
+
+DEFAULT_BRAND_DOCUMENT = {
+    "_id": "brand",
+    "app_name": "tvGO",
+    "logo_url": "https://cdn.tvgo.cloud/brand/tvgo-logo.png",
+    "accent_color": "#1EA7FD",
+    "background_color": "#050607",
+    "enable_favorites": True,
+    "enable_search": True,
+    "autoplay_preview": True,
+    "enable_live_tv": True,
+    "enable_vod": True,
+    "channel_groups": [
+        "All",
+        "Favorites",
+        "Kids",
+        "Sports",
+        "News",
+        "Entertainment",
+        "Movies",
+    ],
+    "movie_genres": [
+        "All",
+        "Action",
+        "Comedy",
+        "Drama",
+        "Kids & Family",
+        "Sci-Fi",
+        "Thriller",
+        "Horror",
+        "Romance",
+    ],
+}
+
+
+def ensure_brand_document(db: Database, company_id=None) -> dict:
+    """Get brand config. If company_id provided, look for company-specific config first."""
+    # Company-specific config and the global fallback in one query
+    query = {"$or": [{"company_id": company_id}, {"_id": "brand"}]} if company_id else {"_id": "brand"}
+    documents = list(db["brand_config"].find(query))
+    company_document = next((d for d in documents if company_id and d.get("company_id") == company_id), None)
+    if company_document:
+        return company_document
+    document = next((d for d in documents if d["_id"] == "brand"), None)
+    if document:
+        return document
+    db["brand_config"].update_one(
+        {"_id": "brand"}, {"$setOnInsert": {k: v for k, v in DEFAULT_BRAND_DOCUMENT.items() if k != "_id"}}, upsert=True
+    )
+    return DEFAULT_BRAND_DOCUMENT.copy()
+
+
+def build_config_response(db: Database, company_id=None) -> schemas.ConfigResponse:
+    brand_doc = ensure_brand_document(db, company_id)
+
+    brand = schemas.Brand(
+        appName=brand_doc.get("app_name", DEFAULT_BRAND_DOCUMENT["app_name"]),
+        logoUrl=brand_doc.get("logo_url"),
+        accentColor=brand_doc.get("accent_color", DEFAULT_BRAND_DOCUMENT["accent_color"]),
+        backgroundColor=brand_doc.get("background_color", DEFAULT_BRAND_DOCUMENT["background_color"]),
+    )
+    features = schemas.Features(
+        enableFavorites=brand_doc.get("enable_favorites", DEFAULT_BRAND_DOCUMENT["enable_favorites"]),
+        enableSearch=brand_doc.get("enable_search", DEFAULT_BRAND_DOCUMENT["enable_search"]),
+        autoplayPreview=brand_doc.get("autoplay_preview", DEFAULT_BRAND_DOCUMENT["autoplay_preview"]),
+        enableLiveTv=brand_doc.get("enable_live_tv", DEFAULT_BRAND_DOCUMENT["enable_live_tv"]),
+        enableVod=brand_doc.get("enable_vod", DEFAULT_BRAND_DOCUMENT["enable_vod"]),
+    )
+    channel_groups = brand_doc.get("channel_groups", DEFAULT_BRAND_DOCUMENT["channel_groups"])
+    movie_genres = brand_doc.get("movie_genres", DEFAULT_BRAND_DOCUMENT["movie_genres"])
+    return schemas.ConfigResponse(
+        brand=brand,
+        features=features,
+        channelGroups=channel_groups,
+        movieGenres=movie_genres,
+    )
+
+
+def get_config(db: Database, company_id=None) -> dict:
+    """Serialised ``ConfigResponse`` for a tenant (the global brand without one)."""
+    scope = str(company_id) if company_id else GLOBAL_SCOPE
+
+    def load() -> dict:
+        return build_config_response(db, company_id).model_dump(mode="json")
+
+    return _config_cache.get_or_load(scope, load, tags=[tenant_tag(scope)])
+
+
+def refresh_config(db: Database, company_id) -> dict:
+    """Write-through after a config change: invalidate the tenant, then reload."""
+    bump_catalog_version(db, company_id)
+    return get_config(db, company_id)
@@ -0,0 +1,116 @@
+"""
+Per-tenant document counts for the super-admin company list and dashboards.
+
+Counts for a page of tenants come from one ``$group`` per collection over
+just those tenants instead of a ``count_documents`` per company and
+collection, so a company list page costs the same handful of queries however
+many tenants it shows. Results are cached briefly and tagged with every
+tenant they cover, so writes that bump a tenant's catalog version (or call
+``invalidate_tenant_stats``) show up straight away.
+
+Streamer channel counts are also materialised on the streamer documents, so
+the streamer list is a single query.
+"""
+from typing import Dict, Iterable, List
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from .cache import Cache, invalidate_tag, tenant_tag
+
+STATS_TTL = 30
+
+# collection -> key in the stats dict
+COUNTED_COLLECTIONS = {
+    "subscribers": "users",
+    "channels": "channels",
+    "movies": "movies",
+    "streamers": "streamers",
+    "packages": "packages",
+}
+
+_stats_cache = Cache("tenant-stats", ttl=STATS_TTL)
+
+
+def _stats_tag(company_id) -> str:
+    return f"stats:{company_id}"
+
+
+def empty_stats() -> dict:
+    stats = {key: 0 for key in COUNTED_COLLECTIONS.values()}
+    stats["active_channels"] = 0
+    return stats
+
+
+def _tags(company_ids: Iterable) -> List[str]:
+    return [tag for company_id in company_ids for tag in (tenant_tag(company_id), _stats_tag(company_id))]
+
+
+def _compute(db: Database, company_ids: List) -> Dict[str, dict]:
+    match = {"company_id": company_ids[0] if len(company_ids) == 1 else {"$in": company_ids}}
+    stats: Dict[str, dict] = {str(company_id): empty_stats() for company_id in company_ids}
+    for collection, key in COUNTED_COLLECTIONS.items():
+        group = {"_id": "$company_id", "count": {"$sum": 1}}
+        if collection == "channels":
+            # Same rule as the channel filters: only an explicit False is inactive
+            group["active"] = {"$sum": {"$cond": [{"$ne": ["$is_active", False]}, 1, 0]}}
+        for row in db[collection].aggregate([{"$match": match}, {"$group": group}]):
+            entry = stats[str(row["_id"])]
+            entry[key] = row["count"]
+            if "active" in row:
+                entry["active_channels"] = row["active"]
+    return stats
+
+
+def tenants_stats(db: Database, company_ids: Iterable) -> Dict[str, dict]:
+    """Counts for the given tenants (e.g. a page of the company list), keyed by ``str(company_id)``."""
+    # Sorted, so the key and its tag versions line up whatever the page order
+    company_ids = sorted(company_ids, key=str)
+    if not company_ids:
+        return {}
+    return _stats_cache.get_or_load(
+        "page:" + ",".join(str(c) for c in company_ids),
+        lambda: _compute(db, company_ids),
+        tags=_tags(company_ids),
+    )
+
+
+def tenant_stats(db: Database, company_id) -> dict:
+    return _stats_cache.get_or_load(
+        f"tenant:{company_id}",
+        lambda: _compute(db, [company_id])[str(company_id)],
+        tags=_tags([company_id]),
+    )
+
+
+def invalidate_tenant_stats(company_id) -> None:
+    """Refresh a tenant's counts after writes that do not bump its catalog version."""
+    invalidate_tag(_stats_tag(company_id))
+
+
+def streamer_channel_counts(db: Database, company_id) -> Dict[str, int]:
+    """Channels per streamer name for one tenant, in a single aggregation."""
+    pipeline = [
+        {"$match": {"company_id": company_id, "metadata.streamer_name": {"$ne": None}}},
+        {"$group": {"_id": "$metadata.streamer_name", "count": {"$sum": 1}}},
+    ]
+    return {row["_id"]: row["count"] for row in db["channels"].aggregate(pipeline)}
+
+
+def refresh_streamer_channel_counts(db: Database, company_id) -> Dict[str, int]:
+    """Store each streamer's channel count on its document (``channel_count``).
+
+    Called after writes that add or remove streamer channels, so the streamer
+    list can read the counts straight off the streamer documents.
+    """
+    counts = streamer_channel_counts(db, company_id)
+    operations = [
+        UpdateOne(
+            {"_id": streamer["_id"], "company_id": company_id},
+            {"$set": {"channel_count": counts.get(streamer.get("name"), 0)}},
+        )
+        for streamer in db["streamers"].find({"company_id": company_id}, {"name": 1})
+    ]
+    if operations:
+        db["streamers"].bulk_write(operations, ordered=False)
+    return counts
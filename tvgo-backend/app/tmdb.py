@@ -1,16 +1,51 @@
 """
 TMDB API Client for fetching movie metadata.
 https://developer.themoviedb.org/docs
+
+All requests go through one pooled client (HTTP/2 when the ``h2`` package is
+installed) and a token-bucket limiter, so concurrent enrichment stays under
+TMDB's rate limit. A movie is enriched with two calls: search, then details
+with ``append_to_response=credits,videos``.
+
+Responses are cached in Mongo (``tmdb_cache``) keyed by path and parameters,
+not by tenant, so a title looked up once is free for every catalog. "Not
+found" answers are cached too, for a shorter time. ``TMDB_CACHE`` selects the
+mode:
+
+- ``mongo`` (default): Mongo cache in front of the API
+- ``off``: always call the API
+- ``record``: call the API and write each response to ``TMDB_FIXTURES_DIR``
+- ``replay``: answer only from ``TMDB_FIXTURES_DIR``, never touching the
+  network (offline runs and tests)
 """
+import asyncio
+import hashlib
+import importlib.util
+import json
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
 import httpx
 from typing import Optional
 from pydantic import BaseModel
+from pymongo.errors import PyMongoError
 import os
 
 # TMDB Configuration
 TMDB_API_KEY = os.environ.get("TMDB_API_KEY", "")
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
 TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p"
+# TMDB allows roughly 50 requests/second per IP; stay a little below it
+TMDB_RATE_LIMIT = float(os.environ.get("TMDB_RATE_LIMIT", "40"))
+TMDB_MAX_RETRIES = 3
+
+TMDB_CACHE = os.environ.get("TMDB_CACHE", "mongo").lower()
+TMDB_CACHE_TTL = timedelta(days=float(os.environ.get("TMDB_CACHE_TTL_DAYS", "30")))
+TMDB_NEGATIVE_CACHE_TTL = timedelta(days=float(os.environ.get("TMDB_NEGATIVE_CACHE_TTL_DAYS", "1")))
+TMDB_FIXTURES_DIR = Path(
+    os.environ.get("TMDB_FIXTURES_DIR", Path(__file__).resolve().parent.parent / "fixtures" / "tmdb")
+)
 
 
 class TMDBMovieResult(BaseModel):
@@ -56,70 +91,174 @@ class TMDBEnrichedData(BaseModel):
     cast: list[str] = []
 
 
-async def search_movie(query: str, year: Optional[int] = None) -> Optional[dict]:
-    """Search for a movie by title"""
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+_rate_limiter = TokenBucket(TMDB_RATE_LIMIT)
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client for the running event loop (clients cannot cross loops)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            base_url=TMDB_BASE_URL,
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def _cache_key(path: str, params: Optional[dict]) -> str:
+    normalized = {k: str(v).strip().lower() if k == "query" else str(v) for k, v in (params or {}).items()}
+    return f"{path}?{urlencode(sorted(normalized.items()))}"
+
+
+def _is_negative(data: Optional[dict]) -> bool:
+    return data is None or data.get("results") == []
+
+
+def _fixture_path(key: str) -> Path:
+    return TMDB_FIXTURES_DIR / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+
+def _read_fixture(key: str) -> Optional[dict]:
+    path = _fixture_path(key)
+    if not path.exists():
+        raise LookupError(f"No recorded TMDB response for {key} in {TMDB_FIXTURES_DIR}")
+    return json.loads(path.read_text())["data"]
+
+
+def _write_fixture(key: str, data: Optional[dict]) -> None:
+    TMDB_FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    _fixture_path(key).write_text(json.dumps({"key": key, "data": data}, indent=1, sort_keys=True))
+
+
+def _cache_collection():
+    from .database import get_database
+    return get_database()["tmdb_cache"]
+
+
+def _read_cache(key: str):
+    """Return ``(hit, data)``; a cached "not found" is ``(True, None)``."""
+    try:
+        entry = _cache_collection().find_one({"_id": key})
+    except PyMongoError as e:
+        print(f"TMDB cache read failed: {e}")
+        return False, None
+    # The TTL monitor only runs once a minute, so check expiry here too
+    if entry is None or entry["expires_at"] <= datetime.utcnow():
+        return False, None
+    return True, entry.get("data")
+
+
+def _write_cache(key: str, data: Optional[dict]) -> None:
+    now = datetime.utcnow()
+    ttl = TMDB_NEGATIVE_CACHE_TTL if _is_negative(data) else TMDB_CACHE_TTL
+    try:
+        _cache_collection().replace_one(
+            {"_id": key},
+            {"data": data, "cached_at": now, "expires_at": now + ttl},
+            upsert=True,
+        )
+    except PyMongoError as e:
+        print(f"TMDB cache write failed: {e}")
+
+
+async def _fetch(path: str, params: Optional[dict]) -> Optional[dict]:
+    """Call the API; a 404 is returned as None."""
     if not TMDB_API_KEY:
         raise ValueError("TMDB_API_KEY not configured")
-    
+    query = {"api_key": TMDB_API_KEY, **(params or {})}
+    for attempt in range(TMDB_MAX_RETRIES + 1):
+        await _rate_limiter.acquire()
+        response = await get_client().get(path, params=query)
+        if response.status_code == 429 and attempt < TMDB_MAX_RETRIES:
+            retry_after = response.headers.get("Retry-After", "")
+            await asyncio.sleep(float(retry_after) if retry_after.isdigit() else 2 ** attempt)
+            continue
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+
+async def _get(path: str, params: Optional[dict] = None) -> Optional[dict]:
+    key = _cache_key(path, params)
+    if TMDB_CACHE == "replay":
+        return _read_fixture(key)
+    if TMDB_CACHE == "mongo":
+        hit, data = await asyncio.to_thread(_read_cache, key)
+        if hit:
+            return data
+
+    data = await _fetch(path, params)
+    if TMDB_CACHE == "mongo":
+        await asyncio.to_thread(_write_cache, key, data)
+    elif TMDB_CACHE == "record":
+        _write_fixture(key, data)
+    return data
+
+
+async def search_movie(query: str, year: Optional[int] = None) -> Optional[dict]:
+    """Search for a movie by title"""
     params = {
-        "api_key": TMDB_API_KEY,
         "query": query,
         "include_adult": "false"
     }
     if year:
         params["year"] = str(year)
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{TMDB_BASE_URL}/search/movie", params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get("results"):
-            return data["results"][0]
-        return None
 
+    data = await _get("/search/movie", params)
+    if data and data.get("results"):
+        return data["results"][0]
+    return None
 
-async def get_movie_details(tmdb_id: int) -> Optional[dict]:
-    """Get detailed movie info"""
-    if not TMDB_API_KEY:
-        raise ValueError("TMDB_API_KEY not configured")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_BASE_URL}/movie/{tmdb_id}",
-            params={"api_key": TMDB_API_KEY}
-        )
-        response.raise_for_status()
-        return response.json()
+
+async def get_movie_details(tmdb_id: int, append: Optional[str] = None) -> Optional[dict]:
+    """Get detailed movie info, optionally with sub-resources appended (e.g. "credits,videos")"""
+    params = {"append_to_response": append} if append else None
+    return await _get(f"/movie/{tmdb_id}", params)
 
 
 async def get_movie_credits(tmdb_id: int) -> dict:
     """Get cast and crew"""
-    if not TMDB_API_KEY:
-        raise ValueError("TMDB_API_KEY not configured")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_BASE_URL}/movie/{tmdb_id}/credits",
-            params={"api_key": TMDB_API_KEY}
-        )
-        response.raise_for_status()
-        return response.json()
+    return await _get(f"/movie/{tmdb_id}/credits") or {}
 
 
 async def get_movie_videos(tmdb_id: int) -> list[dict]:
     """Get trailers and videos"""
-    if not TMDB_API_KEY:
-        raise ValueError("TMDB_API_KEY not configured")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_BASE_URL}/movie/{tmdb_id}/videos",
-            params={"api_key": TMDB_API_KEY}
-        )
-        response.raise_for_status()
-        data = response.json()
-        return data.get("results", [])
+    data = await _get(f"/movie/{tmdb_id}/videos")
+    return (data or {}).get("results", [])
 
 
 def build_image_url(path: Optional[str], size: str = "w500") -> Optional[str]:
@@ -146,16 +285,13 @@ async def enrich_movie(title: str, year: Optional[int] = None) -> Optional[TMDBE
     
     tmdb_id = search_result["id"]
     
-    # Fetch detailed info
-    details = await get_movie_details(tmdb_id)
+    # Fetch detailed info with credits and videos in the same request
+    details = await get_movie_details(tmdb_id, append="credits,videos")
     if not details:
         return None
     
-    # Fetch credits
-    credits = await get_movie_credits(tmdb_id)
-    
-    # Fetch videos for trailer
-    videos = await get_movie_videos(tmdb_id)
+    credits = details.get("credits") or {}
+    videos = (details.get("videos") or {}).get("results", [])
     
     # Extract trailer (prefer official YouTube trailers)
     trailer_url = None
@@ -0,0 +1,22 @@
+"""
+Scale benchmarks for the tvGO API.
+
+Two steps, both run from ``tvgo-backend``:
+
+    # 1. Load a synthetic multi-tenant catalog into a local mongod
+    MONGO_URI=mongodb://localhost:27017 MONGO_DB_NAME=tvgo_bench \\
+        python -m benchmarks generate --companies 4
+
+    # 2. Start the API against the same database, then drive it
+    python -m benchmarks run --base-url http://localhost:8000 --concurrency 64 --duration 60
+
+``generate`` writes ``benchmarks/manifest.json`` (sampled channel ids, MACs
+and usernames per tenant) that ``run`` builds requests from. ``run`` mints its
+tokens locally, so the API must use the same SECRET_KEY as the shell running
+it; ``run`` prints p50/p95/p99 latency and throughput per route
+and, with ``--baseline``, fails when a route got slower than the baseline.
+Generated documents are tagged ``bench: true`` and every company id starts
+with ``bench-``, so ``generate --drop`` removes them without touching other
+data. Never point either command at a production database; ``generate``
+refuses a MONGO_URI that is not on localhost unless given ``--force``.
+"""
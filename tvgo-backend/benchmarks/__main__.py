@@ -0,0 +1,128 @@
+"""Generate a benchmark dataset or drive the API with it (see ``benchmarks/__init__.py``)."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks import dataset, load  # noqa: E402
+
+DEFAULT_MANIFEST = Path(__file__).resolve().parent / "manifest.json"
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def is_local_uri(uri: str) -> bool:
+    """True for a plain mongodb:// URI whose hosts are all on this machine."""
+    if not uri.startswith("mongodb://"):
+        return False  # mongodb+srv:// always resolves to a remote cluster
+    hosts = urlsplit(uri).netloc.rpartition("@")[2]
+    return all(urlsplit(f"//{host}").hostname in LOCAL_HOSTS for host in hosts.split(","))
+
+
+def generate(args: argparse.Namespace) -> None:
+    from app.auth import get_password_hash
+    from app.config import settings
+    from app.database import ensure_indexes, get_database
+
+    if not is_local_uri(settings.mongo_uri) and not args.force:
+        raise SystemExit(
+            "MONGO_URI does not point at a local mongod; refusing to load benchmark data "
+            "(pass --force if this really is a scratch database)"
+        )
+    db = get_database()
+    print(f"Database: {settings.mongo_db_name}", flush=True)
+    if args.drop:
+        removed = dataset.drop_dataset(db)
+        print("Removed " + ", ".join(f"{count} {name}" for name, count in removed.items() if count), flush=True)
+        if args.drop_only:
+            return
+
+    options = {name: getattr(args, name) for name in dataset.DEFAULTS}
+    started = time.perf_counter()
+    # One bcrypt hash for every account; hashing 200k passwords would take hours
+    manifest = dataset.generate(
+        db, options, get_password_hash(dataset.BENCH_PASSWORD), log=lambda line: print(line, flush=True)
+    )
+    ensure_indexes(db)
+    manifest["options"] = options
+    manifest["generated_at"] = datetime.utcnow().isoformat()
+    args.manifest.write_text(json.dumps(manifest, indent=1))
+    print(f"Loaded in {time.perf_counter() - started:.0f}s; manifest written to {args.manifest}", flush=True)
+
+
+def run(args: argparse.Namespace) -> None:
+    if not args.manifest.exists():
+        raise SystemExit(f"{args.manifest} not found; run `python -m benchmarks generate` first")
+    manifest = json.loads(args.manifest.read_text())
+    summary, elapsed = asyncio.run(load.run(
+        args.base_url.rstrip("/"),
+        manifest,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        warmup=args.warmup,
+        routes=load.select_routes(args.route),
+    ))
+    load.print_report(summary, elapsed, args.concurrency)
+
+    if args.json_out:
+        args.json_out.write_text(json.dumps({
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration": elapsed,
+            "finished_at": datetime.utcnow().isoformat(),
+            "routes": summary,
+        }, indent=1))
+        print(f"\nResults written to {args.json_out}")
+
+    if args.baseline:
+        regressions = load.compare(summary, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\np95 regressions over {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo p95 regression over {args.baseline}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="load a synthetic multi-tenant dataset")
+    for name, default in dataset.DEFAULTS.items():
+        gen.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int, default=default,
+                         help=f"default: {default}")
+    gen.add_argument("--drop", action="store_true", help="remove an earlier benchmark dataset first")
+    gen.add_argument("--drop-only", action="store_true", help="with --drop, do not load a new dataset")
+    gen.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST)
+    gen.add_argument("--force", action="store_true", help="allow a MONGO_URI that is not on localhost")
+    gen.set_defaults(handler=generate)
+
+    drive = commands.add_parser("run", help="drive a running API with concurrent requests")
+    drive.add_argument("--base-url", default="http://localhost:8000")
+    drive.add_argument("--concurrency", type=int, default=64)
+    drive.add_argument("--duration", type=float, default=60, help="measured seconds")
+    drive.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    drive.add_argument("--route", help="only drive routes whose name contains this text")
+    drive.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST)
+    drive.add_argument("--json-out", type=Path, help="write the per-route results here")
+    drive.add_argument("--baseline", type=Path, help="results from an earlier --json-out to compare against")
+    drive.add_argument("--tolerance", type=float, default=0.15, help="allowed p95 growth (default: 0.15)")
+    drive.set_defaults(handler=run)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
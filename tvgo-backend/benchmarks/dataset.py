@@ -0,0 +1,326 @@
+"""
+Synthetic multi-tenant dataset for load tests.
+
+Documents mirror what the API writes itself (see the admin routers), so the
+read paths under test see realistic shapes and index selectivity. Everything
+is generated from a seeded RNG and inserted with unordered ``insert_many``
+batches; one bcrypt hash is shared by every subscriber, since hashing 200k
+passwords would dominate the run.
+"""
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List
+
+from bson import ObjectId
+from pymongo.database import Database
+
+BATCH_SIZE = 10_000
+COMPANY_PREFIX = "bench-"
+BENCH_PASSWORD = "bench-password"
+ADMIN_USERNAME = "bench-admin"
+
+# Collections a dataset writes to; all bench documents carry bench: true
+COLLECTIONS = (
+    "companies", "channels", "epg_programs", "movies", "subscribers", "packages",
+    "user_groups", "messages", "streamers", "brand_config", "users",
+)
+
+CHANNEL_GROUPS = ["News", "Sports", "Kids", "Movies", "Entertainment", "Music", "Documentary", "Regional"]
+MOVIE_GENRES = ["Action", "Comedy", "Drama", "Kids & Family", "Sci-Fi", "Thriller", "Horror", "Romance"]
+PROGRAMME_CATEGORIES = ["News", "Sport", "Film", "Series", "Kids", "Documentary", "Music"]
+WORDS = (
+    "morning live world report city night prime weekend classic family match "
+    "story planet wild kitchen road detective space island river summer"
+).split()
+
+DEFAULTS = {
+    "companies": 4,
+    "channels_per_company": 5_000,
+    "programmes": 1_000_000,
+    "subscribers": 200_000,
+    "movies_per_company": 1_000,
+    "packages_per_company": 25,
+    "groups_per_company": 50,
+    "messages_per_company": 500,
+    "streamers_per_company": 5,
+    "seed": 7,
+}
+
+# How many ids of each kind the manifest keeps per company for the load generator
+SAMPLE_SIZE = 500
+
+
+def company_id(index: int) -> str:
+    return f"{COMPANY_PREFIX}{index:03d}"
+
+
+def _title(rng: random.Random, words: int = 3) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).title()
+
+
+def _mac(rng: random.Random) -> str:
+    return ":".join(f"{rng.randrange(256):02X}" for _ in range(6))
+
+
+def _batched(documents: Iterable[dict], size: int = BATCH_SIZE) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_all(db: Database, collection: str, documents: Iterable[dict]) -> int:
+    inserted = 0
+    for batch in _batched(documents):
+        db[collection].insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+
+def drop_dataset(db: Database) -> Dict[str, int]:
+    """Remove every document a previous ``generate`` created."""
+    return {name: db[name].delete_many({"bench": True}).deleted_count for name in COLLECTIONS}
+
+
+def company_documents(count: int, password_hash: str) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": company_id(index),
+            "name": f"Bench Operator {index}",
+            "slug": company_id(index),
+            "username": company_id(index),
+            "password_hash": password_hash,
+            "is_active": True,
+            "services": {"enable_vod": True, "enable_channels": True, "enable_games": False},
+            "created_at": now,
+            "bench": True,
+        }
+        for index in range(count)
+    ]
+
+
+def channel_documents(rng: random.Random, cid: str, count: int, streamers: List[str]) -> Iterator[dict]:
+    for number in range(count):
+        yield {
+            "_id": f"{cid}_ch{number}",
+            "id": f"ch{number}",
+            "company_id": cid,
+            "name": f"{_title(rng, 2)} {number}",
+            "group": rng.choice(CHANNEL_GROUPS),
+            "logo_url": f"https://cdn.example.com/logos/{cid}/{number}.png",
+            "stream_url": f"https://streams.example.com/{cid}/{number}/index.m3u8",
+            "lang": [rng.choice(["en", "de", "tr", "ru", "az"])],
+            "country": rng.choice(["AZ", "TR", "DE", "GB"]),
+            "badges": rng.sample(["HD", "4K", "LIVE", "NEW"], k=rng.randint(0, 2)),
+            "metadata": {"streamer_name": rng.choice(streamers), "description": _title(rng, 6)},
+            "epg_id": f"{cid}.ch{number}",
+            "order": number,
+            "bench": True,
+        }
+
+
+def programme_documents(rng: random.Random, epg_ids: List[str], per_channel: int, start: datetime) -> Iterator[dict]:
+    """Back-to-back programmes per channel, centred on ``start``."""
+    for epg_id in epg_ids:
+        cursor = start - timedelta(minutes=30 * per_channel // 2)
+        for _ in range(per_channel):
+            end = cursor + timedelta(minutes=rng.choice((15, 30, 30, 45, 60, 60, 90, 120)))
+            yield {
+                "channel_id": epg_id,
+                "program_id": f"{epg_id}_{cursor.timestamp()}",
+                "title": _title(rng),
+                "start": cursor,
+                "end": end,
+                "description": _title(rng, 12),
+                "category": rng.choice(PROGRAMME_CATEGORIES),
+                "is_live": False,
+                "bench": True,
+            }
+            cursor = end
+
+
+def movie_documents(rng: random.Random, cid: str, count: int) -> Iterator[dict]:
+    for number in range(count):
+        yield {
+            "_id": f"{cid}_mv{number}",
+            "id": f"{cid}_mv{number}",
+            "company_id": cid,
+            "title": _title(rng),
+            "year": rng.randint(1970, 2025),
+            "genres": rng.sample(MOVIE_GENRES, k=rng.randint(1, 3)),
+            "rating": round(rng.uniform(3, 9.5), 1),
+            "runtime_minutes": rng.randint(75, 170),
+            "synopsis": _title(rng, 30),
+            "poster_url": f"https://cdn.example.com/posters/{cid}/{number}.jpg",
+            "stream_url": f"https://vod.example.com/{cid}/{number}/index.m3u8",
+            "order": number,
+            "bench": True,
+        }
+
+
+def package_documents(rng: random.Random, cid: str, count: int, channel_ids: List[str]) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "company_id": cid,
+            "name": f"Package {number}",
+            "description": _title(rng, 6),
+            "price": rng.choice([4.99, 9.99, 14.99, 19.99]),
+            "channel_ids": rng.sample(channel_ids, k=min(len(channel_ids), rng.randint(50, 1500))),
+            "created_at": now,
+            "updated_at": now,
+            "bench": True,
+        }
+        for number in range(count)
+    ]
+
+
+def subscriber_documents(
+    rng: random.Random, cid: str, count: int, package_ids: List[str], password_hash: str
+) -> Iterator[dict]:
+    now = datetime.utcnow()
+    for number in range(count):
+        mac = _mac(rng)
+        yield {
+            "_id": uuid.UUID(int=rng.getrandbits(128)).hex,
+            "company_id": cid,
+            "username": f"{cid}-u{number}",
+            "password_hash": password_hash,
+            "mac_address": mac,
+            "display_name": f"User-{mac[-5:].replace(':', '')}",
+            "client_no": f"{cid}-{number}",
+            "package_ids": rng.sample(package_ids, k=min(len(package_ids), rng.randint(1, 3))),
+            "max_devices": 2,
+            "status": rng.choices(["active", "bonus", "test", "suspended"], weights=[90, 4, 3, 3])[0],
+            "is_active": True,
+            "devices": [{"mac_address": mac, "device_name": "Bench Box", "first_seen": now, "last_seen": now}],
+            "created_at": now,
+            "last_login": None,
+            "creation_method": "mac",
+            "bench": True,
+        }
+
+
+def group_documents(rng: random.Random, cid: str, count: int, subscriber_ids: List[str]) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": uuid.UUID(int=rng.getrandbits(128)).hex,
+            "company_id": cid,
+            "name": f"Group {number}",
+            "description": _title(rng, 4),
+            "user_ids": rng.sample(subscriber_ids, k=min(len(subscriber_ids), rng.randint(20, 2000))),
+            "created_at": now,
+            "updated_at": now,
+            "bench": True,
+        }
+        for number in range(count)
+    ]
+
+
+def message_documents(
+    rng: random.Random, cid: str, count: int, subscriber_ids: List[str], group_ids: List[str]
+) -> Iterator[dict]:
+    now = datetime.utcnow()
+    for number in range(count):
+        target_type = rng.choices(["all", "users", "groups"], weights=[2, 5, 3])[0]
+        if target_type == "users":
+            target_ids = rng.sample(subscriber_ids, k=min(len(subscriber_ids), rng.randint(1, 50)))
+        elif target_type == "groups":
+            target_ids = rng.sample(group_ids, k=min(len(group_ids), rng.randint(1, 3)))
+        else:
+            target_ids = []
+        yield {
+            "_id": uuid.UUID(int=rng.getrandbits(128)).hex,
+            "company_id": cid,
+            "title": _title(rng),
+            "body": _title(rng, 20),
+            "url": None,
+            "target_type": target_type,
+            "target_ids": target_ids,
+            "is_active": rng.random() > 0.1,
+            "created_at": now - timedelta(minutes=number),
+            "read_count": 0,
+            "bench": True,
+        }
+
+
+def generate(db: Database, options: dict, password_hash: str, log=print) -> dict:
+    """Load a dataset described by ``options`` (see DEFAULTS); return its manifest."""
+    rng = random.Random(options["seed"])
+    companies = company_documents(options["companies"], password_hash)
+    insert_all(db, "companies", companies)
+    db["users"].update_one(
+        {"_id": ADMIN_USERNAME},
+        {"$set": {
+            "username": ADMIN_USERNAME,
+            "password_hash": password_hash,
+            "is_active": True,
+            "is_admin": True,
+            "display_name": "Benchmark admin",
+            "bench": True,
+        }},
+        upsert=True,
+    )
+
+    total_channels = options["companies"] * options["channels_per_company"]
+    programmes_per_channel = max(1, options["programmes"] // max(1, total_channels))
+    subscribers_per_company = max(1, options["subscribers"] // options["companies"])
+    now = datetime.utcnow()
+    manifest = {"admin": ADMIN_USERNAME, "companies": []}
+
+    for company in companies:
+        cid = company["_id"]
+        streamers = [f"Streamer {n}" for n in range(options["streamers_per_company"])]
+        insert_all(db, "streamers", (
+            {"_id": f"{cid}_st{n}", "company_id": cid, "name": name, "url": f"https://m3u.example.com/{n}.m3u",
+             "status": "connected", "last_sync": None, "created_at": now, "bench": True}
+            for n, name in enumerate(streamers)
+        ))
+        db["brand_config"].insert_one({
+            "company_id": cid, "app_name": f"Bench TV {cid}", "accent_color": "#1EA7FD", "bench": True,
+        })
+
+        channels = list(channel_documents(rng, cid, options["channels_per_company"], streamers))
+        insert_all(db, "channels", channels)
+        channel_ids = [c["_id"] for c in channels]
+        epg_ids = [c["epg_id"] for c in channels]
+        programmes = insert_all(db, "epg_programs", programme_documents(rng, epg_ids, programmes_per_channel, now))
+        insert_all(db, "movies", movie_documents(rng, cid, options["movies_per_company"]))
+
+        packages = package_documents(rng, cid, options["packages_per_company"], channel_ids)
+        insert_all(db, "packages", packages)
+        package_ids = [str(p["_id"]) for p in packages]
+
+        subscribers = list(subscriber_documents(rng, cid, subscribers_per_company, package_ids, password_hash))
+        insert_all(db, "subscribers", subscribers)
+        subscriber_ids = [s["_id"] for s in subscribers]
+
+        groups = group_documents(rng, cid, options["groups_per_company"], subscriber_ids)
+        insert_all(db, "user_groups", groups)
+        group_ids = [g["_id"] for g in groups]
+        insert_all(db, "messages", message_documents(
+            rng, cid, options["messages_per_company"], subscriber_ids, group_ids
+        ))
+
+        active = [s for s in subscribers if s["status"] != "suspended"]
+        manifest["companies"].append({
+            "id": cid,
+            "username": company["username"],
+            "channels": rng.sample(channel_ids, k=min(SAMPLE_SIZE, len(channel_ids))),
+            "subscribers": [
+                {"id": s["_id"], "mac": s["mac_address"], "username": s["username"]}
+                for s in rng.sample(active, k=min(SAMPLE_SIZE, len(active)))
+            ],
+            "groups": CHANNEL_GROUPS,
+        })
+        log(f"{cid}: {len(channels)} channels, {programmes} programmes, {len(subscribers)} subscribers, "
+            f"{len(packages)} packages, {len(groups)} groups")
+    return manifest
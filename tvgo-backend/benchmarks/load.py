@@ -0,0 +1,222 @@
+"""
+Concurrent async load generator.
+
+``concurrency`` workers share one pooled ``httpx.AsyncClient`` and pick routes
+by weight until the deadline. Each request is timed from send to the last body
+byte and recorded under its route template (``/api/channels/{id}``, not the
+concrete path), so results aggregate per endpoint. Tokens are minted locally
+from the manifest, which requires the API to run with the same SECRET_KEY.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.auth import create_access_token, create_company_access_token
+
+# method, path, query params, JSON body, token kind ("subscriber", "company", "admin" or "none")
+Request = Tuple[str, str, Optional[dict], Optional[dict], str]
+
+# name -> (weight, build(rng, tenant) -> Request)
+ROUTES: Dict[str, Tuple[int, Callable[[random.Random, dict], Request]]] = {
+    "POST /api/auth/subscriber/login": (4, lambda rng, t: (
+        "POST", "/api/auth/subscriber/login", None, {"mac_address": rng.choice(t["subscribers"])["mac"]}, "none")),
+    "GET /api/config": (6, lambda rng, t: ("GET", "/api/config", None, None, "subscriber")),
+    "GET /api/channels": (16, lambda rng, t: (
+        "GET", "/api/channels", {"limit": 50, "offset": rng.randrange(0, 2000, 50)}, None, "subscriber")),
+    "GET /api/channels?group": (6, lambda rng, t: (
+        "GET", "/api/channels", {"group": rng.choice(t["groups"]), "limit": 100}, None, "subscriber")),
+    "GET /api/channels/{id}": (8, lambda rng, t: (
+        "GET", f"/api/channels/{rng.choice(t['channels'])}", None, None, "subscriber")),
+    "GET /api/epg/now": (4, lambda rng, t: ("GET", "/api/epg/now", None, None, "subscriber")),
+    "GET /api/epg/grid": (8, lambda rng, t: (
+        "GET", "/api/epg/grid", {"limit": 30, "offset": rng.randrange(0, 600, 30), "hours": 6}, None, "subscriber")),
+    "GET /api/channels/{id}/epg": (8, lambda rng, t: (
+        "GET", f"/api/channels/{rng.choice(t['channels'])}/epg", None, None, "subscriber")),
+    "GET /api/movies": (8, lambda rng, t: (
+        "GET", "/api/movies", {"limit": 50, "offset": rng.randrange(0, 500, 50)}, None, "subscriber")),
+    "GET /api/messages": (6, lambda rng, t: ("GET", "/api/messages", None, None, "subscriber")),
+    "GET /api/admin/channels": (2, lambda rng, t: ("GET", "/api/admin/channels", None, None, "company")),
+    "GET /api/admin/users": (2, lambda rng, t: (
+        "GET", "/api/admin/users", {"limit": 50, "skip": rng.randrange(0, 5000, 50)}, None, "company")),
+    "GET /api/admin/streamers": (1, lambda rng, t: ("GET", "/api/admin/streamers", None, None, "company")),
+    "GET /api/admin/packages": (1, lambda rng, t: ("GET", "/api/admin/packages", None, None, "company")),
+    "GET /api/admin/config/stats": (1, lambda rng, t: ("GET", "/api/admin/config/stats", None, None, "company")),
+    "GET /api/super-admin/companies": (1, lambda rng, t: ("GET", "/api/super-admin/companies", None, None, "admin")),
+}
+
+OK_STATUSES = (200, 201, 204, 304)
+
+
+def select_routes(pattern: Optional[str]) -> Dict[str, tuple]:
+    if not pattern:
+        return ROUTES
+    selected = {name: route for name, route in ROUTES.items() if pattern in name}
+    if not selected:
+        raise SystemExit(f"No route matches {pattern!r}")
+    return selected
+
+
+class Tokens:
+    """Bearer tokens per subscriber, company and the bench admin, minted on demand."""
+
+    def __init__(self, manifest: dict):
+        self._admin = create_access_token({"sub": manifest["admin"]}, timedelta(days=1))
+        self._companies: Dict[str, str] = {}
+        self._subscribers: Dict[str, str] = {}
+
+    def get(self, kind: str, rng: random.Random, tenant: dict) -> Optional[str]:
+        if kind == "admin":
+            return self._admin
+        if kind == "company":
+            if tenant["id"] not in self._companies:
+                self._companies[tenant["id"]] = create_company_access_token(
+                    {"_id": tenant["id"], "username": tenant["username"]}, timedelta(days=1)
+                )
+            return self._companies[tenant["id"]]
+        if kind == "subscriber":
+            subscriber = rng.choice(tenant["subscribers"])
+            if subscriber["id"] not in self._subscribers:
+                self._subscribers[subscriber["id"]] = create_access_token(
+                    {
+                        "sub": subscriber["username"],
+                        "role": "subscriber",
+                        "id": subscriber["id"],
+                        "company_id": tenant["id"],
+                    },
+                    timedelta(days=1),
+                )
+            return self._subscribers[subscriber["id"]]
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+
+    def record(self, name: str, seconds: float, status: int) -> None:
+        self.latencies.setdefault(name, []).append(seconds)
+        counts = self.statuses.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+        if status not in OK_STATUSES:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarise(recorder: Recorder, elapsed: float) -> Dict[str, dict]:
+    summary = {}
+    for name, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        summary[name] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(name, 0),
+            "rps": len(values) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000,
+            "statuses": {str(k): v for k, v in sorted(recorder.statuses[name].items())},
+        }
+    return summary
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    routes: Dict[str, tuple],
+    manifest: dict,
+    tokens: Tokens,
+    recorder: Optional[Recorder],
+    deadline: float,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    names = list(routes)
+    weights = [routes[name][0] for name in names]
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        tenant = rng.choice(manifest["companies"])
+        method, path, params, body, token_kind = routes[name][1](rng, tenant)
+        token = tokens.get(token_kind, rng, tenant)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, params=params, json=body, headers=headers)
+            await response.aread()
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        if recorder is not None:
+            recorder.record(name, time.perf_counter() - started, status)
+
+
+async def run(
+    base_url: str,
+    manifest: dict,
+    concurrency: int,
+    duration: float,
+    warmup: float = 5.0,
+    routes: Optional[Dict[str, tuple]] = None,
+    seed: int = 1,
+) -> Tuple[Dict[str, dict], float]:
+    """Drive the API; return (per-route summary, measured seconds)."""
+    routes = routes or ROUTES
+    tokens = Tokens(manifest)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        if warmup > 0:
+            # Fill caches and connection pools; nothing is recorded
+            deadline = time.perf_counter() + warmup
+            await asyncio.gather(*(
+                _worker(client, routes, manifest, tokens, None, deadline, seed + n) for n in range(concurrency)
+            ))
+        recorder = Recorder()
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            _worker(client, routes, manifest, tokens, recorder, deadline, seed + 1000 + n)
+            for n in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return summarise(recorder, elapsed), elapsed
+
+
+def print_report(summary: Dict[str, dict], elapsed: float, concurrency: int) -> None:
+    total = sum(route["requests"] for route in summary.values())
+    errors = sum(route["errors"] for route in summary.values())
+    print(f"{total} requests in {elapsed:.1f}s at concurrency {concurrency}: "
+          f"{total / elapsed:.0f} req/s, {errors} errors\n")
+    print(f"{'route':<34} {'reqs':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'err':>5}")
+    for name, route in summary.items():
+        print(f"{name:<34} {route['requests']:>7} {route['rps']:>7.1f} {route['p50_ms']:>8.1f} "
+              f"{route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f} {route['max_ms']:>8.1f} {route['errors']:>5}")
+
+
+def compare(summary: Dict[str, dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Routes whose p95 grew by more than ``tolerance`` (a fraction) over the baseline."""
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)["routes"]
+    regressions = []
+    for name, route in summary.items():
+        before = baseline.get(name)
+        if not before or not before["p95_ms"]:
+            continue
+        if route["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']:.1f} ms -> {route['p95_ms']:.1f} ms "
+                f"(+{(route['p95_ms'] / before['p95_ms'] - 1) * 100:.0f}%)"
+            )
+    return regressions
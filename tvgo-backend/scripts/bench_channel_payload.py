@@ -0,0 +1,124 @@
+"""Micro-benchmark: /api/channels payload, pydantic + stdlib json vs dicts + orjson.
+
+Usage:
+    python scripts/bench_channel_payload.py [--channels 1000] [--rounds 20]
+
+"before" mirrors the old path: build schemas.Channel models, let FastAPI
+re-validate them through response_model and render with stdlib json.
+"after" renders plain dicts with ORJSONResponse; "snapshot" is the served
+path: filtering and joining a prebuilt LineupSnapshot and now/next overlay.
+Bytes on the wire are reported raw, gzipped and (if installed) brotli'd.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# The benchmark never talks to Mongo; avoid resolving the default SRV URI
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from app import schemas  # noqa: E402
+from app.compression import brotli  # noqa: E402
+from app.lineup import LineupSnapshot, channel_document_to_payload  # noqa: E402
+from app.routers.public import _channel_document_to_schema  # noqa: E402
+
+
+def generate_documents(count: int) -> list[dict]:
+    documents = []
+    start = datetime(2026, 1, 1, 12)
+    for index in range(count):
+        now_next = [
+            {"id": f"epg-{index}-1", "title": "Evening News", "category": "News",
+             "start": start, "end": start + timedelta(minutes=30), "isLive": True},
+            {"id": f"epg-{index}-2", "title": "Weather", "category": "News",
+             "start": start + timedelta(minutes=30), "end": start + timedelta(hours=1), "isLive": False},
+        ]
+        documents.append({
+            "_id": f"company-1_channel-{index}",
+            "name": f"Channel {index}",
+            "group": ["News", "Sports", "Movies", "Kids"][index % 4],
+            "logo_url": f"https://cdn.example.com/channel-logos/{index}.png",
+            "stream_url": f"https://streams.example.com/live/{index}/index.m3u8",
+            "lang": ["en"],
+            "country": "AZ",
+            "badges": ["HD"],
+            "metadata": {"source": "m3u", "streamer_name": "main"},
+            "streamer_name": "main",
+            "order": index,
+            "epg_id": f"epg-{index}",
+            "now_next": now_next,
+        })
+    return documents
+
+
+def render_before(documents: list[dict]) -> bytes:
+    items = [_channel_document_to_schema(document, document["now_next"]) for document in documents]
+    response = schemas.ChannelsListResponse(total=len(items), items=items, nextOffset=None)
+    # FastAPI's serialize_response: validate against response_model, then encode
+    validated = schemas.ChannelsListResponse.model_validate(response.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def render_after(documents: list[dict]) -> bytes:
+    items = [
+        dict(channel_document_to_payload(document), programSchedule=document["now_next"]) for document in documents
+    ]
+    return ORJSONResponse({"total": len(items), "items": items, "nextOffset": None}).body
+
+
+def render_snapshot(snapshot: LineupSnapshot, now_next: dict[str, bytes]) -> bytes:
+    return snapshot.render_page(snapshot.select(), 0, len(snapshot), now_next)
+
+
+def timed(render, documents: list[dict], rounds: int) -> tuple[float, bytes]:
+    body = render(documents)  # warm-up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        body = render(documents)
+    return (time.perf_counter() - started) / rounds, body
+
+
+def wire_sizes(body: bytes) -> str:
+    sizes = [f"raw {len(body):,} B", f"gzip {len(gzip.compress(body, compresslevel=6)):,} B"]
+    if brotli is not None:
+        sizes.append(f"br {len(brotli.compress(body, quality=4)):,} B")
+    return ", ".join(sizes)
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--channels", type=int, default=1000)
+    cli.add_argument("--rounds", type=int, default=20)
+    args = cli.parse_args()
+
+    documents = generate_documents(args.channels)
+    before, before_body = timed(render_before, documents, args.rounds)
+    after, after_body = timed(render_after, documents, args.rounds)
+    snapshot = LineupSnapshot((0,), documents, [])
+    now_next = {document["epg_id"]: orjson.dumps(document["now_next"]) for document in documents}
+    served, served_body = timed(lambda _: render_snapshot(snapshot, now_next), documents, args.rounds)
+
+    per_1k = 1000 / args.channels
+    print(f"channels          : {args.channels:,}")
+    print(f"before            : {before * 1000 * per_1k:.1f} ms per 1k channels ({wire_sizes(before_body)})")
+    print(f"after             : {after * 1000 * per_1k:.1f} ms per 1k channels ({wire_sizes(after_body)})")
+    print(f"snapshot          : {served * 1000 * per_1k:.2f} ms per 1k channels ({wire_sizes(served_body)})")
+    print(f"speed-up          : {before / after:.1f}x (dicts), {before / served:.0f}x (snapshot)")
+
+
+if __name__ == "__main__":
+    main()
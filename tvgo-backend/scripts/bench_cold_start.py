@@ -0,0 +1,93 @@
+"""Cold-start benchmark: time to first response through the Lambda handler.
+
+Usage:
+    python scripts/bench_cold_start.py [--runs 5] [--path /]
+
+Each run starts a fresh interpreter with AWS_LAMBDA_FUNCTION_NAME set (so the
+app takes its Lambda defaults), imports ``lambda_function`` and sends an API
+Gateway HTTP API event through ``handler``. Reported per phase: import, first
+invocation (Mangum setup, lifespan startup, the request) and a second, warm
+invocation. Paths other than ``/`` need MONGO_URI to point at a database.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+
+def event(path):
+    return {
+        "version": "2.0", "routeKey": "$default", "rawPath": path, "rawQueryString": "",
+        "headers": {"host": "bench.local", "accept": "application/json"},
+        "requestContext": {
+            "http": {"method": "GET", "path": path, "protocol": "HTTP/1.1",
+                     "sourceIp": "127.0.0.1", "userAgent": "bench"},
+            "stage": "$default", "requestId": "bench", "accountId": "0", "apiId": "bench",
+            "domainName": "bench.local", "domainPrefix": "bench", "time": "", "timeEpoch": 0,
+        },
+        "isBase64Encoded": False,
+    }
+
+class Context:
+    function_name = "bench"
+    aws_request_id = "bench"
+
+path = sys.argv[1]
+status = lambda_function.handler(event(path), Context())["statusCode"]
+first = time.perf_counter()
+lambda_function.handler(event(path), Context())
+second = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import": imported - started,
+    "first": first - imported,
+    "warm": second - first,
+}))
+"""
+
+
+def run_once(path: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    env["AWS_LAMBDA_FUNCTION_NAME"] = "bench"
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, path],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--runs", type=int, default=5)
+    cli.add_argument("--path", default="/")
+    args = cli.parse_args()
+
+    runs = [run_once(args.path) for _ in range(args.runs)]
+    print(f"path              : {args.path} (HTTP {runs[0]['status']})")
+    for phase in ("import", "first", "warm"):
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:<18}: median {statistics.median(values):7.1f} ms (min {min(values):.1f}, max {max(values):.1f})")
+    to_first = [(run["import"] + run["first"]) * 1000 for run in runs]
+    print(f"time to first resp: median {statistics.median(to_first):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
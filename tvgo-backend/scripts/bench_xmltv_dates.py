@@ -0,0 +1,77 @@
+"""Micro-benchmark: XMLTV timestamp parsing, strptime vs XMLTVDateParser.
+
+Usage:
+    python scripts/bench_xmltv_dates.py [--programmes 200000]
+
+Timestamps are generated like a real feed: consecutive programmes per channel,
+so every stop value is the next programme's start value.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.xmltv import XMLTVDateParser  # noqa: E402
+
+
+def generate_stamps(programmes: int) -> list[str]:
+    rng = random.Random(42)
+    offsets = ["+0000", "+0300", "+0400", "-0500"]
+    stamps: list[str] = []
+    channels = max(1, programmes // 200)
+    for channel in range(channels):
+        offset = offsets[channel % len(offsets)]
+        current = datetime(2026, 1, 1) + timedelta(minutes=rng.randrange(0, 60))
+        for _ in range(programmes // channels):
+            stop = current + timedelta(minutes=rng.choice([15, 30, 45, 60, 90, 120]))
+            stamps.append(current.strftime("%Y%m%d%H%M%S ") + offset)
+            stamps.append(stop.strftime("%Y%m%d%H%M%S ") + offset)
+            current = stop
+    return stamps
+
+
+def bench_strptime(stamps: list[str]) -> float:
+    started = time.perf_counter()
+    for value in stamps:
+        datetime.strptime(value, "%Y%m%d%H%M%S %z")
+    return time.perf_counter() - started
+
+
+def bench_parser(stamps: list[str]) -> float:
+    parser = XMLTVDateParser()
+    started = time.perf_counter()
+    parse = parser.parse
+    for value in stamps:
+        parse(value)
+    elapsed = time.perf_counter() - started
+    assert parser.malformed == 0, parser.summary()
+    return elapsed
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--programmes", type=int, default=200_000)
+    args = cli.parse_args()
+
+    stamps = generate_stamps(args.programmes)
+    baseline = bench_strptime(stamps)
+    fast = bench_parser(stamps)
+
+    per_value = 1e6 / len(stamps)
+    print(f"timestamps parsed : {len(stamps):,}")
+    print(f"strptime          : {baseline:.3f}s ({baseline * per_value:.2f} us/value)")
+    print(f"XMLTVDateParser   : {fast:.3f}s ({fast * per_value:.2f} us/value)")
+    print(f"speed-up          : {baseline / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
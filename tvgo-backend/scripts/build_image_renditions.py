@@ -0,0 +1,71 @@
+"""Build TV-sized renditions for existing channel logos and movie artwork.
+
+Usage:
+    python scripts/build_image_renditions.py [--collection channels|movies] [--company ID]
+
+The API renders images when they are written; run this once for catalogs that
+predate the pipeline, and on Lambda, where background rendering is off. Only
+sources without a current rendition are processed, so it is safe to re-run.
+Needs Pillow and S3 (S3_BUCKET_NAME).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.catalog import bump_catalog_version  # noqa: E402
+from app.database import get_database  # noqa: E402
+from app.images import SOURCE_FIELDS, build_renditions, missing_sources, shutdown  # noqa: E402
+
+
+def build_collection(db, collection: str, company_id=None) -> tuple[int, int]:
+    query: dict = {"$or": [{field: {"$nin": [None, ""]}} for field in SOURCE_FIELDS[collection].values()]}
+    if company_id is not None:
+        query["company_id"] = company_id
+    projection = {field: 1 for field in SOURCE_FIELDS[collection].values()}
+    projection.update({"renditions": 1, "company_id": 1})
+
+    built = failed = 0
+    companies = set()
+    for document in db[collection].find(query, projection):
+        for kind, url in missing_sources(collection, document).items():
+            try:
+                items = build_renditions(db, url, kind)
+            except Exception as e:
+                failed += 1
+                print(f"  {collection}/{document['_id']} {kind}: {e}", flush=True)
+                continue
+            db[collection].update_one(
+                {"_id": document["_id"], SOURCE_FIELDS[collection][kind]: url},
+                {"$set": {f"renditions.{kind}": {"source": url, "items": items}}},
+            )
+            companies.add(document.get("company_id"))
+            built += 1
+    for company in companies:
+        bump_catalog_version(db, company)
+    return built, failed
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--collection", choices=sorted(SOURCE_FIELDS), action="append")
+    cli.add_argument("--company", help="limit to one company id")
+    args = cli.parse_args()
+
+    db = get_database()
+    try:
+        for collection in args.collection or sorted(SOURCE_FIELDS):
+            built, failed = build_collection(db, collection, args.company)
+            print(f"{collection}: {built} rendition sets built, {failed} failed", flush=True)
+    finally:
+        shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Create the MongoDB indexes the API relies on.
+
+Servers do this at startup; Lambda deployments skip it to keep cold starts
+short (see ``ensure_indexes_on_startup``), so run this once per deploy:
+
+    python scripts/ensure_indexes.py
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.database import ensure_indexes, get_database  # noqa: E402
+
+
+def main() -> None:
+    ensure_indexes(get_database())
+    print("Indexes ensured", flush=True)
+
+
+if __name__ == "__main__":
+    main()
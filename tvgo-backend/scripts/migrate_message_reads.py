@@ -0,0 +1,67 @@
+"""Move legacy ``messages.read_by`` arrays into the ``message_reads`` collection.
+
+Each reader becomes one ``message_reads`` document, the message gets a
+``read_count`` and the array is removed. Safe to run more than once.
+"""
+
+from __future__ import annotations
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import certifi
+from pymongo import MongoClient, UpdateOne
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.config import settings  # noqa: E402
+
+BATCH_SIZE = 1000
+
+
+def migrate_message(db, message: dict) -> int:
+    message_id = message["_id"]
+    readers = message.get("read_by") or []
+    read_at = message.get("created_at") or datetime.utcnow()
+    for start in range(0, len(readers), BATCH_SIZE):
+        operations = [
+            UpdateOne(
+                {"_id": f"{message_id}:{subscriber_id}"},
+                {"$setOnInsert": {
+                    "message_id": message_id,
+                    "subscriber_id": subscriber_id,
+                    "company_id": message.get("company_id"),
+                    "read_at": read_at,
+                }},
+                upsert=True,
+            )
+            for subscriber_id in readers[start:start + BATCH_SIZE]
+        ]
+        db["message_reads"].bulk_write(operations, ordered=False)
+
+    read_count = db["message_reads"].count_documents({"message_id": message_id})
+    db["messages"].update_one(
+        {"_id": message_id},
+        {"$set": {"read_count": read_count}, "$unset": {"read_by": ""}},
+    )
+    return len(readers)
+
+
+def main() -> None:
+    client = MongoClient(settings.mongo_uri, tlsCAFile=certifi.where())
+    db = client[settings.mongo_db_name]
+
+    migrated = 0
+    receipts = 0
+    for message in db["messages"].find({"read_by": {"$exists": True}}, {"read_by": 1, "company_id": 1, "created_at": 1}):
+        receipts += migrate_message(db, message)
+        migrated += 1
+
+    print(f"Migrated {receipts} read receipts from {migrated} messages", flush=True)
+
+
+if __name__ == "__main__":
+    main()
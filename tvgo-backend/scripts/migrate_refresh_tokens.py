@@ -0,0 +1,63 @@
+"""Move stored refresh tokens to the current layout.
+
+Tokens issued before hashing were stored in plain text (``token`` field,
+random ``_id``); later ones were keyed on their hash alone. Each live token
+gets its hash in ``token_hash`` and, if it belongs to a device, is re-keyed on
+its owner and device (the newest token per device wins), keeping its owner
+and expiry, so signed-in admins and subscribers stay signed in; expired ones
+are dropped. Safe to run more than once.
+"""
+
+from __future__ import annotations
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from pymongo import DESCENDING  # noqa: E402
+
+from app.auth import device_token_id, hash_refresh_token  # noqa: E402
+from app.database import get_database  # noqa: E402
+
+# collection -> owner field
+COLLECTIONS = {"refresh_tokens": "username", "company_refresh_tokens": "company_id"}
+
+
+def migrate_collection(db, collection: str, owner_field: str) -> tuple[int, int]:
+    tokens = db[collection]
+    now = datetime.utcnow()
+    migrated = dropped = 0
+    # Newest first: the first token re-keyed onto a device keeps the slot
+    for document in tokens.find({"token_hash": {"$exists": False}}).sort("created_at", DESCENDING):
+        tokens.delete_one({"_id": document["_id"]})
+        if document.get("expires_at") and document["expires_at"] <= now:
+            dropped += 1
+            continue
+        plain = document.pop("token", None)
+        document["token_hash"] = hash_refresh_token(plain) if plain else document["_id"]
+        device = document.setdefault("device", None)
+        if device:
+            key = device_token_id({owner_field: document.get(owner_field)}, device)
+            # A newer token for the device (already migrated or issued) wins
+            document.pop("_id")
+            tokens.update_one({"_id": key}, {"$setOnInsert": document}, upsert=True)
+        else:
+            document["_id"] = document["token_hash"]
+            tokens.replace_one({"_id": document["_id"]}, document, upsert=True)
+        migrated += 1
+    return migrated, dropped
+
+
+def main() -> None:
+    db = get_database()
+    for collection, owner_field in COLLECTIONS.items():
+        migrated, dropped = migrate_collection(db, collection, owner_field)
+        print(f"{collection}: {migrated} tokens re-keyed, {dropped} expired tokens removed", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Summarise ``python -X importtime`` for the Lambda entry point.
+
+Usage:
+    python scripts/profile_imports.py [--module lambda_function] [--top 25]
+
+Imports the module in a fresh interpreter (as a Lambda cold start does) and
+reports the total, the slowest modules by cumulative time and the time per
+top-level package, so regressions such as an eager boto3 import stand out.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def import_times(module: str) -> list[tuple[str, int, int, int]]:
+    """Return (module, self us, cumulative us, depth) rows in import order."""
+    env = dict(os.environ)
+    # Importing must not need a reachable database
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument("--module", default="lambda_function")
+    cli.add_argument("--top", type=int, default=25)
+    args = cli.parse_args()
+
+    rows = import_times(args.module)
+    total = sum(self_us for _, self_us, _, _ in rows)
+    packages: dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        packages[name.split(".")[0]] += self_us
+
+    print(f"{args.module}: {total / 1000:.0f} ms across {len(rows)} modules\n")
+    print("slowest modules (cumulative):")
+    for name, _, cumulative_us, depth in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {'  ' * depth}{name}")
+    print("\nby top-level package (self time):")
+    for name, self_us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
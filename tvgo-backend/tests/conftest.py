@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Unit tests never talk to Mongo; avoid resolving the default SRV URI
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
@@ -0,0 +1,621 @@
+"""
+In-memory stand-in for the parts of a PyMongo ``Database`` the API uses.
+
+Queries support equality (including array membership), dotted paths and the
+comparison, ``$in``/``$nin``, ``$exists``, ``$size``, ``$not``, ``$or``/``$and``
+and ``$expr`` operators; ``$expr`` and aggregations understand only the
+expression and stage operators the code under test builds. Updates support
+the positional ``array.$`` form for array fields the query matched on. Every
+call is recorded in ``FakeCollection.calls`` so tests can count round trips.
+"""
+import copy
+import itertools
+import re
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+_MISSING = object()
+_ids = itertools.count(1)
+
+
+def _get(document: Any, path: str) -> Any:
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        elif isinstance(value, list):
+            values = [_get(item, part) for item in value if isinstance(item, dict)]
+            value = [v for v in values if v is not _MISSING] or _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _candidates(value: Any) -> List[Any]:
+    if value is _MISSING:
+        return [None]
+    if isinstance(value, list):
+        return value + [value]
+    return [value]
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    if left is None or right is None:
+        return False
+    try:
+        return {"$gt": left > right, "$gte": left >= right, "$lt": left < right, "$lte": left <= right}[op]
+    except TypeError:
+        return False
+
+
+def _match_operators(value: Any, condition: dict) -> bool:
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = operand in _candidates(value)
+        elif op == "$ne":
+            ok = operand not in _candidates(value)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            ok = any(_compare(op, c, operand) for c in _candidates(value))
+        elif op == "$in":
+            ok = any(c in operand for c in _candidates(value))
+        elif op == "$nin":
+            ok = not any(c in operand for c in _candidates(value))
+        elif op == "$exists":
+            ok = (value is not _MISSING) == bool(operand)
+        elif op == "$size":
+            ok = isinstance(value, list) and len(value) == operand
+        elif op == "$not":
+            ok = not _match_operators(value, operand)
+        elif op == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            ok = any(isinstance(c, str) and re.search(operand, c, flags) for c in _candidates(value))
+        elif op == "$options":
+            ok = True
+        elif op == "$elemMatch":
+            ok = isinstance(value, list) and any(
+                matches(item, operand) if isinstance(item, dict) else _match_operators(item, operand)
+                for item in value
+            )
+        else:
+            raise NotImplementedError(f"query operator {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$expr":
+            if not evaluate(condition, document):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if not _match_operators(_get(document, key), condition):
+                return False
+        elif condition not in _candidates(_get(document, key)):
+            return False
+    return True
+
+
+def evaluate(expression: Any, document: dict, variables: Optional[dict] = None) -> Any:
+    """Evaluate an aggregation expression against ``document``."""
+    variables = variables or {}
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, _, path = expression[2:].partition(".")
+        value = variables[name]
+        return _get(value, path) if path else value
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(item, document, variables) for item in expression]
+    if not isinstance(expression, dict) or not expression:
+        return expression
+    (op, args), = expression.items() if len(expression) == 1 else ((None, None),)
+    if op is None or not op.startswith("$"):
+        return {key: evaluate(value, document, variables) for key, value in expression.items()}
+
+    def arg(index: int) -> Any:
+        return evaluate(args[index], document, variables)
+
+    if op == "$map":
+        items = evaluate(args["input"], document, variables) or []
+        name = args.get("as", "this")
+        return [evaluate(args["in"], document, {**variables, name: item}) for item in items]
+    if op == "$filter":
+        items = evaluate(args["input"], document, variables) or []
+        name = args.get("as", "this")
+        return [item for item in items if evaluate(args["cond"], document, {**variables, name: item})]
+    if op == "$cond":
+        condition, then, otherwise = (args["if"], args["then"], args["else"]) if isinstance(args, dict) else args
+        return evaluate(then if evaluate(condition, document, variables) else otherwise, document, variables)
+    if op == "$literal":
+        return args
+    values = [evaluate(a, document, variables) for a in args] if isinstance(args, list) else [
+        evaluate(args, document, variables)
+    ]
+    if op == "$objectToArray":
+        return [{"k": k, "v": v} for k, v in (values[0] or {}).items()]
+    if op == "$concatArrays":
+        return [item for value in values for item in (value or [])]
+    if op == "$ifNull":
+        return next((v for v in values if v is not None), None)
+    if op == "$anyElementTrue":
+        return any(values[0])
+    if op == "$in":
+        return values[0] in (values[1] or [])
+    if op == "$arrayElemAt":
+        return values[0][values[1]] if values[0] and -len(values[0]) <= values[1] < len(values[0]) else None
+    if op == "$split":
+        return values[0].split(values[1])
+    if op == "$size":
+        return len(values[0])
+    if op == "$eq":
+        return values[0] == values[1]
+    if op == "$ne":
+        return values[0] != values[1]
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        return _compare(op, values[0], values[1])
+    if op == "$and":
+        return all(values)
+    if op == "$or":
+        return any(values)
+    if op == "$add":
+        return sum(values)
+    if op == "$sum":
+        return sum(v for v in values if isinstance(v, (int, float)))
+    raise NotImplementedError(f"expression operator {op}")
+
+
+def _set_path(document: dict, path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document[int(part)] if isinstance(document, list) else document.setdefault(part, {})
+    if isinstance(document, list):
+        document[int(parts[-1])] = value
+    else:
+        document[parts[-1]] = value
+
+
+def _resolve_positional(document: dict, query: dict, update: dict) -> dict:
+    """Replace ``array.$`` in update paths with the index the query matched."""
+    resolved = {}
+    for op, fields in update.items():
+        resolved[op] = {}
+        for path, value in fields.items():
+            if ".$." in path or path.endswith(".$"):
+                array, _, rest = path.partition(".$")
+                index = next(
+                    i for i, item in enumerate(_get(document, array))
+                    if any(
+                        key.startswith(array + ".") and matches({"item": item}, {"item" + key[len(array):]: condition})
+                        for key, condition in query.items()
+                    )
+                )
+                path = f"{array}.{index}{rest}"
+            resolved[op][path] = value
+    return resolved
+
+
+def _unset_path(document: dict, path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(parts[-1], None)
+
+
+def _apply_update(document: dict, update: dict, inserting: bool) -> None:
+    for op, fields in update.items():
+        for path, value in fields.items():
+            current = _get(document, path)
+            current = None if current is _MISSING else current
+            if op == "$set":
+                _set_path(document, path, copy.deepcopy(value))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(document, path, copy.deepcopy(value))
+            elif op == "$unset":
+                _unset_path(document, path)
+            elif op == "$inc":
+                _set_path(document, path, (current or 0) + value)
+            elif op == "$max":
+                _set_path(document, path, value if current is None or value > current else current)
+            elif op == "$min":
+                _set_path(document, path, value if current is None or value < current else current)
+            elif op in ("$push", "$addToSet"):
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                target = list(current or [])
+                for item in items:
+                    if op == "$push" or item not in target:
+                        target.append(copy.deepcopy(item))
+                if isinstance(value, dict) and "$slice" in value:
+                    size = value["$slice"]
+                    target = target[size:] if size < 0 else target[:size]
+                _set_path(document, path, target)
+            elif op == "$pull":
+                def pulled(item: Any) -> bool:
+                    if isinstance(value, dict):
+                        if isinstance(item, dict) and not all(k.startswith("$") for k in value):
+                            return matches(item, value)
+                        return _match_operators(item, value)
+                    return item == value
+
+                _set_path(document, path, [item for item in current or [] if not pulled(item)])
+            elif op == "$currentDate":
+                _set_path(document, path, datetime.utcnow())
+            else:
+                raise NotImplementedError(f"update operator {op}")
+
+
+def _project(document: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(document)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {}
+        if projection.get("_id", 1):
+            result["_id"] = document.get("_id")
+        for path in include:
+            value = _get(document, path)
+            if value is not _MISSING:
+                _set_path(result, path, copy.deepcopy(value))
+        return result
+    result = copy.deepcopy(document)
+    for path, value in projection.items():
+        if not value:
+            _unset_path(result, path)
+    return result
+
+
+def _sort_key(spec: List[tuple]):
+    def key(document: dict):
+        parts = []
+        for path, direction in spec:
+            value = _get(document, path)
+            missing = value is _MISSING or value is None
+            parts.append(_Directional((missing, "" if missing else value), direction))
+        return parts
+    return key
+
+
+class _Directional:
+    def __init__(self, value, direction):
+        self.value, self.direction = value, direction
+
+    def __lt__(self, other):
+        return self.value < other.value if self.direction > 0 else self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class FakeCursor:
+    def __init__(self, documents: List[dict]):
+        self._documents = documents
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        spec = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        self._documents = sorted(self._documents, key=_sort_key(spec))
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        documents = self._documents[self._skip:]
+        return iter(documents[:self._limit] if self._limit else documents)
+
+
+class FakeCollection:
+    def __init__(self, database: "FakeDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.documents: List[dict] = []
+        self.indexes: List[tuple] = []
+        self.calls: List[str] = []
+
+    # -- helpers -----------------------------------------------------------
+    def _record(self, name: str) -> None:
+        self.calls.append(name)
+        self.database.calls.append((self.name, name))
+
+    def _find(self, query: Optional[dict]) -> List[dict]:
+        return [d for d in self.documents if matches(d, query)]
+
+    def _insert(self, document: dict) -> Any:
+        document.setdefault("_id", f"oid-{next(_ids)}")
+        if any(d["_id"] == document["_id"] for d in self.documents):
+            raise DuplicateKeyError(f"duplicate _id {document['_id']!r} in {self.name}")
+        for keys, unique, sparse in self.indexes:
+            if not unique:
+                continue
+            values = tuple(_get(document, k) for k in keys)
+            if sparse and all(v is _MISSING for v in values):
+                continue
+            if any(tuple(_get(d, k) for k in keys) == values for d in self.documents):
+                raise DuplicateKeyError(f"duplicate {keys} in {self.name}")
+        self.documents.append(copy.deepcopy(document))
+        return document["_id"]
+
+    def _upsert_document(self, query: dict, update: dict) -> dict:
+        document = {
+            key: value for key, value in query.items()
+            if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value))
+        }
+        _apply_update(document, update, inserting=True)
+        return document
+
+    # -- reads -------------------------------------------------------------
+    def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        self._record("find_one")
+        found = self._find(query)
+        if kwargs.get("sort"):
+            found = sorted(found, key=_sort_key(kwargs["sort"]))
+        return _project(found[0], projection) if found else None
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        self._record("find")
+        return FakeCursor([_project(d, projection) for d in self._find(query)])
+
+    def count_documents(self, query: dict, **kwargs) -> int:
+        self._record("count_documents")
+        return len(self._find(query))
+
+    def estimated_document_count(self) -> int:
+        self._record("estimated_document_count")
+        return len(self.documents)
+
+    def distinct(self, key: str, query: Optional[dict] = None) -> list:
+        self._record("distinct")
+        values: List[Any] = []
+        for document in self._find(query):
+            for value in _candidates(_get(document, key))[:-1] if isinstance(_get(document, key), list) else [
+                _get(document, key)
+            ]:
+                if value is not _MISSING and value not in values:
+                    values.append(value)
+        return values
+
+    def aggregate(self, pipeline: List[dict], **kwargs):
+        self._record("aggregate")
+        return iter(self.database.run_pipeline(self.documents, pipeline))
+
+    # -- writes ------------------------------------------------------------
+    def insert_one(self, document: dict, **kwargs):
+        self._record("insert_one")
+        return SimpleNamespace(inserted_id=self._insert(document))
+
+    def insert_many(self, documents: Iterable[dict], ordered: bool = True, **kwargs):
+        self._record("insert_many")
+        return SimpleNamespace(inserted_ids=[self._insert(d) for d in documents])
+
+    def _update(self, query: dict, update: dict, upsert: bool, many: bool):
+        found = self._find(query)
+        if not many:
+            found = found[:1]
+        modified = 0
+        for document in found:
+            before = copy.deepcopy(document)
+            _apply_update(document, _resolve_positional(document, query, update), inserting=False)
+            modified += document != before
+        upserted_id = None
+        if not found and upsert:
+            upserted_id = self._insert(self._upsert_document(query, update))
+        return SimpleNamespace(matched_count=len(found), modified_count=modified, upserted_id=upserted_id)
+
+    def update_one(self, query: dict, update: dict, upsert: bool = False, **kwargs):
+        self._record("update_one")
+        return self._update(query, update, upsert, many=False)
+
+    def update_many(self, query: dict, update: dict, upsert: bool = False, **kwargs):
+        self._record("update_many")
+        return self._update(query, update, upsert, many=True)
+
+    def replace_one(self, query: dict, replacement: dict, upsert: bool = False, **kwargs):
+        self._record("replace_one")
+        found = self._find(query)[:1]
+        for document in found:
+            keep_id = document["_id"]
+            document.clear()
+            document.update(copy.deepcopy(replacement), _id=keep_id)
+        upserted_id = None
+        if not found and upsert:
+            document = dict(copy.deepcopy(replacement))
+            if "_id" in query and "_id" not in document:
+                document["_id"] = query["_id"]
+            upserted_id = self._insert(document)
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found), upserted_id=upserted_id)
+
+    def delete_one(self, query: dict, **kwargs):
+        self._record("delete_one")
+        found = self._find(query)[:1]
+        self.documents = [d for d in self.documents if not any(d is f for f in found)]
+        return SimpleNamespace(deleted_count=len(found))
+
+    def delete_many(self, query: dict, **kwargs):
+        self._record("delete_many")
+        found = self._find(query)
+        self.documents = [d for d in self.documents if not any(d is f for f in found)]
+        return SimpleNamespace(deleted_count=len(found))
+
+    def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False, **kwargs):
+        self._record("find_one_and_update")
+        found = self._find(query)
+        if kwargs.get("sort"):
+            found = sorted(found, key=_sort_key(kwargs["sort"]))
+        if found:
+            document = found[0]
+            before = copy.deepcopy(document)
+            _apply_update(document, _resolve_positional(document, query, update), inserting=False)
+            return _project(document if return_document == ReturnDocument.AFTER else before, projection)
+        if not upsert:
+            return None
+        document = self._upsert_document(query, update)
+        self._insert(document)
+        return _project(document, projection) if return_document == ReturnDocument.AFTER else None
+
+    def find_one_and_delete(self, query, projection=None, **kwargs):
+        self._record("find_one_and_delete")
+        found = self._find(query)[:1]
+        if not found:
+            return None
+        self.documents = [d for d in self.documents if d is not found[0]]
+        return _project(found[0], projection)
+
+    def bulk_write(self, operations: List[Any], ordered: bool = True, **kwargs):
+        self._record("bulk_write")
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                self._insert(operation._doc)
+            elif isinstance(operation, (UpdateOne, UpdateMany)):
+                self._update(operation._filter, operation._doc, operation._upsert, isinstance(operation, UpdateMany))
+            elif isinstance(operation, ReplaceOne):
+                self.replace_one(operation._filter, operation._doc, operation._upsert)
+            elif isinstance(operation, DeleteOne):
+                self.delete_one(operation._filter)
+            elif isinstance(operation, DeleteMany):
+                self.delete_many(operation._filter)
+            else:
+                raise NotImplementedError(type(operation).__name__)
+        return SimpleNamespace(acknowledged=True)
+
+    def create_index(self, keys, unique: bool = False, sparse: bool = False, **kwargs) -> str:
+        names = [keys] if isinstance(keys, str) else [k for k, _ in keys]
+        self.indexes.append((tuple(names), unique, sparse))
+        return "_".join(names)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections: Dict[str, FakeCollection] = {}
+        self.calls: List[tuple] = []
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self, name)
+        return self.collections[name]
+
+    def reset_calls(self) -> None:
+        self.calls.clear()
+        for collection in self.collections.values():
+            collection.calls.clear()
+
+    def run_pipeline(self, documents: List[dict], pipeline: List[dict]) -> List[dict]:
+        """Run the aggregation stages the API uses over ``documents``."""
+        rows = [copy.deepcopy(d) for d in documents]
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                rows = [row for row in rows if matches(row, spec)]
+            elif name == "$project":
+                rows = [self._project_stage(row, spec) for row in rows]
+            elif name == "$sort":
+                rows = sorted(rows, key=_sort_key(list(spec.items())))
+            elif name == "$limit":
+                rows = rows[:spec]
+            elif name == "$skip":
+                rows = rows[spec:]
+            elif name == "$count":
+                rows = [{spec: len(rows)}] if rows else []
+            elif name == "$lookup":
+                rows = [self._lookup(row, spec) for row in rows]
+            elif name == "$group":
+                rows = self._group(rows, spec)
+            elif name == "$unwind":
+                path = spec if isinstance(spec, str) else spec["path"]
+                rows = [
+                    {**row, path[1:]: item}
+                    for row in rows for item in (evaluate(path, row) or [])
+                ]
+            else:
+                raise NotImplementedError(f"aggregation stage {name}")
+        return rows
+
+    def _project_stage(self, row: dict, spec: dict) -> dict:
+        result = {"_id": row.get("_id")} if spec.get("_id", 1) else {}
+        for key, value in spec.items():
+            if key == "_id" and value in (0, 1, True, False):
+                continue
+            if value in (1, True):
+                found = _get(row, key)
+                if found is not _MISSING:
+                    _set_path(result, key, found)
+            elif value not in (0, False):
+                result[key] = evaluate(value, row)
+        return result
+
+    def _lookup(self, row: dict, spec: dict) -> dict:
+        foreign = self[spec["from"]].documents
+        if "pipeline" in spec:
+            variables = {name: evaluate(expr, row) for name, expr in spec.get("let", {}).items()}
+            pipeline = [
+                {"$match": {k: v for k, v in stage["$match"].items() if k != "$expr"}}
+                if "$match" in stage else stage
+                for stage in spec["pipeline"]
+            ]
+            expr_stages = [stage["$match"]["$expr"] for stage in spec["pipeline"] if "$expr" in stage.get("$match", {})]
+            candidates = [d for d in foreign if all(evaluate(e, d, variables) for e in expr_stages)]
+            joined = self.run_pipeline(candidates, pipeline)
+        else:
+            local = _get(row, spec["localField"])
+            values = _candidates(local)
+            joined = [copy.deepcopy(d) for d in foreign if _get(d, spec["foreignField"]) in values]
+        return {**row, spec["as"]: joined}
+
+    def _group(self, rows: List[dict], spec: dict) -> List[dict]:
+        groups: Dict[Any, dict] = {}
+        for row in rows:
+            key = evaluate(spec["_id"], row)
+            hashable = repr(key)
+            group = groups.setdefault(hashable, {"_id": key})
+            for field, accumulator in spec.items():
+                if field == "_id":
+                    continue
+                (op, expr), = accumulator.items()
+                if op == "$topN":
+                    group.setdefault(field, []).append(row)
+                    continue
+                value = evaluate(expr, row)
+                if op == "$sum":
+                    group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+                elif op == "$push":
+                    group.setdefault(field, []).append(value)
+                elif op == "$addToSet":
+                    group.setdefault(field, [])
+                    if value not in group[field]:
+                        group[field].append(value)
+                elif op == "$first":
+                    group.setdefault(field, value)
+                elif op == "$max":
+                    group[field] = value if field not in group or value > group[field] else group[field]
+                else:
+                    raise NotImplementedError(f"accumulator {op}")
+        for group in groups.values():
+            for field, accumulator in spec.items():
+                if field != "_id" and "$topN" in accumulator:
+                    top = accumulator["$topN"]
+                    ranked = sorted(group[field], key=_sort_key(list(top["sortBy"].items())))
+                    group[field] = [evaluate(top["output"], row) for row in ranked[:top["n"]]]
+        return list(groups.values())
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from app import cache
+from app.cache import Cache, MemoryBackend, invalidate_tag
+
+
+@pytest.fixture(params=["local", "shared"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(cache, "_local_tags", {})
+    monkeypatch.setattr(cache, "_backend", MemoryBackend() if request.param == "shared" else None)
+    return request.param
+
+
+def test_loads_once_and_serves_hits(backend):
+    store = Cache(f"test-hits-{backend}", ttl=60)
+    loads = []
+    assert store.get_or_load("k", lambda: loads.append(1) or [1, 2]) == [1, 2]
+    assert store.get_or_load("k", lambda: loads.append(1) or [3]) == [1, 2]
+    assert loads == [1]
+    assert store.stats()["hits"] == 1
+
+
+def test_tag_invalidation_reloads(backend):
+    store = Cache(f"test-tags-{backend}", ttl=60)
+    store.get_or_load("a", lambda: "old a", tags=["tenant:c1"])
+    store.get_or_load("b", lambda: "old b", tags=["tenant:c2"])
+    invalidate_tag("tenant:c1")
+    assert store.get_or_load("a", lambda: "new a", tags=["tenant:c1"]) == "new a"
+    assert store.get_or_load("b", lambda: "new b", tags=["tenant:c2"]) == "old b"
+    store.clear()
+    assert store.get_or_load("b", lambda: "new b", tags=["tenant:c2"]) == "new b"
+
+
+def test_shared_tier_serves_other_processes(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", MemoryBackend())
+    writer = Cache("test-shared", ttl=60)
+    writer.get_or_load("k", lambda: {"v": 1})
+    reader = Cache("test-shared", ttl=60)  # a second worker's instance
+    assert reader.get_or_load("k", lambda: pytest.fail("should come from the shared tier")) == {"v": 1}
+    assert reader.stats()["sharedHits"] == 1
+
+
+def test_concurrent_misses_load_once_and_leave_no_flight_behind(backend):
+    store = Cache(f"test-flight-{backend}", ttl=60)
+    loads = []
+    def slow_load():
+        time.sleep(0.05)
+        loads.append(1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_load("k", slow_load))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 8
+    assert loads == [1]
+    assert store._flights == {}
+
+
+def test_per_key_flights_do_not_accumulate(backend):
+    store = Cache(f"test-many-{backend}", ttl=60, max_entries=10)
+    for n in range(1000):
+        store.get_or_load(f"subscriber-{n}", lambda: n)
+    assert store._flights == {}
+    assert len(store._local) == 10
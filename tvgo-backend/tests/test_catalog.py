@@ -0,0 +1,88 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app import catalog
+from app.auth import create_access_token, get_current_subscriber
+from app.catalog import _etag_matches, bump_catalog_version, catalog_validators
+from app.database import get_db
+from fakes import FakeDatabase
+
+ETAG = 'W/"abc123"'
+
+
+def test_matches_weak_and_strong_forms():
+    assert _etag_matches('W/"abc123"', ETAG)
+    assert _etag_matches('"abc123"', ETAG)
+
+
+def test_matches_any_entry_of_a_list():
+    assert _etag_matches('"other", W/"abc123"', ETAG)
+    assert not _etag_matches('"other", W/"nope"', ETAG)
+
+
+def test_wildcard_is_never_a_match():
+    assert not _etag_matches("*", ETAG)
+    assert not _etag_matches('*, "other"', ETAG)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(catalog, "_versions", {})
+    monkeypatch.setattr(catalog, "publish_catalog_changed", lambda *args: None)
+    database = FakeDatabase()
+    database["subscribers"].insert_one(
+        {"_id": "s1", "company_id": "c1", "status": "active", "package_ids": ["p1"]}
+    )
+    return database
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.dependency_overrides[get_db] = lambda: db
+
+    @app.get("/channels", dependencies=[Depends(catalog_validators("channels"))])
+    def channels(current_user=Depends(get_current_subscriber)):
+        return {"subscriber": current_user["_id"]}
+
+    return TestClient(app)
+
+
+def auth(subscriber_id: str = "s1") -> dict:
+    token = create_access_token({"sub": subscriber_id, "role": "subscriber", "id": subscriber_id, "company_id": "c1"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_unchanged_catalog_answers_304(client):
+    first = client.get("/channels", headers=auth())
+    assert first.status_code == 200
+    again = client.get("/channels", headers={**auth(), "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.headers["etag"] == first.headers["etag"]
+
+
+def test_catalog_bump_changes_the_etag(client, db):
+    etag = client.get("/channels", headers=auth()).headers["etag"]
+    bump_catalog_version(db, "c1")
+    assert client.get("/channels", headers={**auth(), "If-None-Match": etag}).status_code == 200
+
+
+def test_package_change_rolls_only_that_subscribers_etag(client, db):
+    etag = client.get("/channels", headers=auth()).headers["etag"]
+    db["subscribers"].update_one({"_id": "s1"}, {"$set": {"package_ids": ["p1", "p2"]}})
+    response = client.get("/channels", headers={**auth(), "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert db["catalog_versions"].documents == []
+
+
+def test_wildcard_and_missing_token_fall_through_to_auth(client, db):
+    assert client.get("/channels", headers={"If-None-Match": "*"}).status_code == 401
+    assert client.get("/channels", headers={**auth(), "If-None-Match": "*"}).status_code == 200
+
+
+def test_deactivated_subscriber_is_not_given_a_304(client, db):
+    etag = client.get("/channels", headers=auth()).headers["etag"]
+    db["subscribers"].update_one({"_id": "s1"}, {"$set": {"status": "inactive", "is_active": False}})
+    assert client.get("/channels", headers={**auth(), "If-None-Match": etag}).status_code == 403
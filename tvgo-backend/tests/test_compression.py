@@ -0,0 +1,68 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, _choose_encoding
+
+
+@pytest.fixture
+def no_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+def test_prefers_brotli_when_available():
+    if compression.brotli is None:
+        pytest.skip("brotli is not installed")
+    assert _choose_encoding("gzip, deflate, br") == "br"
+
+
+def test_falls_back_to_gzip_without_brotli(no_brotli):
+    assert _choose_encoding("gzip, deflate, br") == "gzip"
+
+
+def test_honours_zero_quality():
+    assert _choose_encoding("br;q=0, gzip;q=0") is None
+    assert _choose_encoding("br;q=0, gzip") == "gzip"
+    assert _choose_encoding("gzip;q=nonsense") is None
+
+
+def test_no_supported_encoding():
+    assert _choose_encoding("") is None
+    assert _choose_encoding("identity, deflate") is None
+    assert _choose_encoding("GZIP") == "gzip"
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return ORJSONResponse({"items": ["channel"] * 100})
+
+    @app.get("/small")
+    def small():
+        return ORJSONResponse({"ok": True})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"data: 1\n\n"] * 50), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_large_json_is_gzipped(no_brotli):
+    response = make_client().get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == {"items": ["channel"] * 100}
+
+
+def test_small_and_streamed_bodies_pass_through(no_brotli):
+    client = make_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in streamed.headers
+    assert streamed.content.count(b"data: 1") == 50
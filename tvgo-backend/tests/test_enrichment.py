@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app import enrichment
+from app.enrichment import create_job, run_job
+from app.tmdb import TMDBEnrichedData
+from fakes import FakeDatabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    db["movies"].insert_many([
+        {"_id": f"m{i}", "company_id": "c1", "title": f"Movie {i}" if i != 3 else ""} for i in range(5)
+    ])
+    bumps = []
+    monkeypatch.setattr(enrichment, "bump_catalog_version", lambda db, company_id: bumps.append(company_id))
+    monkeypatch.setattr(enrichment, "schedule_renditions", lambda *args: None)
+    monkeypatch.setattr(enrichment, "CHUNK_SIZE", 2)
+    db.bumps = bumps
+    return db
+
+
+async def _found(title, year=None):
+    return TMDBEnrichedData(tmdb_id=len(title), title=title, synopsis=f"About {title}")
+
+
+def test_job_enriches_in_chunks_and_bumps_once(db, monkeypatch):
+    monkeypatch.setattr(enrichment, "enrich_movie", _found)
+    job = create_job(db, "c1")
+    asyncio.run(run_job(db, job["_id"]))
+
+    job = db["enrichment_jobs"].find_one({"_id": job["_id"]})
+    assert (job["status"], job["processed"], job["enriched"], job["failed"]) == ("completed", 5, 4, 1)
+    assert job["errors"] == ["Movie has no title to search"]
+    assert db["movies"].find_one({"_id": "m0"})["synopsis"] == "About Movie 0"
+    assert db.bumps == ["c1"]
+
+
+def test_interrupted_job_still_publishes_what_it_wrote(db, monkeypatch):
+    async def interrupted(title, year=None):
+        if title == "Movie 4":
+            raise asyncio.CancelledError  # e.g. the server shutting down mid-chunk
+        return await _found(title)
+
+    monkeypatch.setattr(enrichment, "enrich_movie", interrupted)
+    job = create_job(db, "c1")
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run_job(db, job["_id"]))
+    assert db["enrichment_jobs"].find_one({"_id": job["_id"]})["last_movie_id"] == "m3"
+    assert db.bumps == ["c1"]
+
+
+def test_job_without_matches_does_not_bump(db, monkeypatch):
+    async def missing(title, year=None):
+        return None
+
+    monkeypatch.setattr(enrichment, "enrich_movie", missing)
+    job = create_job(db, "c1")
+    asyncio.run(run_job(db, job["_id"]))
+    assert db["enrichment_jobs"].find_one({"_id": job["_id"]})["status"] == "completed"
+    assert db.bumps == []
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import pytest
+
+from app.routers import epg
+from app.routers.epg import EPGProgram, replace_programs_in_mongo
+from app.xmltv import merge_epg_sources
+from fakes import FakeDatabase
+
+
+class Channel(NamedTuple):
+    id: str
+    name: str
+
+
+class Program(NamedTuple):
+    channel_id: str
+    start: datetime
+    stop: datetime
+    title: str
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return datetime(2026, 1, 1, hour, minute, tzinfo=timezone.utc)
+
+
+def test_merge_keeps_first_channel_and_fills_free_slots():
+    primary = (
+        [Channel("one", "Primary")],
+        [Program("one", at(12), at(13), "News"), Program("one", at(14), at(15), "Film")],
+    )
+    secondary = (
+        [Channel("one", "Secondary"), Channel("two", "Other")],
+        [
+            Program("one", at(12, 30), at(13, 30), "Overlaps news"),
+            Program("one", at(13), at(14), "Fills the gap"),
+            Program("two", at(12), at(13), "Only source"),
+        ],
+    )
+
+    channels, programs, dropped = merge_epg_sources([primary, secondary])
+
+    assert [c.name for c in channels] == ["Primary", "Other"]
+    assert dropped == 1
+    one = [p.title for p in programs if p.channel_id == "one"]
+    assert one == ["News", "Fills the gap", "Film"]
+    assert [p.title for p in programs if p.channel_id == "two"] == ["Only source"]
+
+
+def test_merge_drops_overlaps_inside_one_source():
+    source = (
+        [Channel("one", "Only")],
+        [
+            Program("one", at(12), at(13), "First"),
+            Program("one", at(12), at(13), "Duplicate"),
+            Program("one", at(12, 30), at(12, 45), "Inside"),
+            Program("one", at(13), at(13) + timedelta(minutes=30), "Next"),
+        ],
+    )
+    _, programs, dropped = merge_epg_sources([source])
+    assert [p.title for p in programs] == ["First", "Next"]
+    assert dropped == 2
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(epg, "request_now_next_refresh", lambda: calls.append(1))
+    return calls
+
+
+def test_replace_writes_the_new_guide_then_drops_older_runs(refreshes):
+    db = FakeDatabase()
+    db["epg_programs"].insert_many([
+        {"channel_id": "one", "title": "Old", "sync_run": "before"},
+        {"channel_id": "untouched", "title": "Kept", "sync_run": "before"},
+    ])
+    db.reset_calls()
+
+    replace_programs_in_mongo([EPGProgram(channel_id="one", title="New", start=at(12), stop=at(13))], db)
+
+    assert db.calls == [("epg_programs", "insert_many"), ("epg_programs", "delete_many")]
+    titles = sorted(d["title"] for d in db["epg_programs"].documents)
+    assert titles == ["Kept", "New"]
+    assert refreshes == [1]
+
+
+def test_replace_keeps_the_old_guide_when_the_insert_fails(refreshes, monkeypatch):
+    db = FakeDatabase()
+    db["epg_programs"].insert_one({"channel_id": "one", "title": "Old", "sync_run": "before"})
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(db["epg_programs"], "insert_many", fail)
+    with pytest.raises(RuntimeError):
+        replace_programs_in_mongo([EPGProgram(channel_id="one", title="New", start=at(12), stop=at(13))], db)
+    assert [d["title"] for d in db["epg_programs"].documents] == ["Old"]
+    assert refreshes == []
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+
+from app import epg_scheduler
+from app.epg_scheduler import now_next_digest, now_next_overlay, refresh_now_next, request_now_next_refresh
+from fakes import FakeDatabase
+
+NOW = datetime.utcnow().replace(microsecond=0)
+
+
+def _program(channel_id, program_id, start_minutes, end_minutes):
+    return {
+        "channel_id": channel_id,
+        "program_id": program_id,
+        "title": program_id,
+        "start": NOW + timedelta(minutes=start_minutes),
+        "end": NOW + timedelta(minutes=end_minutes),
+    }
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(epg_scheduler, "_overlays", {})
+    monkeypatch.setattr(epg_scheduler, "_scheduler", None)
+    db = FakeDatabase()
+    db["channels"].insert_many([
+        {"_id": "c1-news", "company_id": "c1", "epg_id": "news"},
+        {"_id": "c1-plain", "company_id": "c1"},
+        {"_id": "c2-sport", "company_id": "c2", "epg_id": "sport"},
+    ])
+    db["epg_programs"].insert_many([
+        _program("news", "old", -90, -30),
+        _program("news", "late", 60, 120),
+        _program("news", "now", -30, 30),
+        _program("news", "next", 30, 60),
+        _program("sport", "match", -10, 80),
+    ])
+    return db
+
+
+def test_overlay_holds_the_tenants_current_and_next(db):
+    overlay = refresh_now_next(db, "c1", NOW)
+    assert list(overlay.items) == ["news"]
+    items = orjson.loads(overlay.items["news"])
+    assert [(i["id"], i["isLive"]) for i in items] == [("now", True), ("next", False)]
+    assert overlay.valid_until == NOW + timedelta(minutes=30)
+
+
+def test_digests_are_per_tenant(db):
+    c1 = refresh_now_next(db, "c1", NOW).digest
+    c2 = refresh_now_next(db, "c2", NOW).digest
+    assert c1 != c2
+
+    db["epg_programs"].insert_one(_program("sport", "overtime", 80, 100))
+    assert refresh_now_next(db, "c1", NOW).digest == c1
+    assert refresh_now_next(db, "c2", NOW + timedelta(minutes=85)).digest != c2
+
+
+def test_first_read_builds_then_serves_from_memory(db):
+    assert b'"now"' in now_next_overlay(db, "c1")["news"]
+    db.reset_calls()
+    now_next_overlay(db, "c1")
+    now_next_digest(db, "c1")
+    assert db.calls == []
+
+
+class _Scheduler:
+    def __init__(self):
+        self.woken = 0
+
+    def is_alive(self):
+        return True
+
+    def wake(self):
+        self.woken += 1
+
+
+def test_stale_read_wakes_the_scheduler_instead_of_refreshing(db, monkeypatch):
+    scheduler = _Scheduler()
+    monkeypatch.setattr(epg_scheduler, "_scheduler", scheduler)
+    stale = refresh_now_next(db, "c1", NOW - timedelta(days=1))
+    db.reset_calls()
+    assert now_next_overlay(db, "c1") is stale.items
+    assert db.calls == []
+    assert scheduler.woken == 1
+
+
+def test_stale_read_without_scheduler_refreshes_once(db):
+    stale = refresh_now_next(db, "c1", NOW - timedelta(days=1))
+    with epg_scheduler._refresh_lock:
+        # Another read is refreshing: serve the previous overlay
+        assert now_next_overlay(db, "c1") is stale.items
+    assert now_next_overlay(db, "c1") is not stale.items
+
+
+def test_guide_change_expires_every_overlay(db):
+    refresh_now_next(db, "c1", NOW)
+    refresh_now_next(db, "c2", NOW)
+    request_now_next_refresh()
+    assert all(o.valid_until == datetime.min for o in epg_scheduler._overlays.values())
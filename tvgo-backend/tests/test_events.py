@@ -0,0 +1,39 @@
+import asyncio
+
+from app.events import EventHub, message_recipients
+
+
+def test_recipients_of_broadcasts_are_the_whole_tenant():
+    assert message_recipients({"target_type": "all"}) is None
+    assert message_recipients({}) is None
+
+
+def test_recipients_of_user_messages_are_their_targets():
+    message = {"target_type": "users", "target_ids": ["s1", "s2"]}
+    assert message_recipients(message) == {"s1", "s2"}
+    assert message_recipients({"target_type": "users", "target_ids": None}) == frozenset()
+
+
+def test_recipients_of_group_messages_are_the_group_members():
+    message = {"target_type": "groups", "target_ids": ["g1"]}
+    assert message_recipients(message, ["s1", "s3", "s1"]) == {"s1", "s3"}
+    assert message_recipients(message) == frozenset()
+
+
+def test_hub_delivers_only_to_recipients_of_the_tenant():
+    hub = EventHub()
+
+    async def scenario():
+        first = hub.subscribe("c1", "s1")
+        second = hub.subscribe("c1", "s2")
+        other_tenant = hub.subscribe("c2", "s1")
+        hub.publish("c1", {"event": "message", "id": 1}, recipients={"s2"})
+        hub.publish("c1", {"event": "message", "id": 2})
+        await asyncio.sleep(0)
+
+        def drain(subscription):
+            return [subscription.queue.get_nowait()["id"] for _ in range(subscription.queue.qsize())]
+
+        return drain(first), drain(second), drain(other_tenant)
+
+    assert asyncio.run(scenario()) == ([2], [1, 2], [])
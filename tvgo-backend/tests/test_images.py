@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from app import images
+from app.images import build_renditions, missing_sources, schedule_renditions
+from fakes import FakeDatabase
+
+DIGEST = hashlib.sha256(b"image").hexdigest()
+ITEMS = [{"url": "https://cdn.example.com/r/sm.webp", "width": 96, "height": 96, "format": "webp"}]
+
+
+@pytest.fixture
+def db():
+    db = FakeDatabase()
+    db["image_renditions"].insert_one(
+        {"_id": f"{DIGEST}:logo", "kind": "logo", "items": ITEMS, "sources": ["https://example.com/a.png"]}
+    )
+    return db
+
+
+def test_known_source_is_not_downloaded(db, monkeypatch):
+    monkeypatch.setattr(images, "_download", lambda url: pytest.fail("downloaded a known source"))
+    assert build_renditions(db, "https://example.com/a.png", "logo") == ITEMS
+
+
+def test_same_image_under_a_new_url_is_not_rendered_again(db, monkeypatch):
+    downloads = []
+    monkeypatch.setattr(images, "_download", lambda url: downloads.append(url) or b"image")
+    monkeypatch.setattr(images, "_pools", lambda: pytest.fail("rendered a known image"))
+
+    assert build_renditions(db, "https://mirror.example.com/a.png", "logo") == ITEMS
+    assert build_renditions(db, "https://mirror.example.com/a.png", "logo") == ITEMS
+    assert downloads == ["https://mirror.example.com/a.png"]
+    assert db["image_renditions"].find_one({"_id": f"{DIGEST}:logo"})["sources"] == [
+        "https://example.com/a.png",
+        "https://mirror.example.com/a.png",
+    ]
+
+
+def test_missing_sources_skips_current_renditions():
+    document = {
+        "poster_url": "https://example.com/p.jpg",
+        "hero_url": "https://example.com/h.jpg",
+        "landscape_url": "/local/l.jpg",
+        "renditions": {"poster": {"source": "https://example.com/p.jpg", "items": ITEMS}},
+    }
+    assert missing_sources("movies", document) == {"hero": "https://example.com/h.jpg"}
+
+
+class _Pool:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.jobs.append((future, fn, args))
+        return future
+
+
+def test_a_document_saved_twice_is_queued_once(monkeypatch):
+    pool = _Pool()
+    monkeypatch.setattr(images, "renditions_available", lambda: True)
+    monkeypatch.setattr(images, "_pools", lambda: (None, pool))
+    monkeypatch.setattr(images, "_pending", set())
+    monkeypatch.setattr(images, "_outstanding", 0)
+    document = {"_id": "ch1", "company_id": "c1", "logo_url": "https://example.com/a.png"}
+
+    assert schedule_renditions(None, "channels", document) is not None
+    assert schedule_renditions(None, "channels", document) is None
+    assert len(pool.jobs) == 1 and images._outstanding == 1
+
+    # The job finishing on another thread frees the key
+    done = threading.Thread(target=pool.jobs[0][0].set_result, args=(None,))
+    done.start()
+    done.join()
+    assert images._pending == set()
+    assert schedule_renditions(None, "channels", document) is not None
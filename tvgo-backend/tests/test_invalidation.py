@@ -0,0 +1,118 @@
+from bson import Timestamp
+
+from app import catalog, invalidation
+from app.invalidation import InvalidationWatcher, _change_stream_pipeline, _scope_of, publish_change
+from fakes import FakeDatabase, matches
+
+
+class FakeStream:
+    """Yields queued changes, then None (idle) and stops the watcher."""
+
+    def __init__(self, watcher, changes):
+        self.watcher = watcher
+        self.changes = list(changes)
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        if self.changes:
+            return self.changes.pop(0)
+        self.watcher.stop()
+        return None
+
+
+def _change(collection, company_id, time, inc=1, operation="insert"):
+    return {
+        "ns": {"coll": collection},
+        "operationType": operation,
+        "clusterTime": Timestamp(time, inc),
+        "documentKey": {"_id": f"{collection}-{time}-{inc}"},
+        "fullDocument": {"company_id": company_id},
+    }
+
+
+def _notified(monkeypatch):
+    scopes = []
+    monkeypatch.setattr(invalidation, "notify_local", scopes.append)
+    monkeypatch.setattr(catalog, "_versions", {})
+    return scopes
+
+
+def test_scope_of():
+    assert _scope_of({"fullDocument": {"company_id": "c1"}}) == "c1"
+    assert _scope_of({"fullDocument": {"name": "global brand"}}) == catalog.GLOBAL_SCOPE
+    assert _scope_of({"fullDocument": None}) is None
+
+
+def test_only_the_first_worker_counts_a_change(monkeypatch):
+    scopes = _notified(monkeypatch)
+    db = FakeDatabase()
+    publish_change(db, "c1", Timestamp(100, 1))
+    publish_change(db, "c1", Timestamp(100, 1))  # Another worker, same change
+    assert scopes == ["c1"]
+    assert db["catalog_versions"].find_one({"_id": "c1"})["version"] == 1
+
+    publish_change(db, "c1", Timestamp(99, 5))  # Older than what was counted
+    publish_change(db, "c1", Timestamp(101, 1))
+    assert scopes == ["c1", "c1"]
+    document = db["catalog_versions"].find_one({"_id": "c1"})
+    assert document["version"] == 2
+    assert document["last_change"] == Timestamp(101, 1)
+
+
+def test_counts_on_top_of_api_bumps(monkeypatch):
+    _notified(monkeypatch)
+    db = FakeDatabase()
+    db["catalog_versions"].insert_one({"_id": "c1", "version": 7})  # bump_catalog_version
+    publish_change(db, "c1", Timestamp(100, 1))
+    assert db["catalog_versions"].find_one({"_id": "c1"})["version"] == 8
+
+
+def test_pipeline_filters_unwatched_traffic():
+    (stage,) = _change_stream_pipeline()
+    keep = [
+        {"ns": {"coll": "channels"}, "operationType": "update"},
+        {"ns": {"coll": "catalog_versions"}, "operationType": "update"},
+        {"ns": {"coll": "messages"}, "operationType": "insert"},
+    ]
+    drop = [
+        {"ns": {"coll": "channels"}, "operationType": "delete"},
+        {"ns": {"coll": "subscribers"}, "operationType": "update"},
+        {"ns": {"coll": "refresh_tokens"}, "operationType": "insert"},
+        {"ns": {"coll": "epg_programs"}, "operationType": "insert"},
+    ]
+    assert all(matches(change, stage["$match"]) for change in keep)
+    assert not any(matches(change, stage["$match"]) for change in drop)
+
+
+def test_watch_coalesces_changes_per_scope(monkeypatch):
+    scopes = _notified(monkeypatch)
+    db = FakeDatabase()
+    watcher = InvalidationWatcher(db)
+    changes = [_change("channels", "c1", 100, inc) for inc in range(1, 50)]
+    changes += [_change("packages", "c2", 100, 3), _change("channels", "c1", 99)]
+    monkeypatch.setattr(db, "watch", lambda *args, **kwargs: FakeStream(watcher, changes), raising=False)
+
+    watcher._watch()
+
+    assert sorted(scopes) == ["c1", "c2"]
+    versions = {d["_id"]: d for d in db["catalog_versions"].find()}
+    assert versions["c1"]["version"] == 1
+    assert versions["c1"]["last_change"] == Timestamp(100, 49)
+    assert versions["c2"]["version"] == 1
+
+
+def test_pipeline_only_passes_message_deactivations():
+    (stage,) = _change_stream_pipeline()
+
+    def update(fields):
+        return {"ns": {"coll": "messages"}, "operationType": "update", "updateDescription": {"updatedFields": fields}}
+
+    assert matches(update({"is_active": False, "updated_at": 1}), stage["$match"])
+    assert not matches(update({"read_count": 12}), stage["$match"])
+    assert not matches({"ns": {"coll": "messages"}, "operationType": "delete"}, stage["$match"])
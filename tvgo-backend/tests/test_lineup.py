@@ -0,0 +1,83 @@
+import orjson
+import pytest
+from bson import ObjectId
+
+from app import catalog, lineup
+from app.catalog import bump_catalog_version
+from app.lineup import LineupSnapshot, get_lineup
+from fakes import FakeDatabase
+
+PACKAGE = ObjectId()
+
+
+def channel(index: int, group: str, **extra) -> dict:
+    return {"_id": f"c1_ch{index}", "id": f"ch{index}", "name": f"Channel {index}", "group": group,
+            "company_id": "c1", "order": index, **extra}
+
+
+DOCUMENTS = [
+    channel(0, "News", epg_id="news.epg"),
+    channel(1, "Sports"),
+    channel(2, "News"),
+]
+
+
+@pytest.fixture
+def snapshot():
+    return LineupSnapshot(("v",), DOCUMENTS, [{"_id": PACKAGE, "channel_ids": ["c1_ch1", "missing"]}])
+
+
+def test_select_filters_compose(snapshot):
+    assert snapshot.select() == [0, 1, 2]
+    assert snapshot.select(group="News") == [0, 2]
+    assert snapshot.select(search="channel 2") == [2]
+    assert snapshot.select(search="[") == []  # invalid patterns are matched literally
+    assert snapshot.select(favorites=["c1_ch2", "unknown"]) == [2]
+    assert snapshot.select(group="News", allowed=frozenset({2})) == [2]
+
+
+def test_package_access(snapshot):
+    assert snapshot.allowed_positions(None) is None
+    assert snapshot.allowed_positions(["not-an-object-id"]) is None
+    assert snapshot.allowed_positions([str(PACKAGE)]) == {1}
+    assert snapshot.allowed_positions([str(ObjectId())]) == frozenset()
+
+
+def test_channels_are_found_by_document_and_m3u_id(snapshot):
+    assert snapshot.position("c1_ch1") == 1
+    assert snapshot.position("ch1") == 1
+    assert snapshot.position("nope") is None
+
+
+def test_render_page_splices_in_now_next(snapshot):
+    schedule = [{"id": "p", "title": "Bulletin"}]
+    body = orjson.loads(snapshot.render_page([0, 1, 2], 0, 2, {"news.epg": orjson.dumps(schedule)}))
+    assert body["total"] == 3
+    assert body["nextOffset"] == 2
+    assert [item["id"] for item in body["items"]] == ["c1_ch0", "c1_ch1"]
+    assert body["items"][0]["programSchedule"] == schedule
+    assert body["items"][1]["programSchedule"] == []
+    assert orjson.loads(snapshot.render_page([0, 1, 2], 2, 2, {}))["nextOffset"] is None
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(catalog, "_versions", {})
+    monkeypatch.setattr(catalog, "publish_catalog_changed", lambda *args: None)
+    monkeypatch.setattr(lineup, "_snapshots", {})
+    database = FakeDatabase()
+    database["channels"].insert_many([dict(d) for d in DOCUMENTS])
+    return database
+
+
+def test_get_lineup_is_served_from_memory_until_the_version_moves(db):
+    first = get_lineup(db, "c1")
+    db.reset_calls()
+    assert get_lineup(db, "c1") is first
+    assert db["channels"].calls == []
+
+    db["channels"].insert_one(channel(3, "Kids"))
+    bump_catalog_version(db, "c1")
+    rebuilt = get_lineup(db, "c1")
+    assert rebuilt is not first
+    assert len(rebuilt) == 4
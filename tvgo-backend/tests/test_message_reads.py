@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import cache
+from app.routers import user_groups
+from app.routers.messages import get_subscriber_messages, mark_message_read
+from fakes import FakeDatabase
+
+SUBSCRIBER = {"_id": "s1", "company_id": "c1"}
+
+
+def _message(message_id, minutes, **fields):
+    return {
+        "_id": message_id,
+        "company_id": "c1",
+        "title": message_id,
+        "body": "",
+        "target_type": "all",
+        "is_active": True,
+        "created_at": datetime(2026, 10, 1) + timedelta(minutes=minutes),
+        **fields,
+    }
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", None)
+    user_groups._membership_cache.clear()
+    db = FakeDatabase()
+    db["messages"].insert_many([
+        _message("m1", 1),
+        _message("m2", 2),
+        _message("m3", 3, target_type="users", target_ids=["s1"]),
+        _message("m4", 4, target_type="users", target_ids=["s2"]),
+        _message("m5", 5, is_active=False),
+        _message("m6", 6, company_id="c2"),
+    ])
+    return db
+
+
+def _inbox(db, limit=50):
+    return get_subscriber_messages(skip=0, limit=limit, db=db, current_user=SUBSCRIBER)
+
+
+def test_inbox_counts_visible_and_unread_messages(db):
+    inbox = _inbox(db)
+    assert [item.id for item in inbox["items"]] == ["m3", "m2", "m1"]
+    assert (inbox["total"], inbox["unread_count"]) == (3, 3)
+
+    mark_message_read("m2", db=db, current_user=SUBSCRIBER)
+    inbox = _inbox(db, limit=1)
+    assert (inbox["total"], inbox["unread_count"]) == (3, 2)
+    assert not inbox["items"][0].is_read
+    assert {item.id: item.is_read for item in _inbox(db)["items"]}["m2"]
+
+
+def test_reads_are_counted_once_per_subscriber(db):
+    for _ in range(3):
+        mark_message_read("m1", db=db, current_user=SUBSCRIBER)
+    mark_message_read("m1", db=db, current_user={"_id": "s2", "company_id": "c1"})
+    assert db["messages"].find_one({"_id": "m1"})["read_count"] == 2
+    assert db["message_reads"].count_documents({"message_id": "m1"}) == 2
+
+
+def test_other_tenants_messages_cannot_be_marked(db):
+    with pytest.raises(HTTPException) as error:
+        mark_message_read("m6", db=db, current_user=SUBSCRIBER)
+    assert error.value.status_code == 404
+    assert db["message_reads"].count_documents({}) == 0
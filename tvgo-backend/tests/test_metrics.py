@@ -0,0 +1,38 @@
+import json
+
+from app.metrics import MAX_SHAPE_LENGTH, command_shape, query_shape
+
+
+def test_query_shape_strips_values_and_keeps_operators():
+    query = {"company_id": "c1", "order": {"$gte": 3}, "$or": [{"a": 1}, {"b": {"$in": [1, 2, 3]}}]}
+    assert query_shape(query) == {"company_id": "?", "order": {"$gte": "?"}, "$or": [{"a": "?"}, {"b": {"$in": "?"}}]}
+
+
+def test_scalar_lists_collapse_whatever_their_length():
+    assert query_shape({"_id": {"$in": [1]}}) == query_shape({"_id": {"$in": list(range(500))}})
+
+
+def test_command_shape_of_reads():
+    assert command_shape("find", {"find": "channels", "filter": {"company_id": "c1"}}) == (
+        "channels", '{"company_id":"?"}'
+    )
+    pipeline = [{"$match": {"company_id": "c1"}}, {"$group": {"_id": None, "total": {"$sum": 1}}}]
+    assert command_shape("aggregate", {"aggregate": "messages", "pipeline": pipeline}) == (
+        "messages", '[{"$match":{"company_id":"?"}},{"$group":{"_id":"?","total":{"$sum":"?"}}}]'
+    )
+    assert command_shape("insert", {"insert": "messages", "documents": [{}]}) == ("messages", "")
+
+
+def test_command_shape_of_writes_uses_the_first_statement():
+    command = {"update": "subscribers", "updates": [{"q": {"_id": "s1"}, "u": {"$set": {"x": 1}}}]}
+    assert command_shape("update", command) == ("subscribers", '{"_id":"?"}')
+    command = {"delete": "refresh_tokens", "deletes": [{"q": {"token_hash": "h"}, "limit": 1}]}
+    assert command_shape("delete", command) == ("refresh_tokens", '{"token_hash":"?"}')
+
+
+def test_command_shape_of_get_more_and_long_filters():
+    assert command_shape("getMore", {"getMore": 1, "collection": "epg_programs"}) == ("epg_programs", "")
+    wide = {f"field_{n}": n for n in range(200)}
+    _, shape = command_shape("find", {"find": "movies", "filter": wide})
+    assert len(shape) == MAX_SHAPE_LENGTH
+    assert shape == json.dumps(query_shape(wide), separators=(",", ":"))[:MAX_SHAPE_LENGTH]
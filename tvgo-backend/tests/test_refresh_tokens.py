@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import auth
+from app.auth import (
+    create_refresh_token,
+    get_refresh_token,
+    hash_refresh_token,
+    revoke_refresh_token,
+    rotate_refresh_token,
+)
+from fakes import FakeDatabase
+
+
+@pytest.fixture
+def db():
+    db = FakeDatabase()
+    db["refresh_tokens"].create_index("token_hash", unique=True, sparse=True)
+    return db
+
+
+def test_only_the_hash_is_stored(db):
+    token, expires_at = create_refresh_token(db, "alice")
+    (document,) = db["refresh_tokens"].find()
+    assert token not in str(document)
+    assert document["_id"] == document["token_hash"] == hash_refresh_token(token)
+    assert document["expires_at"] == expires_at
+    assert get_refresh_token(db, token)["username"] == "alice"
+
+
+def test_rotation_consumes_the_token(db):
+    token, _ = create_refresh_token(db, "alice")
+    stored, new_token, _ = rotate_refresh_token(db, token)
+    assert stored["username"] == "alice"
+    assert new_token != token
+    # A replayed token is refused; the replacement works once
+    assert rotate_refresh_token(db, token) is None
+    assert rotate_refresh_token(db, new_token) is not None
+    assert db["refresh_tokens"].count_documents({}) == 1
+
+
+def test_expired_and_revoked_tokens_are_refused(db):
+    token, _ = create_refresh_token(db, "alice")
+    db["refresh_tokens"].update_many({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+    assert get_refresh_token(db, token) is None
+    assert rotate_refresh_token(db, token) is None
+
+    token, _ = create_refresh_token(db, "alice")
+    revoke_refresh_token(db, token)
+    assert get_refresh_token(db, token) is None
+
+
+def test_browser_tokens_are_capped_per_owner(db, monkeypatch):
+    monkeypatch.setattr(auth, "MAX_REFRESH_TOKENS_PER_OWNER", 3)
+    tokens = []
+    for minute in range(5):
+        tokens.append(create_refresh_token(db, "alice")[0])
+        db["refresh_tokens"].update_one(
+            {"token_hash": hash_refresh_token(tokens[-1])},
+            {"$set": {"created_at": datetime(2026, 1, 1, 0, minute)}},
+        )
+    create_refresh_token(db, "bob")
+    assert [get_refresh_token(db, t) is not None for t in tokens] == [False, False, True, True, True]
+    assert db["refresh_tokens"].count_documents({"username": "bob"}) == 1
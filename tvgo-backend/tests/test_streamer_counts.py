@@ -0,0 +1,63 @@
+import pytest
+
+from app import schemas
+from app.routers import admin_channels, streamers
+from app.tenant_stats import refresh_streamer_channel_counts, streamer_channel_counts
+from fakes import FakeDatabase
+
+COMPANY = {"_id": "c1"}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(admin_channels, "bump_catalog_version", lambda *args: None)
+    monkeypatch.setattr(admin_channels, "schedule_renditions", lambda *args: None)
+    monkeypatch.setattr(streamers, "invalidate_tenant_stats", lambda *args: None)
+    db = FakeDatabase()
+    db["streamers"].insert_many([
+        {"_id": "alpha", "company_id": "c1", "name": "Alpha"},
+        {"_id": "beta", "company_id": "c1", "name": "Beta"},
+        {"_id": "gamma", "company_id": "c2", "name": "Alpha"},
+    ])
+    db["channels"].insert_many([
+        {"_id": "c1-a1", "company_id": "c1", "metadata": {"streamer_name": "Alpha"}},
+        {"_id": "c1-a2", "company_id": "c1", "metadata": {"streamer_name": "Alpha"}},
+        {"_id": "c1-plain", "company_id": "c1"},
+        {"_id": "c2-a1", "company_id": "c2", "metadata": {"streamer_name": "Alpha"}},
+    ])
+    return db
+
+
+def _counts(db, company_id="c1"):
+    return {s["name"]: s.get("channel_count") for s in db["streamers"].find({"company_id": company_id})}
+
+
+def test_counts_are_per_tenant(db):
+    assert streamer_channel_counts(db, "c1") == {"Alpha": 2}
+    assert refresh_streamer_channel_counts(db, "c1") == {"Alpha": 2}
+    assert _counts(db) == {"Alpha": 2, "Beta": 0}
+    assert _counts(db, "c2") == {"Alpha": None}
+
+
+def test_creating_a_streamer_channel_refreshes_the_counts(db):
+    refresh_streamer_channel_counts(db, "c1")
+    payload = schemas.ChannelCreate(
+        id="c1-b1", name="B1", stream_url="https://example.com/b1.m3u8", metadata={"streamer_name": "Beta"}
+    )
+    admin_channels.admin_create_channel(payload, COMPANY, db)
+    assert _counts(db) == {"Alpha": 2, "Beta": 1}
+
+
+def test_deleting_a_streamer_channel_refreshes_the_counts(db):
+    refresh_streamer_channel_counts(db, "c1")
+    admin_channels.admin_delete_channel("c1-a1", COMPANY, db)
+    assert _counts(db) == {"Alpha": 1, "Beta": 0}
+
+
+def test_listing_backfills_missing_counters(db):
+    response = streamers.list_streamers(COMPANY, db)
+    assert {item.name: item.channel_count for item in response.items} == {"Alpha": 2, "Beta": 0}
+    assert _counts(db) == {"Alpha": 2, "Beta": 0}
+    db.reset_calls()
+    streamers.list_streamers(COMPANY, db)
+    assert ("channels", "aggregate") not in db.calls
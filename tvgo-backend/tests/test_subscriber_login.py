@@ -0,0 +1,72 @@
+import pytest
+from fastapi import HTTPException
+
+from app import cache, schemas, tenant_config
+from app.auth import device_token_id, get_password_hash, get_refresh_token
+from app.routers.auth import login_subscriber
+from fakes import FakeDatabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", None)
+    tenant_config._config_cache.clear()
+    db = FakeDatabase()
+    db["refresh_tokens"].create_index("token_hash", unique=True, sparse=True)
+    db["brand_config"].insert_one({"_id": "brand", "app_name": "tvGO"})
+    db["subscribers"].insert_one({
+        "_id": "s1",
+        "company_id": "c1",
+        "mac_address": "AA:01",
+        "status": "active",
+        "max_devices": 2,
+        "devices": [{"mac_address": "AA:01", "device_name": "Living room"}],
+    })
+    return db
+
+
+def _login(db, mac, device_name=None):
+    return login_subscriber(schemas.SubscriberLogin(mac_address=mac, device_name=device_name), db)
+
+
+def test_known_box_logs_in_with_one_subscriber_update(db):
+    db.reset_calls()
+    response = _login(db, "AA:01", "Lounge")
+    assert response.subscriber.id == "s1"
+    assert [c for c in db.calls if c[0] == "subscribers"] == [("subscribers", "find_one_and_update")]
+    device = db["subscribers"].find_one({"_id": "s1"})["devices"][0]
+    assert device["device_name"] == "Lounge" and device["last_seen"] is not None
+
+
+def test_a_device_keeps_one_refresh_token(db):
+    first = _login(db, "AA:01").refreshToken
+    second = _login(db, "AA:01").refreshToken
+    (document,) = db["refresh_tokens"].find()
+    assert document["_id"] == device_token_id({"username": "s1"}, "AA:01")
+    assert get_refresh_token(db, first) is None
+    assert get_refresh_token(db, second)["device"] == "AA:01"
+
+
+def test_new_devices_are_registered_up_to_the_limit(db):
+    db["subscribers"].update_one(
+        {"_id": "s1"}, {"$set": {"username": "alice", "password_hash": get_password_hash("pw")}}
+    )
+
+    def login(mac):
+        return login_subscriber(schemas.SubscriberLogin(username="alice", password="pw", mac_address=mac), db)
+
+    login("BB:02")
+    assert len(db["subscribers"].find_one({"_id": "s1"})["devices"]) == 2
+    login("BB:02")  # Already registered: not counted again
+    with pytest.raises(HTTPException) as error:
+        login("CC:03")
+    assert error.value.status_code == 403
+    assert len(db["subscribers"].find_one({"_id": "s1"})["devices"]) == 2
+
+
+def test_inactive_accounts_cannot_log_in(db):
+    db["subscribers"].update_one({"_id": "s1"}, {"$set": {"status": "suspended"}})
+    with pytest.raises(HTTPException) as error:
+        _login(db, "AA:01")
+    assert error.value.status_code == 403
+
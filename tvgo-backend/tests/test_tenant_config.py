@@ -0,0 +1,50 @@
+import pytest
+
+from app import cache, catalog, tenant_config
+from app.tenant_config import ensure_brand_document, get_config, refresh_config
+from fakes import FakeDatabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", None)
+    monkeypatch.setattr(catalog, "_versions", {})
+    monkeypatch.setattr(catalog, "publish_catalog_changed", lambda *args: None)
+    tenant_config._config_cache.clear()
+    db = FakeDatabase()
+    db["brand_config"].insert_many([
+        {"_id": "brand", "app_name": "tvGO"},
+        {"_id": "c1-brand", "company_id": "c1", "app_name": "Acme TV", "enable_vod": False},
+    ])
+    return db
+
+
+def test_tenant_brand_overrides_the_global_one(db):
+    assert get_config(db, "c1")["brand"]["appName"] == "Acme TV"
+    assert get_config(db, "c1")["features"]["enableVod"] is False
+    assert get_config(db, "c2")["brand"]["appName"] == "tvGO"
+    assert get_config(db)["brand"]["appName"] == "tvGO"
+
+
+def test_config_is_served_from_memory(db):
+    get_config(db, "c1")
+    db.reset_calls()
+    get_config(db, "c1")
+    assert db.calls == []
+
+
+def test_refresh_config_writes_through(db):
+    get_config(db, "c1")
+    db["brand_config"].update_one({"_id": "c1-brand"}, {"$set": {"app_name": "Acme+"}})
+    assert get_config(db, "c1")["brand"]["appName"] == "Acme TV"
+    assert refresh_config(db, "c1")["brand"]["appName"] == "Acme+"
+    db.reset_calls()
+    assert get_config(db, "c1")["brand"]["appName"] == "Acme+"
+    assert db.calls == []
+
+
+def test_missing_global_brand_is_seeded_once(db):
+    db["brand_config"].delete_many({})
+    assert ensure_brand_document(db)["app_name"] == tenant_config.DEFAULT_BRAND_DOCUMENT["app_name"]
+    ensure_brand_document(db)
+    assert db["brand_config"].count_documents({"_id": "brand"}) == 1
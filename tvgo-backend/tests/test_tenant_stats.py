@@ -0,0 +1,54 @@
+import pytest
+
+from app import cache, tenant_stats as stats_module
+from app.tenant_stats import invalidate_tenant_stats, tenant_stats, tenants_stats
+from fakes import FakeDatabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", None)
+    stats_module._stats_cache.clear()
+    db = FakeDatabase()
+    db["subscribers"].insert_many([{"company_id": "c1"}, {"company_id": "c1"}, {"company_id": "c2"}])
+    db["channels"].insert_many([
+        {"company_id": "c1"},
+        {"company_id": "c1", "is_active": False},
+        {"company_id": "c3"},
+    ])
+    db["movies"].insert_one({"company_id": "c2"})
+    db.reset_calls()
+    return db
+
+
+def test_page_counts_come_from_one_aggregation_per_collection(db):
+    stats = tenants_stats(db, ["c1", "c2"])
+    assert stats["c1"] == {"users": 2, "channels": 2, "movies": 0, "streamers": 0, "packages": 0, "active_channels": 1}
+    assert stats["c2"]["users"] == 1 and stats["c2"]["movies"] == 1
+    assert "c3" not in stats
+    assert len(db.calls) == len(stats_module.COUNTED_COLLECTIONS)
+    assert all(method == "aggregate" for _, method in db.calls)
+
+
+def test_tenant_without_documents_gets_zero_counts(db):
+    assert tenants_stats(db, ["c9"])["c9"]["channels"] == 0
+    assert tenant_stats(db, "c9")["users"] == 0
+    assert tenants_stats(db, []) == {}
+
+
+def test_page_is_cached_until_one_of_its_tenants_changes(db):
+    tenants_stats(db, ["c1", "c2"])
+    db.reset_calls()
+    tenants_stats(db, ["c2", "c1"])
+    assert db.calls == []
+
+    db["subscribers"].insert_one({"company_id": "c2"})
+    invalidate_tenant_stats("c2")
+    assert tenants_stats(db, ["c1", "c2"])["c2"]["users"] == 2
+
+
+def test_single_tenant_counts(db):
+    assert tenant_stats(db, "c1")["active_channels"] == 1
+    db["channels"].insert_one({"company_id": "c1"})
+    invalidate_tenant_stats("c1")
+    assert tenant_stats(db, "c1")["channels"] == 3
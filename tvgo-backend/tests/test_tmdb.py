@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import tmdb
+from app.tmdb import _cache_key, search_movie
+from fakes import FakeDatabase
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    cache = FakeDatabase()["tmdb_cache"]
+    calls = []
+
+    async def fetch(path, params):
+        calls.append((path, params["query"]))
+        if params["query"] == "nothing":
+            return {"results": []}
+        return {"results": [{"id": 1, "title": params["query"]}]}
+
+    monkeypatch.setattr(tmdb, "TMDB_CACHE", "mongo")
+    monkeypatch.setattr(tmdb, "_cache_collection", lambda: cache)
+    monkeypatch.setattr(tmdb, "_fetch", fetch)
+    return SimpleNamespace(calls=calls, cache=cache)
+
+
+def test_cache_key_ignores_query_case_and_parameter_order():
+    assert _cache_key("/search/movie", {"query": " Alien ", "year": 1979}) == _cache_key(
+        "/search/movie", {"year": "1979", "query": "alien"}
+    )
+
+
+def test_second_lookup_is_served_from_the_cache(fetches):
+    assert asyncio.run(search_movie("Alien"))["id"] == 1
+    assert asyncio.run(search_movie("alien"))["id"] == 1
+    assert len(fetches.calls) == 1
+
+
+def test_not_found_is_cached_for_a_shorter_time(fetches):
+    assert asyncio.run(search_movie("nothing")) is None
+    assert asyncio.run(search_movie("nothing")) is None
+    assert len(fetches.calls) == 1
+    negative = fetches.cache.find_one({"data.results": []})
+    assert negative["expires_at"] - negative["cached_at"] == tmdb.TMDB_NEGATIVE_CACHE_TTL
+
+    asyncio.run(search_movie("Alien"))
+    found = fetches.cache.find_one({"data.results.title": "Alien"})
+    assert found["expires_at"] - found["cached_at"] == tmdb.TMDB_CACHE_TTL
+
+
+def test_expired_entries_are_refetched(fetches):
+    asyncio.run(search_movie("Alien"))
+    fetches.cache.update_many({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+    asyncio.run(search_movie("Alien"))
+    assert len(fetches.calls) == 2
+
+
+def test_replay_answers_from_recorded_fixtures(fetches, monkeypatch, tmp_path):
+    monkeypatch.setattr(tmdb, "TMDB_FIXTURES_DIR", tmp_path)
+    monkeypatch.setattr(tmdb, "TMDB_CACHE", "record")
+    asyncio.run(search_movie("Alien"))
+    monkeypatch.setattr(tmdb, "TMDB_CACHE", "replay")
+    assert asyncio.run(search_movie("Alien"))["title"] == "Alien"
+    assert len(fetches.calls) == 1
+    with pytest.raises(LookupError):
+        asyncio.run(search_movie("Unrecorded"))
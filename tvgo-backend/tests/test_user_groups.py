@@ -0,0 +1,63 @@
+import pytest
+
+from app import cache, schemas
+from app.routers import user_groups
+from app.routers.user_groups import (
+    create_user_group,
+    delete_user_group,
+    message_group_members,
+    subscriber_group_ids,
+    update_user_group,
+)
+from fakes import FakeDatabase
+
+COMPANY = {"_id": "c1"}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", None)
+    user_groups._membership_cache.clear()
+    db = FakeDatabase()
+    db["user_groups"].insert_many([
+        {"_id": "g1", "company_id": "c1", "name": "Kids", "user_ids": ["s1", "s2"]},
+        {"_id": "g2", "company_id": "c1", "name": "Sports", "user_ids": ["s2", "s3"]},
+        {"_id": "g3", "company_id": "c2", "name": "Kids", "user_ids": ["s1"]},
+    ])
+    return db
+
+
+def test_subscriber_groups_are_per_tenant_and_cached(db):
+    assert sorted(subscriber_group_ids(db, "c1", "s2")) == ["g1", "g2"]
+    assert subscriber_group_ids(db, "c1", "s1") == ["g1"]
+    db.reset_calls()
+    subscriber_group_ids(db, "c1", "s2")
+    assert db.calls == []
+
+
+def test_group_writes_drop_cached_membership(db):
+    assert subscriber_group_ids(db, "c1", "s4") == []
+    group = create_user_group(schemas.UserGroupCreate(name="New", user_ids=["s4"]), COMPANY, db)
+    assert subscriber_group_ids(db, "c1", "s4") == [group.id]
+
+    update_user_group("g1", schemas.UserGroupUpdate(user_ids=["s4"]), COMPANY, db)
+    assert sorted(subscriber_group_ids(db, "c1", "s4")) == sorted(["g1", group.id])
+
+    delete_user_group(group.id, COMPANY, db)
+    assert subscriber_group_ids(db, "c1", "s4") == ["g1"]
+
+
+def test_message_group_members_resolves_in_one_query(db):
+    message = {"company_id": "c1", "target_type": "groups", "target_ids": ["g1", "g2", "g3"]}
+    db.reset_calls()
+    assert sorted(message_group_members(db, message)) == ["s1", "s2", "s3"]
+    assert db.calls == [("user_groups", "distinct")]
+    # g3 belongs to another tenant and is ignored
+    assert message_group_members(db, {**message, "target_ids": ["g3"]}) == []
+
+
+def test_non_group_messages_have_no_members(db):
+    db.reset_calls()
+    assert message_group_members(db, {"company_id": "c1", "target_type": "all"}) == []
+    assert message_group_members(db, {"company_id": "c1", "target_type": "groups", "target_ids": []}) == []
+    assert db.calls == []
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+from app.xmltv import XMLTVDateParser
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return datetime(2026, 1, 1, hour, minute, tzinfo=timezone.utc)
+
+
+def test_parses_offsets_with_and_without_space():
+    parser = XMLTVDateParser()
+    assert parser.parse("20260101120000 +0000") == at(12)
+    assert parser.parse("20260101150000+0300") == at(12)
+    assert parser.parse("20260101073000 -0430") == at(12)
+    assert parser.parse("20260101120000") == at(12)
+    assert parser.parsed == 4
+    assert parser.summary() is None
+
+
+def test_repeated_values_are_memoised():
+    parser = XMLTVDateParser()
+    first = parser.parse("20260101120000 +0100")
+    assert parser.parse("20260101120000 +0100") is first
+    assert parser.parsed == 2
+
+
+def test_malformed_values_are_counted_not_replaced():
+    parser = XMLTVDateParser(max_samples=2)
+    for value in ("2026010112", "20261301120000 +0000", "20260101120000 +2500", "20260101120000 x", None):
+        assert parser.parse(value) is None
+    assert parser.malformed == 5
+    assert parser.samples == ["2026010112", "20261301120000 +0000"]
+    assert parser.summary().startswith("5 malformed XMLTV timestamps")